@@ -0,0 +1,124 @@
+"""Compare detail page parsing CPU time of the old and new HTML parsers.
+
+Parses the saved pages in benchmarks/fixtures with the previous approach
+(BeautifulSoup ``html.parser`` with one ``select_one`` per field) and with
+src/data/page_parsers.py on every installed backend. Reports CPU
+milliseconds per page and exits non-zero if a backend extracts wrong fields
+or the fastest one is less than --min-speedup times faster than the old path:
+
+    python benchmarks/html_parsing.py
+    python benchmarks/html_parsing.py --repeat 50 --output html_parsing.json
+"""
+import argparse
+import json
+import sys
+import time
+import warnings
+from pathlib import Path
+
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+from src.data.page_parsers import BACKENDS, _available, parse_amazon, parse_google_play
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+
+PAGES = {
+    'google_play': ('google_play_details.html', 'com.whatsapp', parse_google_play, {
+        'name': 'WhatsApp Messenger', 'category': 'COMMUNICATION', 'rating': 4.2, 'reviews': 198765432,
+        'size': 85.5, 'price': 0.0, 'downloads': 5000000000
+    }),
+    'amazon': ('amazon_details.html', 'B004DTBKRO', parse_amazon, {
+        'name': 'Spotify: Music and Podcasts', 'category': 'Music & Audio', 'rating': 4.6, 'reviews': 1234567,
+        'size': 71.2, 'price': 0.0, 'downloads': 0
+    })
+}
+
+def legacy_google_play(html, app_id):
+    """The per-field BeautifulSoup extraction GooglePlayAPI used before page_parsers."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+
+    def text(selector):
+        element = soup.select_one(selector)
+        return element.text.strip() if element else ''
+
+    rating = soup.select_one('[itemprop="ratingValue"]')
+    reviews = soup.select_one('[itemprop="reviewCount"]')
+    price = soup.select_one('[itemprop="price"]')
+    size = soup.select_one('div:contains("Size")')
+    downloads = soup.select_one('div:contains("Downloads")')
+    return {
+        'app_id': app_id, 'name': text('h1'), 'category': text('[itemprop="genre"]'),
+        'rating': float(rating['content']) if rating else 0.0,
+        'reviews': int(reviews['content'].replace(',', '')) if reviews else 0,
+        'size': size.find_next('div').text.strip() if size else 0,
+        'price': price['content'] if price else 0.0,
+        'downloads': downloads.find_next('div').text.strip() if downloads else 0
+    }
+
+def legacy_amazon(html, app_id):
+    """The per-field BeautifulSoup extraction AmazonAppStoreAPI used before page_parsers."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    title = soup.select_one('#productTitle')
+    breadcrumbs = soup.select_one('#wayfinding-breadcrumbs_container')
+    rating = soup.select_one('[data-hook="rating-out-of-text"]')
+    reviews = soup.select_one('[data-hook="total-review-count"]')
+    size = soup.find('td', string='File Size')
+    price = soup.select_one('.a-price-whole')
+    return {
+        'app_id': app_id, 'name': title.text.strip() if title else '',
+        'category': breadcrumbs.find_all('a')[-1].text.strip() if breadcrumbs else '',
+        'rating': float(rating.text.split(' ')[0]) if rating else 0.0,
+        'reviews': int(reviews.text.replace(',', '')) if reviews else 0,
+        'size': size.find_next('td').text.strip() if size else 0,
+        'price': price.text if price else 0.0, 'downloads': 0
+    }
+
+LEGACY = {'google_play': legacy_google_play, 'amazon': legacy_amazon}
+
+def cpu_ms(parse, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.process_time()
+        parse()
+        samples.append(time.process_time() - start)
+    return round(sorted(samples)[len(samples) // 2] * 1000, 3)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--min-speedup', type=float, default=5.0)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    # The old Google Play path uses the deprecated :contains selector
+    warnings.simplefilter('ignore', FutureWarning)
+
+    backends = [name for name in BACKENDS if name == 'bs4' or _available(name)]
+    report = {}
+    failed = False
+    for page, (filename, app_id, parse, expected) in PAGES.items():
+        html = (FIXTURES / filename).read_text()
+        result = {'page_kb': len(html) // 1024,
+                  'legacy_bs4_ms': cpu_ms(lambda: LEGACY[page](html, app_id), args.repeat)}
+        for backend in backends:
+            fields = parse(html, app_id, backend=backend)
+            wrong = {key: fields[key] for key, value in expected.items() if fields[key] != value}
+            result[backend] = {'ms': cpu_ms(lambda: parse(html, app_id, backend=backend), args.repeat),
+                               'wrong_fields': wrong}
+            result[backend]['speedup'] = round(result['legacy_bs4_ms'] / max(result[backend]['ms'], 1e-6), 1)
+            failed |= bool(wrong)
+        fastest = max(result[backend]['speedup'] for backend in backends)
+        failed |= fastest < args.min_speedup
+        report[page] = result
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Measure import-time cost of each entry point with ``python -X importtime``.
+
+Each entry point is imported in a fresh interpreter the same way its script
+runs it (same sys.path layout). The report shows total import time, the
+heaviest top-level imports and whether heavy optional dependencies were
+pulled in:
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --entry process_data --top 15 --output import_times.json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+root_dir = Path(__file__).parent.parent
+
+# name -> (sys.path entries relative to the repo root, module to import)
+ENTRY_POINTS = {
+    'process_data': (['src/data', 'src'], 'process_data'),
+    'train_models': (['src/models', 'src'], 'train_models'),
+    'main': (['src'], 'main'),
+    'collector': (['.'], 'src.data.collector'),
+    'predict': (['.'], 'src.predict'),
+    'text_processing': (['.'], 'src.utils.text_processing'),
+    # Also loads the served model, so sklearn is expected here
+    'web_app': (['.'], 'src.web.app')
+}
+
+# Dependencies that should only load when actually used
+HEAVY_MODULES = ['selenium', 'bs4', 'requests', 'nltk', 'sklearn', 'scipy', 'dotenv']
+
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+def measure(paths, module, runs=3):
+    """Import `module` in fresh interpreters and return the fastest run's breakdown."""
+    setup = '; '.join(f'sys.path.insert(0, {str(root_dir / p)!r})' for p in reversed(paths))
+    code = f'import sys; {setup}; import {module}'
+    best = None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=root_dir, capture_output=True, text=True,
+            env=dict(os.environ, MODEL_RELOAD_INTERVAL='0')
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+        imports = []
+        for line in result.stderr.splitlines():
+            match = LINE.match(line)
+            if match:
+                imports.append({
+                    'module': match.group(4),
+                    'self_us': int(match.group(1)),
+                    'cumulative_us': int(match.group(2)),
+                    'depth': len(match.group(3)) // 2
+                })
+        total_us = sum(entry['self_us'] for entry in imports)
+        if best is None or total_us < best['total_us']:
+            best = {'total_us': total_us, 'imports': imports}
+    return best
+
+def summarize(name, measurement, top):
+    imports = measurement['imports']
+    loaded = {entry['module'].split('.')[0] for entry in imports}
+    top_level = sorted((entry for entry in imports if entry['depth'] <= 1),
+                       key=lambda entry: entry['cumulative_us'], reverse=True)
+    return {
+        'entry_point': name,
+        'total_ms': round(measurement['total_us'] / 1000, 1),
+        'modules_imported': len(imports),
+        'heavy_dependencies_loaded': [module for module in HEAVY_MODULES if module in loaded],
+        'top_imports': [
+            {'module': entry['module'], 'cumulative_ms': round(entry['cumulative_us'] / 1000, 1)}
+            for entry in top_level[:top]
+        ]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entry', action='append', choices=sorted(ENTRY_POINTS),
+                        help='entry point to measure (default: all)')
+    parser.add_argument('--runs', type=int, default=3, help='take the fastest of N runs')
+    parser.add_argument('--top', type=int, default=8, help='number of heaviest imports to show')
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    reports = []
+    for name in args.entry or list(ENTRY_POINTS):
+        paths, module = ENTRY_POINTS[name]
+        try:
+            report = summarize(name, measure(paths, module, args.runs), args.top)
+        except RuntimeError as e:
+            print(f"{name}: {e}", file=sys.stderr)
+            continue
+        reports.append(report)
+
+        print(f"\n{name}: {report['total_ms']} ms, {report['modules_imported']} modules, "
+              f"heavy: {', '.join(report['heavy_dependencies_loaded']) or 'none'}")
+        for entry in report['top_imports']:
+            print(f"    {entry['cumulative_ms']:>8} ms  {entry['module']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(reports, indent=2))
+
+if __name__ == '__main__':
+    main()
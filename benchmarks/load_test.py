@@ -0,0 +1,168 @@
+"""Load test for the /predict endpoint of the Flask and ASGI servers.
+
+Fires concurrent single-prediction requests and reports throughput and latency
+percentiles, so the micro-batching ASGI mode can be compared with Flask:
+
+    python benchmarks/load_test.py --launch flask asgi --requests 5000 --concurrency 64
+
+or against servers that are already running:
+
+    python benchmarks/load_test.py --url http://127.0.0.1:5002 --url http://127.0.0.1:5003
+"""
+import argparse
+import http.client
+import json
+import random
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+import numpy as np
+
+root_dir = Path(__file__).parent.parent
+
+APP_TYPES = ['communication', 'education', 'entertainment', 'music',
+             'productivity', 'social', 'travel', 'video']
+STORES = ['amazon', 'apple', 'google_play']
+
+SERVERS = {
+    'flask': lambda port, threads: [
+        sys.executable, '-m', 'gunicorn', 'src.web.app:app',
+        '--bind', f'127.0.0.1:{port}', '--workers', '1', '--threads', str(threads)
+    ],
+    'asgi': lambda port, threads: [
+        sys.executable, '-m', 'uvicorn', 'src.web.asgi_app:app',
+        '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'
+    ]
+}
+
+def random_payload(rng):
+    return {
+        'name': 'Load Test App',
+        'app_size_mb': round(rng.uniform(5, 1000), 1),
+        'price_usd': rng.choice([0.0, 0.99, 1.99, 4.99, 9.99]),
+        'downloads': rng.choice([1000, 10000, 100000, 1000000, 100000000]),
+        'app_type': rng.choice(APP_TYPES),
+        'store': rng.choice(STORES)
+    }
+
+def run_load(url, n_requests, concurrency, seed=42):
+    """Send n_requests to url/predict from `concurrency` keep-alive clients."""
+    target = urlparse(url)
+    latencies = []
+    errors = [0]
+    counter = iter(range(n_requests))
+    lock = threading.Lock()
+
+    def client(worker_id):
+        rng = random.Random(seed + worker_id)
+        conn = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+        local = []
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    break
+            body = json.dumps(random_payload(rng))
+            start = time.perf_counter()
+            try:
+                conn.request('POST', '/predict', body, {'Content-Type': 'application/json'})
+                response = json.loads(conn.getresponse().read())
+                if not response.get('success'):
+                    raise RuntimeError(response.get('error'))
+                local.append(time.perf_counter() - start)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latency_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        'url': url,
+        'requests': n_requests,
+        'concurrency': concurrency,
+        'errors': errors[0],
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'latency_ms': {
+            'p50': round(float(np.percentile(latency_ms, 50)), 2),
+            'p90': round(float(np.percentile(latency_ms, 90)), 2),
+            'p99': round(float(np.percentile(latency_ms, 99)), 2),
+            'max': round(float(latency_ms.max()), 2)
+        }
+    }
+
+def wait_until_ready(url, timeout=60):
+    target = urlparse(url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(target.hostname, target.port, timeout=2)
+            conn.request('GET', '/admin/model')
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise TimeoutError(f"Server at {url} did not start within {timeout}s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', action='append', default=[], help='base URL of a running server')
+    parser.add_argument('--launch', nargs='+', choices=sorted(SERVERS), default=[],
+                        help='start these servers locally for the test')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--warmup', type=int, default=100)
+    parser.add_argument('--port', type=int, default=5100, help='first port used by --launch')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    targets = [(url, url, None) for url in args.url]
+    processes = []
+    try:
+        for offset, server in enumerate(args.launch):
+            port = args.port + offset
+            process = subprocess.Popen(SERVERS[server](port, args.concurrency), cwd=root_dir)
+            processes.append(process)
+            targets.append((server, f'http://127.0.0.1:{port}', process))
+
+        results = []
+        for name, url, _ in targets:
+            wait_until_ready(url)
+            run_load(url, args.warmup, min(args.concurrency, args.warmup))
+            result = run_load(url, args.requests, args.concurrency)
+            result['name'] = name
+            results.append(result)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    print(f"\n{'server':<30} {'rps':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>8}")
+    for result in results:
+        print(f"{result['name']:<30} {result['throughput_rps']:>10} {result['latency_ms']['p50']:>10} "
+              f"{result['latency_ms']['p99']:>10} {result['errors']:>8}")
+    if len(results) > 1 and results[0]['throughput_rps']:
+        for result in results[1:]:
+            print(f"{result['name']} vs {results[0]['name']}: "
+                  f"{result['throughput_rps'] / results[0]['throughput_rps']:.2f}x throughput")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Check ONNX exports against the joblib models and compare inference latency.
+
+Exports each saved model to a temporary ONNX file, compares predictions on
+the real training inputs plus random inputs, and times single-row and batch
+inference for both backends. Exits non-zero if any prediction differs by more
+than --tolerance, or if serving with MODEL_BACKEND=onnx imports sklearn:
+
+    python benchmarks/onnx_parity.py
+    python benchmarks/onnx_parity.py --threads 1 2 4 --output onnx_parity.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+from src.data.preprocessor import DataPreprocessor
+from src.models.onnx_export import OnnxModel, export_model
+from src.utils.logging_config import setup_logging
+
+def latency_ms(predict, X, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predict(X)
+        samples.append(time.perf_counter() - start)
+    return round(float(np.median(samples)) * 1000, 4)
+
+def parity_inputs(features, data_dir, n_random, seed=0):
+    X, _ = DataPreprocessor(data_dir=data_dir).get_training_data()
+    X = X.reindex(columns=features, fill_value=0).astype(float)
+
+    rng = np.random.default_rng(seed)
+    random = pd.DataFrame(0.0, index=range(n_random), columns=features)
+    random['app_size_mb'] = rng.uniform(0, 1000, n_random)
+    random['price_usd'] = rng.choice([0, 0.99, 1.99, 4.99, 9.99], n_random)
+    random['downloads'] = 10 ** rng.uniform(0, 10, n_random)
+    for prefix in ('app_type_', 'store_'):
+        columns = [c for c in features if c.startswith(prefix)]
+        for row, column in enumerate(rng.choice(columns, n_random)):
+            random.loc[row, column] = 1.0
+    return pd.concat([X, random], ignore_index=True)
+
+def sklearn_imported_by_onnx_serving(model_dir):
+    """Import the web app with the ONNX backend in a fresh interpreter and check for sklearn."""
+    code = ("import sys; sys.path.insert(0, %r); import src.web.app; "
+            "print('sklearn' in sys.modules)" % str(root_dir))
+    env = dict(os.environ, MODEL_BACKEND='onnx', MODEL_DIR=str(model_dir),
+               MODEL_RELOAD_INTERVAL='0', LOG_LEVEL='WARNING')
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    return result.stdout.strip().splitlines()[-1] == 'True'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-dir', default=str(root_dir / 'src' / 'models' / 'saved'))
+    parser.add_argument('--data-dir', default=str(root_dir / 'src' / 'data' / 'raw'))
+    parser.add_argument('--model', action='append', help='model to check (default: random_forest, linear_regression)')
+    parser.add_argument('--random', type=int, default=5000, help='random inputs added to the real ones')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1], help='onnxruntime intra-op thread counts')
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--tolerance', type=float, default=1e-4)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    setup_logging()
+
+    reports = {}
+    failed = False
+    with tempfile.TemporaryDirectory(prefix='arps-onnx-') as tmp:
+        for name in args.model or ['random_forest', 'linear_regression']:
+            model = joblib.load(Path(args.model_dir) / f'{name}.joblib')
+            features = list(model.feature_names_in_)
+            onnx_path = export_model(model, features, Path(tmp) / f'{name}.onnx', name=name)
+
+            X = parity_inputs(features, args.data_dir, args.random)
+            expected = model.predict(X)
+            report = {'rows_checked': len(X), 'onnx_bytes': onnx_path.stat().st_size,
+                      'joblib': {'row_ms': latency_ms(model.predict, X.iloc[:1], args.repeat),
+                                 'batch_1000_ms': latency_ms(model.predict, X.iloc[:1000], args.repeat // 10 or 1)}}
+            for threads in args.threads:
+                onnx_model = OnnxModel(onnx_path, intra_op_threads=threads)
+                difference = float(np.abs(onnx_model.predict(X) - expected).max())
+                report[f'onnx_threads_{threads}'] = {
+                    'max_abs_diff': difference,
+                    'row_ms': latency_ms(onnx_model.predict, X.iloc[:1], args.repeat),
+                    'batch_1000_ms': latency_ms(onnx_model.predict, X.iloc[:1000], args.repeat // 10 or 1)
+                }
+                failed |= difference > args.tolerance
+            reports[name] = report
+
+    if (Path(args.model_dir) / 'random_forest.onnx').exists():
+        reports['sklearn_imported_by_onnx_serving'] = sklearn_imported_by_onnx_serving(args.model_dir)
+        failed |= reports['sklearn_imported_by_onnx_serving']
+
+    print(json.dumps(reports, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(reports, indent=2))
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
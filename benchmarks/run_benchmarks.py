@@ -0,0 +1,187 @@
+"""End-to-end performance benchmarks on synthetic data.
+
+Generates raw store CSVs (and a review table) at the chosen scale, then times
+preprocessing, model training, single and batch prediction and the Flask
+/predict endpoint. Results are written as JSON and compared against a stored
+baseline; the run fails if any timing regressed beyond the tolerance:
+
+    python benchmarks/run_benchmarks.py --scale 10k
+    python benchmarks/run_benchmarks.py --scale 1m --output results.json
+    python benchmarks/run_benchmarks.py --scale 10k --save-baseline
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+from src.data.preprocessor import DataPreprocessor
+from src.data.synthetic import SCALES, generate_raw_store_data, generate_reviews
+from src.models.model_trainer import ModelTrainer
+from src.models.model_registry import ModelRegistry
+from src.predict import AppRatingPredictor
+from src.utils.logging_config import setup_logging
+from src.utils import profiling
+
+DEFAULT_BASELINE = Path(__file__).parent / 'baseline.json'
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def latency_stats(samples):
+    samples_ms = np.array(samples) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(samples_ms, 50)), 4),
+        'p99_ms': round(float(np.percentile(samples_ms, 99)), 4)
+    }
+
+def sample_apps(n, seed=0):
+    rng = np.random.default_rng(seed)
+    app_types = ['communication', 'education', 'entertainment', 'music',
+                 'productivity', 'social', 'travel', 'video']
+    stores = ['amazon', 'apple', 'google_play']
+    return [
+        {
+            'name': f'Benchmark App {i}',
+            'app_size_mb': float(rng.integers(10, 500)),
+            'price_usd': float(rng.choice([0.0, 0.99, 4.99])),
+            'downloads': int(rng.choice([10_000, 1_000_000, 100_000_000])),
+            'app_type': str(rng.choice(app_types)),
+            'store': str(rng.choice(stores))
+        }
+        for i in range(n)
+    ]
+
+def run(scale, work_dir, max_train_rows, review_rows, n_requests):
+    rows_per_store = SCALES[scale]
+    results = {}
+
+    _, results['generate_raw_s'] = timed(generate_raw_store_data, work_dir / 'raw', rows_per_store)
+    if review_rows:
+        _, results['generate_reviews_s'] = timed(generate_reviews, work_dir / 'reviews.csv', review_rows)
+
+    preprocessor = DataPreprocessor(data_dir=str(work_dir / 'raw'))
+    _, results['preprocess_load_s'] = timed(preprocessor.load_data)
+    _, results['preprocess_clean_s'] = timed(preprocessor.preprocess_data)
+    (X, y), results['encode_s'] = timed(preprocessor.get_training_data)
+
+    if max_train_rows and len(X) > max_train_rows:
+        X, y = X.iloc[:max_train_rows], y.iloc[:max_train_rows]
+    model_dir = work_dir / 'models'
+    trainer = ModelTrainer(model_dir=str(model_dir))
+    _, results['train_models_s'] = timed(trainer.train_models, X, y)
+
+    registry = ModelRegistry(model_dir, poll_interval=0).start()
+    predictor = AppRatingPredictor(registry=registry)
+    apps = sample_apps(max(n_requests, 1000))
+
+    for app_data in apps[:20]:
+        predictor.predict_rating(app_data)
+    samples = [timed(predictor.predict_rating, app_data)[1] for app_data in apps[:n_requests]]
+    results.update({f'predict_single_{k}': v for k, v in latency_stats(samples).items()})
+
+    _, batch_seconds = timed(predictor.predict_batch, apps[:1000])
+    results['predict_batch_1000_s'] = round(batch_seconds, 4)
+
+    # The web app reads the model directory from the environment at import time
+    os.environ['MODEL_DIR'] = str(model_dir)
+    os.environ['MODEL_RELOAD_INTERVAL'] = '0'
+    from src.web.app import app
+    client = app.test_client()
+    for app_data in apps[:20]:
+        client.post('/predict', json=app_data)
+    samples = [timed(client.post, '/predict', json=app_data)[1] for app_data in apps[:n_requests]]
+    results.update({f'flask_predict_{k}': v for k, v in latency_stats(samples).items()})
+
+    return {name: round(value, 4) for name, value in results.items()}, len(X)
+
+def compare(results, baseline, tolerance):
+    """Return metrics that are slower than the baseline by more than `tolerance`.
+
+    Tail latencies are reported but not gated on; they are too noisy on shared machines.
+    """
+    regressions = []
+    for name, value in results.items():
+        base = baseline.get(name)
+        if not base or name.endswith('_p99_ms'):
+            continue
+        ratio = value / base
+        if ratio > 1 + tolerance:
+            regressions.append({'metric': name, 'baseline': base, 'current': value, 'ratio': round(ratio, 2)})
+    return regressions
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root_dir,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=sorted(SCALES), default='10k', help='rows per store')
+    parser.add_argument('--review-rows', type=int, help='rows in the synthetic review table (default: same as --scale)')
+    parser.add_argument('--max-train-rows', type=int, default=200_000,
+                        help='cap on rows used for training, 0 for no cap')
+    parser.add_argument('--requests', type=int, default=200, help='single predictions / HTTP requests to time')
+    parser.add_argument('--output', help='write the results JSON here')
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline for its scale')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before failing, e.g. 0.25 = 25%%')
+    parser.add_argument('--profile', choices=profiling.MODES,
+                        help='also profile each stage (slows the run; do not use with --save-baseline)')
+    parser.add_argument('--profile-dir', default='profiles')
+    args = parser.parse_args()
+
+    if args.profile:
+        profiling.enable(args.profile, args.profile_dir)
+    # The web app configures logging again on import, so set the level via the environment
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    setup_logging()
+
+    review_rows = SCALES[args.scale] if args.review_rows is None else args.review_rows
+    with tempfile.TemporaryDirectory(prefix='arps-bench-') as tmp:
+        results, train_rows = run(args.scale, Path(tmp), args.max_train_rows, review_rows, args.requests)
+
+    report = {
+        'meta': {
+            'scale': args.scale,
+            'rows_per_store': SCALES[args.scale],
+            'train_rows': train_rows,
+            'review_rows': review_rows,
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'results': results
+    }
+
+    baseline_path = Path(args.baseline)
+    baselines = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+    baseline = baselines.get(args.scale)
+    report['regressions'] = compare(results, baseline['results'], args.tolerance) if baseline else []
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        baselines[args.scale] = {'meta': report['meta'], 'results': results}
+        baseline_path.write_text(json.dumps(baselines, indent=2) + '\n')
+    elif report['regressions']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Compare peak memory of parallel cross-validation with and without shared training data.
+
+Each mode runs in a fresh interpreter on the same synthetic training matrix:
+``dataframe`` sends the encoded DataFrame to every joblib worker task,
+``shared`` memory-maps it once (ModelTrainer's default when n_jobs != 1).
+Memory of the process and all its workers is sampled while cross-validation
+runs. RSS counts shared file pages once per process; PSS divides them between
+the processes mapping them, so it reflects actual memory use:
+
+    python benchmarks/shared_memory_training.py --rows 1000000 --n-jobs 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+def _children(pid):
+    children = []
+    for task in Path(f'/proc/{pid}/task').glob('*'):
+        try:
+            children.extend(int(c) for c in (task / 'children').read_text().split())
+        except OSError:
+            pass
+    return children
+
+def tree_memory_kb():
+    """Sum RSS and PSS (kB) over this process and its descendants (Linux only)."""
+    rss = pss = 0
+    stack = [os.getpid()]
+    while stack:
+        pid = stack.pop()
+        try:
+            for line in Path(f'/proc/{pid}/smaps_rollup').read_text().splitlines():
+                if line.startswith('Rss:'):
+                    rss += int(line.split()[1])
+                elif line.startswith('Pss:'):
+                    pss += int(line.split()[1])
+        except OSError:
+            continue
+        stack.extend(_children(pid))
+    return rss, pss
+
+def run_child(mode, rows, n_jobs, trees):
+    from sklearn.ensemble import RandomForestRegressor
+    from src.data.preprocessor import DataPreprocessor
+    from src.data.synthetic import generate_raw_store_data
+    from src.models.model_trainer import ModelTrainer
+
+    with tempfile.TemporaryDirectory(prefix='arps-shm-') as tmp:
+        generate_raw_store_data(Path(tmp) / 'raw', rows // 3)
+        X, y = DataPreprocessor(data_dir=str(Path(tmp) / 'raw')).get_training_data()
+        X = X.astype(float)
+        trainer = ModelTrainer(model_dir=str(Path(tmp) / 'models'), n_jobs=n_jobs,
+                               share_memory=mode == 'shared')
+
+        baseline_rss, baseline_pss = tree_memory_kb()
+        peaks = {'rss': baseline_rss, 'pss': baseline_pss}
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(0.05):
+                rss, pss = tree_memory_kb()
+                peaks['rss'] = max(peaks['rss'], rss)
+                peaks['pss'] = max(peaks['pss'], pss)
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        start = time.perf_counter()
+        trainer.cross_validate(RandomForestRegressor(n_estimators=trees, max_depth=8, random_state=42), X, y)
+        seconds = time.perf_counter() - start
+        done.set()
+        sampler.join()
+
+    print(json.dumps({
+        'mode': mode,
+        'rows': len(X),
+        'matrix_mb': round(X.memory_usage(deep=True).sum() / 2**20, 1),
+        'seconds': round(seconds, 2),
+        'peak_rss_mb': round(peaks['rss'] / 1024, 1),
+        'peak_pss_mb': round(peaks['pss'] / 1024, 1),
+        'rss_before_cv_mb': round(baseline_rss / 1024, 1)
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=600_000)
+    parser.add_argument('--n-jobs', type=int, default=4)
+    parser.add_argument('--trees', type=int, default=4)
+    parser.add_argument('--child', choices=['dataframe', 'shared'], help=argparse.SUPPRESS)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    if args.child:
+        os.environ.setdefault('LOG_LEVEL', 'WARNING')
+        run_child(args.child, args.rows, args.n_jobs, args.trees)
+        return
+
+    reports = []
+    for mode in ('dataframe', 'shared'):
+        result = subprocess.run(
+            [sys.executable, __file__, '--child', mode, '--rows', str(args.rows),
+             '--n-jobs', str(args.n_jobs), '--trees', str(args.trees)],
+            capture_output=True, text=True, env=dict(os.environ, LOG_LEVEL='WARNING')
+        )
+        if result.returncode != 0:
+            sys.exit(result.stderr[-2000:])
+        reports.append(json.loads(result.stdout.strip().splitlines()[-1]))
+        print(json.dumps(reports[-1]))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(reports, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Check that the warehouse cleans raw store CSVs like DataPreprocessor does.
+
+Copies the raw CSVs to a temporary directory, appends rows with awkward
+values (several dots, commas, signs, junk, blanks), then cleans them with
+``DataPreprocessor.clean_*`` and with the warehouse's ``CLEAN_RAW_SQL`` and
+compares app size, price and downloads row by row. Exits non-zero if any
+value differs:
+
+    python benchmarks/warehouse_parity.py
+    python benchmarks/warehouse_parity.py --raw-dir /tmp/raw --show 20
+"""
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+from src.data.preprocessor import DataPreprocessor
+from src.data.warehouse import Warehouse
+from src.utils.logging_config import setup_logging
+
+# (App Size, App Price, Downloads) values the two cleaning paths must agree on
+EDGE_CASES = [
+    ('1.2.3 MB', '$1.2.3', '1.2.3K+'),
+    ('. MB', '$.', '.+'),
+    ('1,024 MB', '$1,000', '1,000+'),
+    ('-5 MB', '$-0.99', '-10K+'),
+    ('+5 MB', '$+0.99', '+5M+'),
+    ('abc', 'Paid', 'many'),
+    ('', '', ''),
+    (' 12.5 MB ', ' $ 4.99', ' 10K+ '),
+    ('.5 MB', '$5.', '0.5M+'),
+    ('7MB', 'Free', '1KM+'),
+    ('0 MB', '$0', '0+'),
+    ('999999999 MB', 'Free with In-App Purchases', '2.5B+'),
+]
+COLUMNS = [
+    ('app_size_mb', 'App Size', 'clean_app_size'),
+    ('price_usd', 'App Price', 'clean_app_price'),
+    ('downloads', 'Downloads', 'clean_downloads'),
+]
+
+def raw_with_edge_cases(raw_dir, tmp_dir):
+    for filename in DataPreprocessor.STORE_FILES.values():
+        raw = pd.read_csv(Path(raw_dir) / filename, dtype=str, keep_default_na=False)
+        edge = pd.DataFrame([{'App Name': f'Edge {i}', 'App Size': size, 'App Price': price,
+                              'App Type': 'Games', 'App Version': '1.0', 'User Rating': '4.0',
+                              'Downloads': downloads}
+                             for i, (size, price, downloads) in enumerate(EDGE_CASES)])
+        pd.concat([raw, edge], ignore_index=True).to_csv(Path(tmp_dir) / filename, index=False)
+
+def python_cleaned(data_dir):
+    preprocessor = DataPreprocessor(data_dir=data_dir)
+    preprocessor.load_data()
+    frames = []
+    for store, df in preprocessor.store_data.items():
+        cleaned = pd.DataFrame({'store': store, 'row': np.arange(len(df))})
+        for column, raw, clean in COLUMNS:
+            cleaned[column], _ = preprocessor._clean_column(df[raw], getattr(preprocessor, clean))
+            cleaned['raw_' + column] = df[raw].to_numpy()
+        frames.append(cleaned)
+    return pd.concat(frames, ignore_index=True)
+
+def sql_cleaned(data_dir, tmp_dir):
+    with Warehouse(Path(tmp_dir) / 'parity.sqlite') as warehouse:
+        warehouse.load_raw_csvs(data_dir, DataPreprocessor.STORE_FILES)
+        apps = warehouse.query(
+            "SELECT store, CAST(SUBSTR(app_id, 5) AS INTEGER) AS row, app_size_mb, price_usd, downloads "
+            "FROM apps WHERE app_id LIKE 'raw:%'"
+        )
+    return apps
+
+def compare(raw_dir, show):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = Path(tmp_dir) / 'raw'
+        data_dir.mkdir()
+        raw_with_edge_cases(raw_dir, data_dir)
+        python = python_cleaned(data_dir)
+        sql = sql_cleaned(data_dir, tmp_dir)
+
+    merged = python.merge(sql, on=['store', 'row'], how='outer', suffixes=('_python', '_sql'), indicator=True)
+    missing = int((merged['_merge'] != 'both').sum())
+    mismatches = 0
+    for column, raw, _ in COLUMNS:
+        left = merged[column + '_python'].astype(float)
+        right = merged[column + '_sql'].astype(float)
+        differs = ~(np.isclose(left, right, rtol=1e-12, atol=0) | (left.isna() & right.isna()))
+        mismatches += int(differs.sum())
+        print(f"{column}: {int(differs.sum())} of {len(merged)} rows differ "
+              f"({int(left.isna().sum())} unparsable in Python, {int(right.isna().sum())} in SQL)")
+        for _, row in merged[differs].head(show).iterrows():
+            print(f"  {row['store']} row {row['row']}: {row['raw_' + column]!r} -> "
+                  f"Python {row[column + '_python']}, SQL {row[column + '_sql']}")
+    if missing:
+        print(f"{missing} rows are missing from one of the paths")
+    return mismatches + missing
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--raw-dir', default=str(root_dir / 'src' / 'data' / 'raw'),
+                        help='Directory with the raw store CSVs (default: src/data/raw)')
+    parser.add_argument('--show', type=int, default=10, help='Differing rows printed per column')
+    args = parser.parse_args()
+
+    setup_logging()
+    if compare(args.raw_dir, args.show):
+        sys.exit(1)
+    print('Python and SQL cleaning agree')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""Resumable collection jobs backed by a SQLite journal.
+
+A :class:`CollectionJob` keeps one row per app ID with its status, attempt
+count, next retry time, last error and the fetched record as JSON. IDs are
+processed in batches and each batch is committed in one transaction, so a
+crash loses at most the batch in flight; running the job again skips IDs that
+are already done and picks up pending ones where it stopped. Failed fetches
+are retried with exponential backoff until ``max_attempts`` is reached.
+
+The journal uses WAL mode, so results can be read (e.g. with the ``sqlite3``
+shell) while a job is running.
+"""
+import json
+import logging
+import random
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+DONE = 'done'
+EMPTY = 'empty'  # fetched, but the store has no record for the ID
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    app_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    result TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS items_pending ON items (status, next_attempt);
+"""
+
+class CollectionJob:
+    """Fetch records for a set of app IDs with a durable per-ID journal."""
+
+    def __init__(self, path: Path, batch_size: int = 50, max_attempts: int = 5,
+                 base_delay: float = 1.0, max_delay: float = 300.0):
+        """
+        Args:
+            path: SQLite journal file, created if missing.
+            batch_size: IDs fetched per committed batch.
+            max_attempts: Attempts before an ID is marked failed.
+            base_delay: Backoff before the first retry, doubled per attempt.
+            max_delay: Upper bound on the backoff in seconds.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> 'CollectionJob':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.conn.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+
+    def app_ids(self) -> Set[str]:
+        """Every ID in the journal, whatever its status."""
+        return {row[0] for row in self.conn.execute('SELECT app_id FROM items')}
+
+    def add(self, app_ids: Iterable[str]) -> int:
+        """Queue IDs that are not in the journal yet; returns the number added."""
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany('INSERT OR IGNORE INTO items (app_id) VALUES (?)',
+                                  ((str(app_id),) for app_id in app_ids))
+            return self.conn.total_changes - before
+
+    def retry_failed(self) -> int:
+        """Reset failed IDs to pending with a fresh attempt budget."""
+        with self.conn:
+            return self.conn.execute(
+                'UPDATE items SET status = ?, attempts = 0, next_attempt = 0 WHERE status = ?',
+                (PENDING, FAILED)
+            ).rowcount
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        # Jitter keeps retries of a failed batch from hitting the store at once
+        return delay * random.uniform(0.5, 1.0)
+
+    def _next_batch(self) -> List[sqlite3.Row]:
+        return self.conn.execute(
+            'SELECT app_id, attempts FROM items WHERE status = ? AND next_attempt <= ? '
+            'ORDER BY next_attempt, rowid LIMIT ?',
+            (PENDING, time.time(), self.batch_size)
+        ).fetchall()
+
+    def _earliest_retry(self) -> Optional[float]:
+        row = self.conn.execute('SELECT MIN(next_attempt) FROM items WHERE status = ?', (PENDING,)).fetchone()
+        return row[0]
+
+    def run(self, fetch: Callable[[str], Optional[Dict[str, Any]]],
+            limit: Optional[int] = None) -> Dict[str, Any]:
+        """Fetch pending IDs until none are left and return run statistics.
+
+        ``fetch`` returns a record, or None if the store has no such app, and
+        raises on errors that are worth retrying, including request timeouts
+        (the store clients never wait on a connection without one). When every pending ID is
+        waiting for a retry, the job sleeps until the earliest one is due.
+        ``limit`` stops after that many fetch attempts.
+        """
+        stats = {'attempted': 0, 'succeeded': 0, 'empty': 0, 'retried': 0, 'failed': 0}
+        start = time.perf_counter()
+
+        while limit is None or stats['attempted'] < limit:
+            batch = self._next_batch()
+            if limit is not None:
+                batch = batch[:limit - stats['attempted']]
+            if not batch:
+                earliest = self._earliest_retry()
+                if earliest is None:
+                    break
+                time.sleep(max(0.0, earliest - time.time()))
+                continue
+
+            updates = []
+            for app_id, attempts in batch:
+                attempts += 1
+                stats['attempted'] += 1
+                now = time.time()
+                try:
+                    record = fetch(app_id)
+                except Exception as e:
+                    if attempts >= self.max_attempts:
+                        stats['failed'] += 1
+                        status, next_attempt = FAILED, now
+                        logger.error("Giving up on %s after %s attempts: %s", app_id, attempts, e)
+                    else:
+                        stats['retried'] += 1
+                        status, next_attempt = PENDING, now + self._backoff(attempts)
+                        logger.warning("Attempt %s for %s failed, retrying: %s", attempts, app_id, e)
+                    updates.append((status, attempts, next_attempt, str(e), None, now, app_id))
+                    continue
+
+                if record is None:
+                    stats['empty'] += 1
+                    updates.append((EMPTY, attempts, now, None, None, now, app_id))
+                else:
+                    stats['succeeded'] += 1
+                    updates.append((DONE, attempts, now, None, json.dumps(record, default=str), now, app_id))
+
+            with self.conn:
+                self.conn.executemany(
+                    'UPDATE items SET status = ?, attempts = ?, next_attempt = ?, last_error = ?, '
+                    'result = ?, updated = ? WHERE app_id = ?', updates
+                )
+
+        seconds = time.perf_counter() - start
+        stats['seconds'] = round(seconds, 3)
+        stats['per_second'] = round(stats['attempted'] / seconds, 2) if seconds > 0 else 0.0
+        stats['status'] = self.status_counts()
+        logger.info("Collection job %s: %s", self.path, stats)
+        return stats
+
+    def status_counts(self) -> Dict[str, int]:
+        return dict(self.conn.execute('SELECT status, COUNT(*) FROM items GROUP BY status').fetchall())
+
+    def results(self) -> List[Dict[str, Any]]:
+        """Records fetched so far, in the order the IDs were added."""
+        rows = self.conn.execute('SELECT result FROM items WHERE status = ? ORDER BY rowid', (DONE,))
+        return [json.loads(result) for (result,) in rows]
+
+    def failures(self) -> Dict[str, str]:
+        """Last error for each ID that ran out of attempts."""
+        return dict(self.conn.execute('SELECT app_id, last_error FROM items WHERE status = ?', (FAILED,)).fetchall())
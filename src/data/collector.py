@@ -2,163 +2,192 @@ import os
 import pandas as pd
 import logging
 from abc import ABC, abstractmethod
-from .platform_apis import GooglePlayAPI, AppleAppStoreAPI, AmazonAppStoreAPI
+from .collection_job import CollectionJob
+from .discovery import discover_app_ids
+from .platform_apis import GooglePlayAPI, AppleAppStoreAPI, AmazonAppStoreAPI, load_env
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 class AppStoreCollector(ABC):
     """Abstract base class for app store data collection."""
     
-    def __init__(self):
+    # Store key used in the warehouse and by DataPreprocessor
+    store = None
+    
+    def __init__(self, warehouse=None):
+        """With a ``data.warehouse.Warehouse``, apps and reviews are also stored there."""
+        load_env()
+        self.warehouse = warehouse
         self.max_apps = int(os.getenv('MAX_APPS_PER_PLATFORM', 1000))
         self.data_dir = os.path.join('data', self.__class__.__name__.lower())
         os.makedirs(self.data_dir, exist_ok=True)
     
     @abstractmethod
-    def collect_app_data(self):
-        """Collect app data from the store."""
+    def sample_app_ids(self):
+        """Well-known app IDs, collected when discovery finds nothing."""
         pass
     
+    def app_ids(self, limit=None, exclude=()):
+        """Discover up to ``limit`` (default ``max_apps``) app IDs not in ``exclude`` by crawling the store."""
+        limit = self.max_apps if limit is None else limit
+        exclude = set(exclude)
+        app_ids = discover_app_ids(
+            self.api, limit,
+            workers=int(os.getenv('DISCOVERY_WORKERS', 4)),
+            delay=float(os.getenv('DISCOVERY_DELAY', 0.5)),
+            exclude=exclude
+        )
+        if not app_ids:
+            logger.warning('Discovery found no new app IDs, collecting the sample apps')
+            return [app_id for app_id in self.sample_app_ids() if app_id not in exclude][:limit]
+        return app_ids
+    
+    def collection_job(self):
+        """Open the journal of this collector's app detail fetches."""
+        return CollectionJob(
+            os.path.join(self.data_dir, 'collection.sqlite'),
+            batch_size=int(os.getenv('COLLECTION_BATCH_SIZE', 50)),
+            max_attempts=int(os.getenv('COLLECTION_MAX_ATTEMPTS', 5)),
+            base_delay=float(os.getenv('COLLECTION_RETRY_DELAY', 1.0))
+        )
+    
+    def collect_app_data(self):
+        """Collect app data from the store.
+        
+        Progress is journaled in ``collection.sqlite`` next to ``apps.csv``, so
+        an interrupted run resumes where it stopped and IDs collected by an
+        earlier run are not fetched again. IDs that ran out of attempts get a
+        fresh retry budget. Delete the journal to start over.
+        """
+        logger.info('Starting %s data collection', self.__class__.__name__)
+        with self.collection_job() as job:
+            # A resumed run only crawls for IDs that are not journaled yet
+            missing = self.max_apps - len(job)
+            added = job.add(self.app_ids(missing, exclude=job.app_ids())) if missing > 0 else 0
+            retried = job.retry_failed()
+            logger.info('Queued %s new app IDs, retrying %s failed ones', added, retried)
+            stats = job.run(self.api.fetch_app_details)
+            logger.info('Fetched %s apps (%s retried, %s failed) at %s/s',
+                        stats['succeeded'], stats['retried'], stats['failed'], stats['per_second'])
+            apps = self.save_data(job.results(), 'apps.csv')
+        if self.warehouse is not None:
+            self.warehouse.upsert_apps(self.store, apps)
+        return apps
+    
     @abstractmethod
     def collect_reviews(self, app_id):
         """Collect reviews for a specific app."""
         pass
     
+    def save_reviews(self, app_id, reviews):
+        """Save an app's reviews to the warehouse, or to a CSV file without one."""
+        if self.warehouse is None:
+            return self.save_data(reviews, f'reviews_{app_id}.csv')
+        self.warehouse.replace_reviews(self.store, app_id, reviews)
+        return pd.DataFrame(reviews)
+    
+    def has_reviews(self, app_id):
+        """Whether reviews of this app were collected already."""
+        if self.warehouse is None:
+            return os.path.exists(os.path.join(self.data_dir, f'reviews_{app_id}.csv'))
+        return self.warehouse.has_reviews(self.store, app_id)
+    
     def save_data(self, data, filename):
         """Save collected data to CSV file."""
         try:
             df = pd.DataFrame(data)
             filepath = os.path.join(self.data_dir, filename)
             df.to_csv(filepath, index=False)
-            logger.info(f'Successfully saved {len(df)} records to {filepath}')
+            logger.info('Successfully saved %s records to %s', len(df), filepath)
             return df
         except Exception as e:
-            logger.error(f'Error saving data to {filename}: {str(e)}')
+            logger.error('Error saving data to %s: %s', filename, e)
             return pd.DataFrame()
 
 class GooglePlayCollector(AppStoreCollector):
-    def __init__(self):
-        super().__init__()
+    store = 'google_play'
+    
+    def __init__(self, warehouse=None):
+        super().__init__(warehouse)
         self.api = GooglePlayAPI()
         
-    def collect_app_data(self):
-        """Collect app data from Google Play Store."""
-        logger.info('Starting Google Play Store data collection')
-        
-        # Example app IDs (in practice, you would get these from a search or category listing)
-        sample_app_ids = [
+    def sample_app_ids(self):
+        """Sample app IDs from Google Play Store."""
+        return [
             'com.whatsapp',
             'com.facebook.katana',
             'com.instagram.android',
             'com.spotify.music',
             'com.netflix.mediaclient'
         ]
-        
-        app_data = []
-        for app_id in sample_app_ids[:self.max_apps]:
-            try:
-                data = self.api.get_app_details(app_id)
-                if data:
-                    app_data.append(data)
-            except Exception as e:
-                logger.error(f"Error collecting data for {app_id}: {str(e)}")
-        
-        return self.save_data(app_data, 'apps.csv')
     
     def collect_reviews(self, app_id):
         """Collect reviews from Google Play Store."""
-        logger.info(f'Collecting reviews for app {app_id}')
+        logger.info('Collecting reviews for app %s', app_id)
         
         try:
             reviews = self.api.get_app_reviews(app_id)
-            return self.save_data(reviews, f'reviews_{app_id}.csv')
+            return self.save_reviews(app_id, reviews)
         except Exception as e:
-            logger.error(f"Error collecting reviews for {app_id}: {str(e)}")
+            logger.error("Error collecting reviews for %s: %s", app_id, e)
             return pd.DataFrame()
 
 class AppleAppStoreCollector(AppStoreCollector):
-    def __init__(self):
-        super().__init__()
+    store = 'apple'
+    
+    def __init__(self, warehouse=None):
+        super().__init__(warehouse)
         self.api = AppleAppStoreAPI()
         
-    def collect_app_data(self):
-        """Collect app data from Apple App Store."""
-        logger.info('Starting Apple App Store data collection')
-        
+    def sample_app_ids(self):
+        """Sample app IDs from Apple App Store."""
         # Example app IDs
-        sample_app_ids = [
+        return [
             '310633997',  # WhatsApp
             '284882215',  # Facebook
             '389801252',  # Instagram
             '324684580',  # Spotify
             '363590051'   # Netflix
         ]
-        
-        app_data = []
-        for app_id in sample_app_ids[:self.max_apps]:
-            try:
-                data = self.api.get_app_details(app_id)
-                if data:
-                    app_data.append(data)
-            except Exception as e:
-                logger.error(f"Error collecting data for {app_id}: {str(e)}")
-        
-        return self.save_data(app_data, 'apps.csv')
     
     def collect_reviews(self, app_id):
         """Collect reviews from Apple App Store."""
-        logger.info(f'Collecting reviews for app {app_id}')
+        logger.info('Collecting reviews for app %s', app_id)
         
         try:
             reviews = self.api.get_app_reviews(app_id)
-            return self.save_data(reviews, f'reviews_{app_id}.csv')
+            return self.save_reviews(app_id, reviews)
         except Exception as e:
-            logger.error(f"Error collecting reviews for {app_id}: {str(e)}")
+            logger.error("Error collecting reviews for %s: %s", app_id, e)
             return pd.DataFrame()
 
 class AmazonAppStoreCollector(AppStoreCollector):
-    def __init__(self):
-        super().__init__()
+    store = 'amazon'
+    
+    def __init__(self, warehouse=None):
+        super().__init__(warehouse)
         self.api = AmazonAppStoreAPI()
         
-    def collect_app_data(self):
-        """Collect app data from Amazon App Store."""
-        logger.info('Starting Amazon App Store data collection')
-        
+    def sample_app_ids(self):
+        """Sample app IDs from Amazon App Store."""
         # Example app IDs (ASIN)
-        sample_app_ids = [
+        return [
             'B00YVBFAZG',  # WhatsApp
             'B0094BB4TW',  # Facebook
             'B00387DT2A',  # Instagram
             'B004DTBKRO',  # Spotify
             'B005ZXWMUS'   # Netflix
         ]
-        
-        app_data = []
-        for app_id in sample_app_ids[:self.max_apps]:
-            try:
-                data = self.api.get_app_details(app_id)
-                if data:
-                    app_data.append(data)
-            except Exception as e:
-                logger.error(f"Error collecting data for {app_id}: {str(e)}")
-        
-        return self.save_data(app_data, 'apps.csv')
     
     def collect_reviews(self, app_id):
         """Collect reviews from Amazon App Store."""
-        logger.info(f'Collecting reviews for app {app_id}')
+        logger.info('Collecting reviews for app %s', app_id)
         
         try:
             reviews = self.api.get_app_reviews(app_id)
-            return self.save_data(reviews, f'reviews_{app_id}.csv')
+            return self.save_reviews(app_id, reviews)
         except Exception as e:
-            logger.error(f"Error collecting reviews for {app_id}: {str(e)}")
+            logger.error("Error collecting reviews for %s: %s", app_id, e)
             return pd.DataFrame()
 
 def main():
@@ -173,7 +202,9 @@ def main():
         try:
             collector.collect_app_data()
         except Exception as e:
-            logger.error(f'Error collecting data from {collector.__class__.__name__}: {str(e)}')
+            logger.error('Error collecting data from %s: %s', collector.__class__.__name__, e)
 
 if __name__ == '__main__':
+    from src.utils.logging_config import setup_logging
+    setup_logging()
     main()
@@ -0,0 +1,96 @@
+"""Ingest-time deduplication of app store records.
+
+The raw store CSVs list the same app many times, often with differing size,
+price or rating. Each processed row is hashed twice with the vectorized
+``pd.util.hash_pandas_object``: once on its app key (store and normalized
+name) and once on the whole normalized record (text lower-cased and
+whitespace-collapsed, numbers rounded), so both kinds of duplicate are found
+in one pass without comparing rows. :func:`deduplicate` then applies a policy:
+
+* ``none``: keep every row and only report statistics;
+* ``drop``: drop exact duplicate records, keeping the first;
+* ``keep_latest``: keep one row per app, the one with the highest parsed
+  version (later in the file on ties);
+* ``aggregate``: like ``keep_latest``, with the rating averaged and size,
+  price and downloads replaced by their medians over the app's rows.
+"""
+import logging
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEDUP_POLICIES = ('none', 'drop', 'keep_latest', 'aggregate')
+
+TEXT_COLUMNS = ['store', 'app_name', 'app_type', 'app_version']
+NUMERIC_COLUMNS = ['app_size_mb', 'price_usd', 'user_rating', 'downloads']
+AGGREGATIONS = {'user_rating': 'mean', 'app_size_mb': 'median', 'price_usd': 'median', 'downloads': 'median'}
+
+def _normalize_text(values: pd.Series) -> np.ndarray:
+    """Lower-cased, whitespace-collapsed strings, normalized once per distinct value."""
+    codes, uniques = pd.factorize(values)
+    normalized = pd.Index(uniques).astype(str).str.lower().str.split().str.join(' ')
+    return np.append(np.asarray(normalized, dtype=object), '')[codes]
+
+def record_hashes(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """uint64 hashes of each row's app key (store, name) and of its whole normalized record."""
+    text = pd.DataFrame({column: _normalize_text(df[column]) for column in TEXT_COLUMNS if column in df})
+    app_keys = pd.util.hash_pandas_object(text[['store', 'app_name']], index=False).to_numpy()
+    numeric = pd.DataFrame({column: pd.to_numeric(df[column], errors='coerce').round(6).to_numpy()
+                            for column in NUMERIC_COLUMNS if column in df})
+    records = pd.util.hash_pandas_object(pd.concat([text, numeric], axis=1), index=False).to_numpy()
+    return app_keys, records
+
+def _latest_rows(df: pd.DataFrame, app: np.ndarray) -> np.ndarray:
+    """Position of each app's latest row: highest parsed version, then last in file."""
+    position = np.arange(len(df))
+    versions = [df[column].to_numpy() for column in ('version_patch', 'version_minor', 'version_major')
+                if column in df]
+    order = np.lexsort([position, *versions, app])
+    last = np.ones(len(order), dtype=bool)
+    last[:-1] = app[order][1:] != app[order][:-1]
+    return order[last]
+
+def deduplicate(df: pd.DataFrame, policy: str = 'none') -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Apply a dedup ``policy`` (see :data:`DEDUP_POLICIES`) and return the rows and duplicate statistics."""
+    if policy not in DEDUP_POLICIES:
+        raise ValueError(f"Unknown dedup policy {policy!r}, expected one of {DEDUP_POLICIES}")
+    app_keys, records = record_hashes(df)
+    app = pd.factorize(app_keys)[0]
+    exact = pd.Series(records).duplicated().to_numpy()
+    rows_per_app = np.bincount(app)
+    records_per_app = np.bincount(app[~exact], minlength=len(rows_per_app))
+
+    if policy == 'none':
+        result = df
+    elif policy == 'drop':
+        result = df[~exact].reset_index(drop=True)
+    else:
+        latest = _latest_rows(df, app)
+        result = df.iloc[latest].reset_index(drop=True)
+        if policy == 'aggregate':
+            for column, how in AGGREGATIONS.items():
+                if column in df:
+                    values = pd.to_numeric(df[column], errors='coerce').groupby(app).agg(how)
+                    result[column] = values.to_numpy()[app[latest]]
+
+    stats = {
+        'policy': policy,
+        'rows': len(df),
+        'apps': len(rows_per_app),
+        'duplicate_rows': int(len(df) - len(rows_per_app)),
+        'exact_duplicates': int(exact.sum()),
+        'apps_with_duplicates': int((rows_per_app > 1).sum()),
+        'conflicting_apps': int((records_per_app > 1).sum()),
+        'rows_after': len(result),
+        'duplicate_rows_by_store': (
+            pd.Series(rows_per_app - 1).groupby(df['store'].to_numpy()[np.unique(app, return_index=True)[1]])
+            .sum().astype(int).to_dict() if len(df) else {}
+        )
+    }
+    logger.info("Dedup (%s): %s rows of %s apps, %s exact duplicates, %s apps with conflicting rows; kept %s rows",
+                policy, stats['rows'], stats['apps'], stats['exact_duplicates'], stats['conflicting_apps'],
+                stats['rows_after'])
+    return result, stats
@@ -0,0 +1,316 @@
+"""Link the same app across stores and derive cross-store features.
+
+Store listings name an app differently ("Spotify: Music and Podcasts" on
+Amazon, "Spotify - Music and Podcasts" on Google Play) and share no ID.
+:func:`resolve_entities` normalizes each distinct name to a key (accents,
+punctuation, subtitles after ":" or " - " and filler words such as "app"
+removed) and links keys across stores in three steps:
+
+* blocking: a sparse key x character-trigram matrix is the inverted index;
+  multiplying its rare-trigram columns by their transpose lists the keys that
+  share a trigram, so the work grows with block sizes instead of all pairs.
+  Trigrams in more than ``max_block_size`` keys are too common to block on.
+  Identical keys are always candidates;
+* scoring: trigram Jaccard similarity of the keys, blended with metadata
+  agreement (app type, free vs paid, size within 2x);
+* clustering: pairs above ``threshold`` are merged best first with a
+  union-find that allows at most one key per store in an entity.
+
+Every entity gets a canonical ``app_entity_id`` slug from the key most of its
+stores use. :func:`add_entity_features` adds the ID and :data:`ENTITY_FEATURES`:
+the number of stores an app is listed in and its mean downloads in the other
+stores. Aggregates of other stores' ratings are deliberately not offered: the
+rating is the training target, so they would leak the labels of rows on the
+other side of a split.
+
+The features are computed from an :class:`EntityIndex`, which is saved with
+the model so the predictor builds the same features for a request: it looks
+the request's normalized name up among the training listings and aggregates
+that entity's stores.
+"""
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Set
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ENTITY_FEATURES = ['cross_store_count', 'cross_store_downloads']
+
+# Store subtitles ("Spotify: Music and Podcasts") and filler words that differ between listings
+SUBTITLE = r'\s[-–—|]\s|:'
+FILLER_WORDS = r'\b(?:the|app|apps|official|mobile|for|free|hd)\b'
+
+def normalize_names(names: pd.Series) -> pd.Series:
+    """Lower-case ASCII key of each app name without subtitle, punctuation and filler words."""
+    names = names.astype('string').fillna('')
+    core = names.str.split(SUBTITLE, n=1, regex=True).str[0]
+    ascii_names = [core, names]
+    for i, text in enumerate(ascii_names):
+        text = text.str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii').str.lower()
+        ascii_names[i] = text.str.replace('&', ' and ', regex=False).str.replace(r'[^a-z0-9]+', ' ', regex=True)
+    core, full = ascii_names
+    keys = core.str.replace(FILLER_WORDS, ' ', regex=True).str.split().str.join(' ')
+    # Names made only of filler ("The App") keep their words
+    return keys.where(keys != '', full.str.split().str.join(' ')).astype(object)
+
+def _ngrams(key: str, n: int) -> Set[str]:
+    padded = f' {key} '
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+def _gram_matrix(keys: List[str], n: int):
+    """Binary CSR matrix of keys x character n-grams."""
+    from scipy import sparse
+    grams = [_ngrams(key, n) for key in keys]
+    codes, vocabulary = pd.factorize(pd.Series([gram for key_grams in grams for gram in key_grams], dtype=object))
+    indptr = np.concatenate([[0], np.cumsum([len(key_grams) for key_grams in grams])])
+    return sparse.csr_matrix((np.ones(len(codes), dtype=np.int32), codes, indptr),
+                             shape=(len(keys), len(vocabulary)))
+
+def _candidate_pairs(records: pd.DataFrame, matrix, max_block_size: int):
+    """Index pairs (left < right) of keys from different stores that share a rare n-gram or the key."""
+    from scipy import sparse
+    document_frequency = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    blocks = matrix[:, np.flatnonzero(document_frequency <= max_block_size)]
+    shared = sparse.triu(blocks @ blocks.T, k=1).tocoo()
+    # Keys made only of common n-grams ("google") still match themselves exactly
+    same_key = records.reset_index().merge(records.reset_index(), on='key')
+    same_key = same_key[same_key['index_x'] < same_key['index_y']]
+    left = np.concatenate([shared.row, same_key['index_x'].to_numpy()]).astype(np.int64)
+    right = np.concatenate([shared.col, same_key['index_y'].to_numpy()]).astype(np.int64)
+    pairs = np.unique(left * len(records) + right)
+    left, right = pairs // len(records), pairs % len(records)
+    stores = records['store_code'].to_numpy()
+    cross = stores[left] != stores[right]
+    return left[cross], right[cross]
+
+def _score_pairs(records: pd.DataFrame, matrix, left: np.ndarray, right: np.ndarray,
+                 name_weight: float) -> np.ndarray:
+    """Blend of key n-gram Jaccard similarity and metadata agreement for each pair."""
+    shared = np.asarray(matrix[left].multiply(matrix[right]).sum(axis=1)).ravel()
+    sizes = np.diff(matrix.indptr)
+    name_similarity = shared / (sizes[left] + sizes[right] - shared)
+
+    app_type = records['app_type'].to_numpy()
+    paid = records['price_usd'].to_numpy() > 0
+    size = records['app_size_mb'].to_numpy(dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        close_size = np.fmin(size[left], size[right]) >= 0.5 * np.fmax(size[left], size[right])
+    metadata = ((app_type[left] == app_type[right]).astype(float) + (paid[left] == paid[right])
+                + close_size) / 3
+    return name_weight * name_similarity + (1 - name_weight) * metadata
+
+def _cluster(n_records: int, store_codes: np.ndarray, left: np.ndarray, right: np.ndarray,
+             scores: np.ndarray):
+    """Greedy union-find over pairs, best score first, keeping one record per store in each cluster."""
+    parent = list(range(n_records))
+    stores = [1 << int(code) for code in store_codes]
+    match_score = [np.nan] * n_records
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    order = np.argsort(-scores, kind='stable')
+    for i, j, score in zip(left[order].tolist(), right[order].tolist(), scores[order].tolist()):
+        a, b = find(i), find(j)
+        if a == b or stores[a] & stores[b]:
+            continue
+        parent[b] = a
+        stores[a] |= stores[b]
+        for k in (i, j):
+            if np.isnan(match_score[k]):
+                match_score[k] = score
+    return np.array([find(i) for i in range(n_records)]), np.array(match_score)
+
+def _resolve(apps: pd.DataFrame, threshold: float, name_weight: float, ngram: int, max_block_size: int):
+    """Entities of the distinct (store, app_name) pairs and the pair index of each row."""
+    pair = apps.groupby(['store', 'app_name'], sort=False, dropna=False).ngroup().to_numpy()
+    first_rows = np.unique(pair, return_index=True)[1]
+    names = apps[['store', 'app_name']].iloc[first_rows].reset_index(drop=True)
+    names['key'] = normalize_names(names['app_name']).to_numpy()
+
+    # A record is a key within a store, with the median price and size and most common type of its rows
+    name_record = names.groupby(['store', 'key'], sort=False).ngroup().to_numpy()
+    records = names.drop_duplicates(['store', 'key'])[['store', 'key']].reset_index(drop=True)
+    row_record = name_record[pair]
+    records['rows'] = np.bincount(row_record, minlength=len(records))
+    for column in ('price_usd', 'app_size_mb'):
+        records[column] = pd.Series(apps[column].to_numpy()).groupby(row_record).median()
+    type_code, types = pd.factorize(apps['app_type'])
+    typed = type_code >= 0
+    type_counts = np.bincount(row_record[typed] * len(types) + type_code[typed],
+                              minlength=len(records) * len(types)).reshape(len(records), len(types))
+    top_type = np.asarray(types, dtype=object)[type_counts.argmax(axis=1)] if len(types) else None
+    records['app_type'] = np.where(type_counts.sum(axis=1) > 0, top_type, None)
+    records['store_code'] = pd.factorize(records['store'])[0]
+    matched = records[records['key'] != ''].reset_index(drop=True)
+
+    matrix = _gram_matrix(matched['key'].tolist(), ngram)
+    left, right = _candidate_pairs(matched, matrix, max_block_size)
+    scores = _score_pairs(matched, matrix, left, right, name_weight)
+    accepted = scores >= threshold
+    root, match_score = _cluster(len(matched), matched['store_code'].to_numpy(),
+                                 left[accepted], right[accepted], scores[accepted])
+    matched['root'] = root
+    matched['match_score'] = match_score
+
+    # Canonical ID: slug of the entity's key listed in most stores, then with most rows,
+    # numbered if two entities share it
+    canonical = matched.groupby(['root', 'key'], as_index=False).agg(stores=('store', 'size'), rows=('rows', 'sum'))
+    canonical = canonical.sort_values(['stores', 'rows', 'key'], ascending=[False, False, True], kind='stable')
+    canonical = canonical.drop_duplicates('root').sort_values('key', kind='stable')
+    slugs = canonical['key'].str.replace(' ', '-', regex=False)
+    number = slugs.groupby(slugs).cumcount()
+    slugs = slugs.where(number == 0, slugs + '-' + (number + 1).astype(str))
+    matched['app_entity_id'] = matched['root'].map(pd.Series(slugs.to_numpy(), index=canonical['root']))
+
+    entities = names.merge(matched[['store', 'key', 'app_entity_id', 'match_score', 'rows']],
+                           on=['store', 'key'], how='left')
+    entities['app_entity_id'] = entities['app_entity_id'].astype(object).where(entities['app_entity_id'].notna(), None)
+    entities['rows'] = np.bincount(pair, minlength=len(names))
+
+    linked = matched.groupby('root')['store'].transform('size') > 1
+    logger.info("Resolved %s store listings into %s apps (%s candidate pairs, %s listings linked)",
+                len(matched), matched['root'].nunique(), len(left), int(linked.sum()))
+    return entities, pair
+
+def resolve_entities(apps: pd.DataFrame, threshold: float = 0.75, name_weight: float = 0.8,
+                     ngram: int = 3, max_block_size: int = 50) -> pd.DataFrame:
+    """Link the app names of ``apps`` (rows with store, app_name and metadata) across stores.
+
+    Returns one row per distinct (store, app_name), in order of first
+    appearance, with its ``key``, canonical ``app_entity_id`` (None for
+    blank names), ``match_score`` (best score that linked it, NaN if it is
+    only listed in one store) and ``rows``.
+    """
+    return _resolve(apps, threshold, name_weight, ngram, max_block_size)[0]
+
+class EntityIndex:
+    """Stores and downloads of the resolved training entities, to build :data:`ENTITY_FEATURES` for any row."""
+
+    def __init__(self, stores: Sequence[str], keys: Dict[str, Dict[str, int]], downloads_sum: Any,
+                 counts: Any, default_downloads: float):
+        """
+        Args:
+            stores: Store names, the columns of ``downloads_sum`` and ``counts``.
+            keys: Entity code of each normalized name key, per store.
+            downloads_sum: Summed downloads of each entity's rows per store.
+            counts: Rows of each entity per store.
+            default_downloads: ``cross_store_downloads`` of apps no other store lists.
+        """
+        self.stores = list(stores)
+        self.keys = keys
+        self.downloads_sum = np.asarray(downloads_sum, dtype=np.float64).reshape(-1, len(self.stores))
+        self.counts = np.asarray(counts, dtype=np.int64).reshape(-1, len(self.stores))
+        self.default_downloads = float(default_downloads)
+        # Requests from a store the name was never listed in match the key in any store
+        self._any_store = {}
+        for store_keys in self.keys.values():
+            for key, entity in store_keys.items():
+                self._any_store.setdefault(key, entity)
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def features(self, entity: np.ndarray, store: np.ndarray) -> pd.DataFrame:
+        """:data:`ENTITY_FEATURES` of rows with these entity and store codes (-1 for none or unknown).
+
+        ``cross_store_count`` counts the row's own store too, so it is 1 for
+        apps listed nowhere else. ``cross_store_downloads`` averages the rows
+        of the entity in the other stores, never the row's own store.
+        """
+        entity, store = np.asarray(entity), np.asarray(store)
+        has_entity = (entity >= 0) & (len(self) > 0)
+        e = np.where(has_entity, entity, 0)
+        own = has_entity & (store >= 0)
+        s = np.where(own, store, 0)
+        counts = self.counts[e] if len(self) else np.zeros((len(e), len(self.stores)), dtype=np.int64)
+        sums = self.downloads_sum[e] if len(self) else np.zeros(counts.shape)
+        own_count = np.where(own, counts[np.arange(len(e)), s], 0)
+        own_sum = np.where(own, sums[np.arange(len(e)), s], 0.0)
+        other_count = counts.sum(axis=1) - own_count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            other_downloads = (sums.sum(axis=1) - own_sum) / other_count
+        # The row's own store is listed whether or not training saw the app there
+        stores_listed = (counts > 0).sum(axis=1) + (own_count == 0)
+        return pd.DataFrame({
+            'cross_store_count': np.where(has_entity, stores_listed, 1),
+            'cross_store_downloads': np.where(has_entity & (other_count > 0), other_downloads,
+                                              self.default_downloads)
+        })
+
+    def transform_records(self, records: List[Dict[str, Any]]) -> pd.DataFrame:
+        """:data:`ENTITY_FEATURES` of app dictionaries with ``name`` and ``store``, as used by the predictor."""
+        stores = [str(record.get('store', '')).lower() for record in records]
+        keys = normalize_names(pd.Series([record.get('name') for record in records], dtype=object))
+        entity = [self.keys.get(store, {}).get(key, self._any_store.get(key, -1)) for store, key in zip(stores, keys)]
+        store_codes = {store: i for i, store in enumerate(self.stores)}
+        return self.features(np.array(entity, dtype=np.int64),
+                             np.array([store_codes.get(store, -1) for store in stores], dtype=np.int64))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'stores': self.stores,
+            'keys': self.keys,
+            'downloads_sum': self.downloads_sum.tolist(),
+            'counts': self.counts.tolist(),
+            'default_downloads': self.default_downloads
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'EntityIndex':
+        return cls(state['stores'], state['keys'], state['downloads_sum'], state['counts'],
+                   state['default_downloads'])
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_text(json.dumps(self.to_dict()))
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'EntityIndex':
+        return cls.from_dict(json.loads(Path(path).read_text()))
+
+def add_entity_features(df: pd.DataFrame, threshold: float = 0.75, name_weight: float = 0.8,
+                        ngram: int = 3, max_block_size: int = 50):
+    """Add ``app_entity_id`` and :data:`ENTITY_FEATURES` to ``df`` in place.
+
+    Returns the entities (see :func:`resolve_entities`) and the
+    :class:`EntityIndex` the features were computed from.
+    """
+    entities, pair = _resolve(df, threshold, name_weight, ngram, max_block_size)
+    entity_code, entity_ids = pd.factorize(entities['app_entity_id'])
+    entity = entity_code[pair]
+    df['app_entity_id'] = entities['app_entity_id'].to_numpy()[pair]
+
+    # Rows and summed downloads per (entity, store) with bincount; rows without an entity keep -1
+    store, store_names = pd.factorize(df['store'])
+    n_stores = len(store_names)
+    downloads = pd.to_numeric(df['downloads'], errors='coerce').to_numpy(dtype=np.float64)
+    default_downloads = float(np.nanmean(downloads)) if (~np.isnan(downloads)).any() else 0.0
+    # Preprocessing imputes downloads first; anything still missing counts as the mean
+    downloads = np.where(np.isnan(downloads), default_downloads, downloads)
+    present = (entity >= 0) & (store >= 0)
+    cell = entity[present] * n_stores + store[present]
+    size = len(entity_ids) * n_stores
+    keys = {str(name): {} for name in store_names}
+    listed = entities[entity_code >= 0]
+    for name, key, code in zip(listed['store'], listed['key'], entity_code[entity_code >= 0]):
+        if name in keys:
+            keys[name][key] = int(code)
+    index = EntityIndex(
+        [str(name) for name in store_names], keys,
+        np.bincount(cell, downloads[present], minlength=size), np.bincount(cell, minlength=size),
+        default_downloads
+    )
+    features = index.features(entity, store)
+    for column in ENTITY_FEATURES:
+        df[column] = features[column].to_numpy()
+    return entities, index
@@ -0,0 +1,167 @@
+"""Single-pass parsers for Google Play and Amazon app detail pages.
+
+Pages are parsed with selectolax if it is installed, else lxml, else
+BeautifulSoup's ``html.parser`` (set ``HTML_PARSER`` to force one). Instead of
+one ``select_one`` walk per field, each parser selects every node it needs
+with a single union query and dispatches on the node, preferring the
+embedded JSON-LD ``SoftwareApplication`` block over microdata when present.
+Label/value pairs such as "Size" and "Downloads" are read from the raw HTML
+with a regex rather than by walking the DOM.
+"""
+import json
+import os
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BACKENDS = ('selectolax', 'lxml', 'bs4')
+
+def _available(name: str) -> bool:
+    from importlib.util import find_spec
+    return find_spec(name) is not None
+
+def default_backend() -> str:
+    """Backend named by ``HTML_PARSER``, or the fastest one installed."""
+    backend = os.getenv('HTML_PARSER')
+    if backend:
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown HTML_PARSER {backend!r}, expected one of {BACKENDS}")
+        return backend
+    return next(name for name in BACKENDS if name == 'bs4' or _available(name))
+
+# Each backend returns (tag, attribute getter, text) for the nodes matching a
+# CSS selector (an XPath expression for lxml), in document order.
+Node = Tuple[str, Callable[[str], Optional[str]], str]
+
+def _select_selectolax(html: str, css: str, xpath: str) -> List[Node]:
+    from selectolax.lexbor import LexborHTMLParser
+    return [(node.tag, node.attributes.get, node.text(deep=True))
+            for node in LexborHTMLParser(html).css(css)]
+
+def _select_lxml(html: str, css: str, xpath: str) -> List[Node]:
+    import lxml.html
+    return [(node.tag, node.get, node.text_content())
+            for node in lxml.html.fromstring(html).xpath(xpath)]
+
+def _select_bs4(html: str, css: str, xpath: str) -> List[Node]:
+    from bs4 import BeautifulSoup
+    return [(node.name, node.get, node.get_text())
+            for node in BeautifulSoup(html, 'html.parser').select(css)]
+
+_SELECT = {'selectolax': _select_selectolax, 'lxml': _select_lxml, 'bs4': _select_bs4}
+
+def _xpath_class(name: str) -> str:
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+def parse_size(text: str) -> float:
+    """Convert "85.5 MB", "1.2 GB" or "900 KB" to MB; 0 if there is no number."""
+    match = re.search(r'([\d.,]+)\s*([GMK])?', text or '', re.I)
+    if not match:
+        return 0
+    try:
+        number = float(match.group(1).replace(',', ''))
+    except ValueError:
+        return 0
+    unit = (match.group(2) or 'M').upper()
+    return number * {'G': 1024, 'M': 1, 'K': 1 / 1024}[unit]
+
+def parse_count(text: str) -> int:
+    """Convert "10,000,000+", "500M+" or "1B+" to an integer; 0 if there is no number."""
+    match = re.search(r'([\d.,]+)\s*([KMB])?', text or '', re.I)
+    if not match:
+        return 0
+    try:
+        number = float(match.group(1).replace(',', ''))
+    except ValueError:
+        return 0
+    return int(number * {'K': 10**3, 'M': 10**6, 'B': 10**9}.get((match.group(2) or '').upper(), 1))
+
+def parse_price(text: str) -> float:
+    """Convert "$4.99", "4.99" or "Free" to a float; 0 if there is no number."""
+    match = re.search(r'\d[\d,]*(?:\.\d+)?', text or '')
+    return float(match.group(0).replace(',', '')) if match else 0.0
+
+def _json_ld(text: str) -> Dict[str, Any]:
+    """The SoftwareApplication object of a JSON-LD block, or {}."""
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return {}
+    for item in data if isinstance(data, list) else [data]:
+        if isinstance(item, dict) and 'SoftwareApplication' in str(item.get('@type', '')):
+            return item
+    return {}
+
+def _label_value(label: str, cell: str = 'div') -> re.Pattern:
+    """Regex for the text of the element following a ``<cell>label</cell>`` element."""
+    return re.compile(rf'>\s*{label}\s*</{cell}>\s*<{cell}[^>]*>\s*([^<]+?)\s*<', re.I)
+
+GOOGLE_PLAY_CSS = 'script[type="application/ld+json"], h1, [itemprop]'
+GOOGLE_PLAY_XPATH = '//script[@type="application/ld+json"] | //h1 | //*[@itemprop]'
+GOOGLE_PLAY_SIZE = _label_value('Size')
+GOOGLE_PLAY_DOWNLOADS = _label_value('Downloads')
+
+def parse_google_play(html: str, app_id: str, backend: Optional[str] = None) -> Dict[str, Any]:
+    """Extract app details from a Google Play detail page."""
+    nodes = _SELECT[backend or default_backend()](html, GOOGLE_PLAY_CSS, GOOGLE_PLAY_XPATH)
+    ld: Dict[str, Any] = {}
+    micro: Dict[str, str] = {}
+    name = ''
+    for tag, attr, text in nodes:
+        if tag == 'script':
+            ld = ld or _json_ld(text)
+        elif tag == 'h1' and not name:
+            name = text.strip()
+        else:
+            micro.setdefault(attr('itemprop'), attr('content') or text.strip())
+
+    rating = ld.get('aggregateRating') or {}
+    offers = ld.get('offers') or {}
+    if isinstance(offers, list):
+        offers = offers[0] if offers else {}
+    price = offers.get('price', micro.get('price', '0'))
+
+    size = GOOGLE_PLAY_SIZE.search(html)
+    downloads = GOOGLE_PLAY_DOWNLOADS.search(html)
+    return {
+        'app_id': app_id,
+        'name': ld.get('name') or name,
+        'category': ld.get('applicationCategory') or micro.get('genre', ''),
+        'rating': float(rating.get('ratingValue') or micro.get('ratingValue') or 0),
+        'reviews': parse_count(str(rating.get('ratingCount') or micro.get('reviewCount') or 0)),
+        'size': parse_size(size.group(1)) if size else 0,
+        'price': parse_price(str(price)),
+        'downloads': parse_count(downloads.group(1)) if downloads else 0
+    }
+
+AMAZON_CSS = '#productTitle, #wayfinding-breadcrumbs_container a, [data-hook], .a-price-whole'
+AMAZON_XPATH = ('//*[@id="productTitle"] | //*[@id="wayfinding-breadcrumbs_container"]//a'
+                f' | //*[@data-hook] | //*[{_xpath_class("a-price-whole")}]')
+AMAZON_SIZE = _label_value('File Size', 'td')
+
+def parse_amazon(html: str, app_id: str, backend: Optional[str] = None) -> Dict[str, Any]:
+    """Extract app details from an Amazon Appstore product page."""
+    nodes = _SELECT[backend or default_backend()](html, AMAZON_CSS, AMAZON_XPATH)
+    fields: Dict[str, str] = {}
+    category = ''
+    for tag, attr, text in nodes:
+        if attr('id') == 'productTitle':
+            fields.setdefault('name', text.strip())
+        elif attr('data-hook'):
+            fields.setdefault(attr('data-hook'), text.strip())
+        elif tag == 'a':
+            category = text.strip()  # the last breadcrumb is the most specific
+        else:
+            fields.setdefault('price', text.strip())
+
+    rating = fields.get('rating-out-of-text', '').split(' ')[0]
+    size = AMAZON_SIZE.search(html)
+    return {
+        'app_id': app_id,
+        'name': fields.get('name', ''),
+        'category': category,
+        'rating': float(rating) if re.fullmatch(r'[\d.]+', rating) else 0.0,
+        'reviews': parse_count(fields.get('total-review-count', '0')),
+        'size': parse_size(size.group(1)) if size else 0,
+        'price': parse_price(fields.get('price', '')),
+        'downloads': 0  # Amazon doesn't typically show download counts
+    }
@@ -1,61 +1,120 @@
 import os
+import re
 import json
 import time
-import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from dotenv import load_dotenv
+import logging
 
-load_dotenv()
+# requests, the HTML parsers and selenium are imported where they are used, so
+# importing this module (e.g. via the collectors) stays cheap for tools that
+# never hit the network.
+
+logger = logging.getLogger(__name__)
+
+# Search terms that seed app ID discovery in every store
+DISCOVERY_TERMS = [
+    'games', 'social', 'messaging', 'video', 'music', 'photo', 'productivity', 'education',
+    'finance', 'health', 'fitness', 'shopping', 'travel', 'news', 'weather', 'sports',
+    'food', 'business', 'books', 'utilities', 'navigation', 'kids', 'dating', 'medical'
+]
+
+# Seconds to wait for a store to respond; a timed-out fetch raises and is retried by the collection job
+REQUEST_TIMEOUT = 30
+
+_env_loaded = False
+
+def load_env():
+    """Load settings from .env on first use instead of at import time."""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+def _headless_chrome():
+    """Start a headless Chrome driver for scraping dynamically loaded reviews."""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    
+    chrome_options = Options()
+    chrome_options.add_argument('--headless')
+    return webdriver.Chrome(options=chrome_options)
 
 class GooglePlayAPI:
     """Google Play Store API wrapper"""
     
     def __init__(self):
+        load_env()
         self.base_url = "https://play.google.com/store/apps"
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
         }
     
     def get_app_details(self, app_id):
-        """Get app details using web scraping (since official API is restricted)"""
-        url = f"{self.base_url}/details?id={app_id}"
-        
+        """Get app details, or None if they could not be fetched"""
         try:
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Extract app details
-            app_data = {
-                'app_id': app_id,
-                'name': self._extract_text(soup, 'h1'),
-                'category': self._extract_text(soup, '[itemprop="genre"]'),
-                'rating': self._extract_rating(soup),
-                'reviews': self._extract_reviews_count(soup),
-                'size': self._extract_size(soup),
-                'price': self._extract_price(soup),
-                'downloads': self._extract_downloads(soup)
-            }
-            
-            return app_data
-            
+            return self.fetch_app_details(app_id)
         except Exception as e:
-            print(f"Error fetching app details for {app_id}: {str(e)}")
+            logger.error("Error fetching app details for %s: %s", app_id, e)
             return None
     
+    def fetch_app_details(self, app_id):
+        """Get app details using web scraping (since official API is restricted); raises on errors"""
+        url = f"{self.base_url}/details?id={app_id}"
+        
+        import requests
+        from .page_parsers import parse_google_play
+        
+        response = requests.get(url, headers=self.headers, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        
+        return parse_google_play(response.text, app_id)
+    
+    CATEGORIES = [
+        'GAME', 'SOCIAL', 'COMMUNICATION', 'PRODUCTIVITY', 'ENTERTAINMENT', 'MUSIC_AND_AUDIO',
+        'VIDEO_PLAYERS', 'TRAVEL_AND_LOCAL', 'EDUCATION', 'TOOLS', 'FINANCE', 'HEALTH_AND_FITNESS',
+        'SHOPPING', 'PHOTOGRAPHY', 'LIFESTYLE', 'NEWS_AND_MAGAZINES', 'BOOKS_AND_REFERENCE',
+        'BUSINESS', 'SPORTS', 'WEATHER', 'MAPS_AND_NAVIGATION', 'FOOD_AND_DRINK'
+    ]
+    APP_LINK = re.compile(r'/store/apps/details\?id=([A-Za-z0-9_.]+)')
+    DEVELOPER_LINK = re.compile(r'/store/apps/dev(?:eloper)?\?id=([^"&]+)')
+    
+    def discovery_seeds(self):
+        """Category and search pages that start app ID discovery"""
+        return ([('category', category) for category in self.CATEGORIES]
+                + [('search', term) for term in DISCOVERY_TERMS])
+    
+    def discover(self, node):
+        """Fetch a listing page; returns the app IDs on it and the pages it links to.
+        
+        Detail pages are followed too, since they list similar apps and the
+        developer's other apps.
+        """
+        import requests
+        
+        kind, value = node
+        urls = {
+            'category': (f"{self.base_url}/category/{value}", None),
+            'search': ("https://play.google.com/store/search", {'q': value, 'c': 'apps'}),
+            'developer': (f"{self.base_url}/developer", {'id': value}),
+            'details': (f"{self.base_url}/details", {'id': value})
+        }
+        url, params = urls[kind]
+        response = requests.get(url, params=params, headers=self.headers, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        
+        app_ids = list(dict.fromkeys(self.APP_LINK.findall(response.text)))
+        nodes = [('details', app_id) for app_id in app_ids if app_id != value]
+        nodes += [('developer', developer) for developer in set(self.DEVELOPER_LINK.findall(response.text))]
+        return app_ids, nodes
+    
     def get_app_reviews(self, app_id, limit=100):
         """Get app reviews using Selenium (since reviews are loaded dynamically)"""
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
         
         try:
-            driver = webdriver.Chrome(options=chrome_options)
+            driver = _headless_chrome()
             url = f"{self.base_url}/details?id={app_id}&showAllReviews=true"
             driver.get(url)
             
@@ -86,122 +145,91 @@ class GooglePlayAPI:
             return reviews[:limit]
             
         except Exception as e:
-            print(f"Error fetching reviews for {app_id}: {str(e)}")
+            logger.error("Error fetching reviews for %s: %s", app_id, e)
             return []
         
         finally:
             if 'driver' in locals():
                 driver.quit()
-    
-    def _extract_text(self, soup, selector):
-        """Helper method to extract text from HTML elements"""
-        element = soup.select_one(selector)
-        return element.text.strip() if element else ''
-    
-    def _extract_rating(self, soup):
-        """Extract app rating"""
-        element = soup.select_one('[itemprop="ratingValue"]')
-        return float(element['content']) if element else 0.0
-    
-    def _extract_reviews_count(self, soup):
-        """Extract number of reviews"""
-        element = soup.select_one('[itemprop="reviewCount"]')
-        return int(element['content'].replace(',', '')) if element else 0
-    
-    def _extract_size(self, soup):
-        """Extract app size"""
-        element = soup.select_one('div:contains("Size")')
-        if element:
-            size_text = element.find_next('div').text.strip()
-            return self._parse_size(size_text)
-        return 0
-    
-    def _extract_price(self, soup):
-        """Extract app price"""
-        element = soup.select_one('[itemprop="price"]')
-        if element:
-            price_text = element['content']
-            return float(price_text.replace('$', '')) if price_text != 'Free' else 0.0
-        return 0.0
-    
-    def _extract_downloads(self, soup):
-        """Extract number of downloads"""
-        element = soup.select_one('div:contains("Downloads")')
-        if element:
-            downloads_text = element.find_next('div').text.strip()
-            return self._parse_downloads(downloads_text)
-        return 0
-    
-    def _parse_size(self, size_text):
-        """Convert size text to MB"""
-        try:
-            number = float(''.join(filter(str.isdigit, size_text)))
-            if 'GB' in size_text:
-                return number * 1024
-            return number
-        except:
-            return 0
-    
-    def _parse_downloads(self, downloads_text):
-        """Convert downloads text to number"""
-        try:
-            number = float(''.join(filter(str.isdigit, downloads_text)))
-            if 'M' in downloads_text:
-                return int(number * 1_000_000)
-            if 'K' in downloads_text:
-                return int(number * 1_000)
-            return int(number)
-        except:
-            return 0
 
 class AppleAppStoreAPI:
     """Apple App Store API wrapper"""
     
     def __init__(self):
+        load_env()
         self.base_url = "https://itunes.apple.com/lookup"
         self.search_url = "https://itunes.apple.com/search"
     
     def get_app_details(self, app_id):
-        """Get app details using iTunes API"""
+        """Get app details, or None if they could not be fetched"""
         try:
-            params = {
-                'id': app_id,
-                'entity': 'software'
-            }
-            
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            if data['resultCount'] > 0:
-                result = data['results'][0]
-                
-                app_data = {
-                    'app_id': str(result['trackId']),
-                    'name': result['trackName'],
-                    'category': result['primaryGenreName'],
-                    'rating': result.get('averageUserRating', 0),
-                    'reviews': result.get('userRatingCount', 0),
-                    'size': result['fileSizeBytes'] / (1024 * 1024),  # Convert to MB
-                    'price': result['price'],
-                    'downloads': 0  # Apple doesn't provide download counts
-                }
-                
-                return app_data
-                
-            return None
-            
+            return self.fetch_app_details(app_id)
         except Exception as e:
-            print(f"Error fetching app details for {app_id}: {str(e)}")
+            logger.error("Error fetching app details for %s: %s", app_id, e)
             return None
     
+    def fetch_app_details(self, app_id):
+        """Get app details using iTunes API; None if the app does not exist, raises on errors"""
+        import requests
+        
+        params = {
+            'id': app_id,
+            'entity': 'software'
+        }
+        
+        response = requests.get(self.base_url, params=params, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        
+        data = response.json()
+        if data['resultCount'] > 0:
+            result = data['results'][0]
+            
+            return {
+                'app_id': str(result['trackId']),
+                'name': result['trackName'],
+                'category': result['primaryGenreName'],
+                'rating': result.get('averageUserRating', 0),
+                'reviews': result.get('userRatingCount', 0),
+                'size': int(result['fileSizeBytes']) / (1024 * 1024),  # Convert to MB
+                'price': result['price'],
+                'downloads': 0  # Apple doesn't provide download counts
+            }
+            
+        return None
+    
+    def discovery_seeds(self):
+        """Search terms that start app ID discovery"""
+        return [('search', term) for term in DISCOVERY_TERMS]
+    
+    def discover(self, node):
+        """Run a search or developer lookup; returns app IDs and the developers found.
+        
+        Each developer is then looked up for the rest of their apps.
+        """
+        import requests
+        
+        kind, value = node
+        if kind == 'search':
+            url, params = self.search_url, {'term': value, 'entity': 'software', 'limit': 200}
+        else:
+            url, params = self.base_url, {'id': value, 'entity': 'software', 'limit': 200}
+        response = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        
+        # Developer lookups also return the developer itself as the first result
+        results = [r for r in response.json()['results'] if r.get('wrapperType') == 'software']
+        app_ids = [str(r['trackId']) for r in results]
+        nodes = [('developer', r['artistId']) for r in results if 'artistId' in r]
+        return app_ids, nodes
+    
     def get_app_reviews(self, app_id, limit=100):
         """Get app reviews using web scraping (since iTunes API doesn't provide reviews)"""
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
         
         try:
-            driver = webdriver.Chrome(options=chrome_options)
+            driver = _headless_chrome()
             url = f"https://apps.apple.com/us/app/id{app_id}"
             driver.get(url)
             
@@ -224,7 +252,7 @@ class AppleAppStoreAPI:
             return reviews
             
         except Exception as e:
-            print(f"Error fetching reviews for {app_id}: {str(e)}")
+            logger.error("Error fetching reviews for %s: %s", app_id, e)
             return []
         
         finally:
@@ -235,45 +263,60 @@ class AmazonAppStoreAPI:
     """Amazon App Store API wrapper"""
     
     def __init__(self):
+        load_env()
         self.base_url = "https://www.amazon.com/gp/product"
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
         }
     
     def get_app_details(self, app_id):
-        """Get app details using web scraping"""
-        url = f"{self.base_url}/{app_id}"
-        
+        """Get app details, or None if they could not be fetched"""
         try:
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            app_data = {
-                'app_id': app_id,
-                'name': self._extract_text(soup, '#productTitle'),
-                'category': self._extract_category(soup),
-                'rating': self._extract_rating(soup),
-                'reviews': self._extract_reviews_count(soup),
-                'size': self._extract_size(soup),
-                'price': self._extract_price(soup),
-                'downloads': self._extract_downloads(soup)
-            }
-            
-            return app_data
-            
+            return self.fetch_app_details(app_id)
         except Exception as e:
-            print(f"Error fetching app details for {app_id}: {str(e)}")
+            logger.error("Error fetching app details for %s: %s", app_id, e)
             return None
     
+    def fetch_app_details(self, app_id):
+        """Get app details using web scraping; raises on errors"""
+        url = f"{self.base_url}/{app_id}"
+        
+        import requests
+        from .page_parsers import parse_amazon
+        
+        response = requests.get(url, headers=self.headers, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        
+        return parse_amazon(response.text, app_id)
+    
+    ASIN = re.compile(r'data-asin="([A-Z0-9]{10})"')
+    MAX_SEARCH_PAGES = 20
+    
+    def discovery_seeds(self):
+        """Appstore search result pages that start app ID discovery"""
+        return [('search', term, 1) for term in DISCOVERY_TERMS]
+    
+    def discover(self, node):
+        """Fetch a search result page; returns its ASINs and the next page"""
+        import requests
+        
+        _, term, page = node
+        response = requests.get("https://www.amazon.com/s", headers=self.headers, timeout=REQUEST_TIMEOUT,
+                                params={'k': term, 'i': 'mobile-apps', 'page': page})
+        response.raise_for_status()
+        
+        app_ids = list(dict.fromkeys(self.ASIN.findall(response.text)))
+        nodes = [('search', term, page + 1)] if app_ids and page < self.MAX_SEARCH_PAGES else []
+        return app_ids, nodes
+    
     def get_app_reviews(self, app_id, limit=100):
         """Get app reviews using web scraping"""
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
         
         try:
-            driver = webdriver.Chrome(options=chrome_options)
+            driver = _headless_chrome()
             url = f"{self.base_url}/{app_id}/reviews"
             driver.get(url)
             
@@ -297,65 +340,9 @@ class AmazonAppStoreAPI:
             return reviews
             
         except Exception as e:
-            print(f"Error fetching reviews for {app_id}: {str(e)}")
+            logger.error("Error fetching reviews for %s: %s", app_id, e)
             return []
         
         finally:
             if 'driver' in locals():
                 driver.quit()
-    
-    def _extract_text(self, soup, selector):
-        """Helper method to extract text from HTML elements"""
-        element = soup.select_one(selector)
-        return element.text.strip() if element else ''
-    
-    def _extract_category(self, soup):
-        """Extract app category"""
-        element = soup.select_one('#wayfinding-breadcrumbs_container')
-        if element:
-            categories = element.find_all('a')
-            return categories[-1].text.strip() if categories else ''
-        return ''
-    
-    def _extract_rating(self, soup):
-        """Extract app rating"""
-        element = soup.select_one('[data-hook="rating-out-of-text"]')
-        if element:
-            rating_text = element.text.split(' ')[0]
-            return float(rating_text)
-        return 0.0
-    
-    def _extract_reviews_count(self, soup):
-        """Extract number of reviews"""
-        element = soup.select_one('[data-hook="total-review-count"]')
-        if element:
-            return int(element.text.replace(',', ''))
-        return 0
-    
-    def _extract_size(self, soup):
-        """Extract app size"""
-        element = soup.find('td', text='File Size')
-        if element:
-            size_text = element.find_next('td').text.strip()
-            return self._parse_size(size_text)
-        return 0
-    
-    def _extract_price(self, soup):
-        """Extract app price"""
-        element = soup.select_one('.a-price-whole')
-        return float(element.text.replace('$', '')) if element else 0.0
-    
-    def _extract_downloads(self, soup):
-        """Extract number of downloads"""
-        # Amazon doesn't typically show download counts
-        return 0
-    
-    def _parse_size(self, size_text):
-        """Convert size text to MB"""
-        try:
-            number = float(''.join(filter(str.isdigit, size_text)))
-            if 'GB' in size_text:
-                return number * 1024
-            return number
-        except:
-            return 0
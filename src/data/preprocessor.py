@@ -2,37 +2,77 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 import logging
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 import re
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+try:
+    from utils.profiling import profile_stage
+    from data.sparse_encoding import SparseOneHotEncoder, NUMERIC_FEATURES, CATEGORICAL_FEATURES
+    from data.version_features import VERSION_FEATURES, add_version_features
+    from data.warehouse import Warehouse
+    from data.snapshots import TREND_FEATURES
+    from data.entity_resolution import ENTITY_FEATURES, add_entity_features
+    from data.dedup import deduplicate
+    from data.validation import INGEST_SCHEMA, ValidationError, validate_frame
+except ImportError:  # imported as src.data.preprocessor
+    from src.utils.profiling import profile_stage
+    from src.data.sparse_encoding import SparseOneHotEncoder, NUMERIC_FEATURES, CATEGORICAL_FEATURES
+    from src.data.version_features import VERSION_FEATURES, add_version_features
+    from src.data.warehouse import Warehouse
+    from src.data.snapshots import TREND_FEATURES
+    from src.data.entity_resolution import ENTITY_FEATURES, add_entity_features
+    from src.data.dedup import deduplicate
+    from src.data.validation import INGEST_SCHEMA, ValidationError, validate_frame
+
 logger = logging.getLogger(__name__)
 
 class DataPreprocessor:
     """Class for preprocessing app store data."""
     
-    def __init__(self, data_dir: str = "src/data/raw"):
-        """Initialize the preprocessor with data directory path."""
+    # Raw data file for each store
+    STORE_FILES = {
+        'google_play': 'google_play_store.csv',
+        'apple': 'apple_app_store.csv',
+        'amazon': 'amazon_app_store.csv'
+    }
+    
+    def __init__(self, data_dir: str = "src/data/raw", warehouse: Optional[str] = None,
+                 trend_window_days: float = 30, dedup: str = 'none', validation: str = 'warn'):
+        """Initialize the preprocessor with data directory path.
+        
+        With ``warehouse`` (a SQLite file from ``data.warehouse``) the cleaned
+        apps are read from it with one query instead of from the CSVs, and
+        rating/review/download trends over the last ``trend_window_days`` are
+        added from its snapshots. ``dedup`` is the policy for repeated app
+        records (see ``data.dedup``); duplicate statistics are kept on
+        ``self.dedup_stats`` either way. ``validation`` ('off', 'warn' or
+        'error') sets what happens when the cleaned rows fail the
+        ``data.validation`` ingest checks; the report is kept on
+        ``self.validation_report``.
+        """
         self.data_dir = Path(data_dir)
+        self.warehouse = warehouse
+        self.trend_window_days = trend_window_days
+        self.dedup = dedup
+        self.dedup_stats = None
+        self.validation = validation
+        self.validation_report = None
         self.store_data = {}
         self.combined_data = None
+        self.entities = None
+        self.entity_index = None
+        self.encoder = None
     
+    @profile_stage('preprocess.load_data')
     def load_data(self) -> None:
         """Load data from all app stores."""
-        store_files = {
-            'google_play': 'google_play_store.csv',
-            'apple': 'apple_app_store.csv',
-            'amazon': 'amazon_app_store.csv'
-        }
-        
-        for store, filename in store_files.items():
+        for store, filename in self.STORE_FILES.items():
             file_path = self.data_dir / filename
             try:
                 self.store_data[store] = pd.read_csv(file_path)
-                logger.info(f"Loaded {store} data: {len(self.store_data[store])} records")
+                logger.info("Loaded %s data: %s records", store, len(self.store_data[store]))
             except Exception as e:
-                logger.error(f"Error loading {store} data: {str(e)}")
+                logger.error("Error loading %s data: %s", store, e)
                 self.store_data[store] = None
     
     def clean_app_size(self, size_str: str) -> float:
@@ -53,8 +93,8 @@ class DataPreprocessor:
         except:
             return np.nan
     
-    def clean_downloads(self, downloads_str: str) -> int:
-        """Convert downloads string to integer."""
+    def clean_downloads(self, downloads_str: str) -> float:
+        """Convert downloads string to an integer count, NaN if it cannot be parsed."""
         try:
             multiplier = {
                 'K': 1000,
@@ -67,21 +107,61 @@ class DataPreprocessor:
                     return int(number * mult)
             return int(number)
         except:
-            return 0
+            return np.nan
+    
+    @staticmethod
+    def _clean_column(raw: pd.Series, clean, failed_value: float = np.nan) -> Tuple[np.ndarray, int]:
+        """Apply ``clean`` once per distinct raw value.
+        
+        Returns the cleaned values and the number of non-blank raw values
+        that ``clean`` could not parse (it returns ``failed_value`` for them).
+        """
+        codes, uniques = pd.factorize(raw)
+        cleaned = pd.Series([clean(value) for value in uniques] + [clean(np.nan)])
+        if np.isnan(failed_value):
+            failed = cleaned.isna().to_numpy()[:-1]
+        else:
+            # A literal zero ("0", "0+") is not a failure
+            failed = (cleaned == failed_value).to_numpy()[:-1] & ~pd.Series(uniques, dtype=object).astype(str).str.fullmatch(
+                r'\s*0*\.?0*\s*[KMB]?\+?\s*').to_numpy(dtype=bool)
+        blank = pd.Series(uniques, dtype=object).astype(str).str.strip().eq('').to_numpy()
+        failures = int(np.bincount(codes[codes >= 0], minlength=len(uniques))[failed & ~blank].sum())
+        return cleaned.to_numpy()[codes], failures
     
+    def _validate(self, parse_failures: Optional[Dict[str, int]] = None) -> None:
+        """Run the ingest checks on the combined rows according to ``self.validation``."""
+        if self.validation == 'off':
+            return
+        self.validation_report = validate_frame(self.combined_data, INGEST_SCHEMA, parse_failures)
+        if self.validation_report['ok']:
+            logger.info("Validated %s records in %.3fs", len(self.combined_data), self.validation_report['seconds'])
+        elif self.validation == 'error':
+            raise ValidationError(self.validation_report)
+        else:
+            logger.warning("Validation failed: %s", '; '.join(self.validation_report['errors']))
+    
+    @profile_stage('preprocess.preprocess_data')
     def preprocess_data(self) -> pd.DataFrame:
         """Preprocess all datasets and combine them."""
+        if self.warehouse:
+            return self._preprocess_warehouse()
+        
         if not self.store_data:
             self.load_data()
         
         processed_data = []
+        parse_failures = {'app_size_mb': 0, 'price_usd': 0, 'downloads': 0}
         
         for store_name, df in self.store_data.items():
             if df is not None:
-                # Clean numeric columns
-                df['app_size_mb'] = df['App Size'].apply(self.clean_app_size)
-                df['price_usd'] = df['App Price'].apply(self.clean_app_price)
-                df['downloads'] = df['Downloads'].apply(self.clean_downloads)
+                # Clean numeric columns, counting values that fail to parse
+                for column, raw, clean, failed_value in (
+                    ('app_size_mb', 'App Size', self.clean_app_size, np.nan),
+                    ('price_usd', 'App Price', self.clean_app_price, np.nan),
+                    ('downloads', 'Downloads', self.clean_downloads, np.nan)
+                ):
+                    df[column], failures = self._clean_column(df[raw], clean, failed_value)
+                    parse_failures[column] += failures
                 
                 # Clean and standardize categorical columns
                 df['app_type'] = df['App Type'].str.lower()
@@ -102,11 +182,40 @@ class DataPreprocessor:
         
         # Combine all processed datasets
         self.combined_data = pd.concat(processed_data, ignore_index=True)
+        self._validate(parse_failures)
+        
+        # Parse versions before the mode imputation below overwrites missing ones
+        add_version_features(self.combined_data)
+        
+        # Dedup after version parsing, which decides the latest record of an app
+        self.combined_data, self.dedup_stats = deduplicate(self.combined_data, self.dedup)
         
         # Handle missing values
         self.combined_data = self.handle_missing_values(self.combined_data)
         
-        logger.info(f"Preprocessed {len(self.combined_data)} total records")
+        # Link the same app across stores (see data.entity_resolution)
+        self.entities, self.entity_index = add_entity_features(self.combined_data)
+        
+        logger.info("Preprocessed %s total records", len(self.combined_data))
+        return self.combined_data
+    
+    def _preprocess_warehouse(self) -> pd.DataFrame:
+        """Read apps already cleaned in SQL by the warehouse, then impute as usual."""
+        with Warehouse(self.warehouse) as warehouse:
+            apps = warehouse.training_apps(list(self.STORE_FILES))
+            trends = warehouse.snapshot_store().trend_features(self.trend_window_days)
+        
+        # Apps without snapshots (e.g. loaded from raw CSVs) have no trend
+        self.combined_data = apps.merge(trends, on=['store', 'app_id'], how='left').drop(columns='app_id')
+        self.combined_data[TREND_FEATURES] = self.combined_data[TREND_FEATURES].fillna(0.0)
+        self._validate()
+        
+        add_version_features(self.combined_data)
+        self.combined_data, self.dedup_stats = deduplicate(self.combined_data, self.dedup)
+        self.combined_data = self.handle_missing_values(self.combined_data)
+        self.entities, self.entity_index = add_entity_features(self.combined_data)
+        
+        logger.info("Preprocessed %s total records from %s", len(self.combined_data), self.warehouse)
         return self.combined_data
     
     def handle_missing_values(self, df: pd.DataFrame) -> pd.DataFrame:
@@ -119,7 +228,10 @@ class DataPreprocessor:
         # Fill categorical missing values with mode
         categorical_columns = ['app_type', 'app_version']
         for col in categorical_columns:
-            df[col] = df[col].fillna(df[col].mode()[0])
+            mode = df[col].mode()
+            # Collected data has no app versions at all
+            if not mode.empty:
+                df[col] = df[col].fillna(mode[0])
         
         return df
     
@@ -139,19 +251,67 @@ class DataPreprocessor:
         
         return stats
     
-    def get_training_data(self) -> Tuple[pd.DataFrame, pd.Series]:
-        """Prepare data for model training."""
+    def get_cv_groups(self) -> np.ndarray:
+        """Integer group of each training row for group-aware splits.
+        
+        Rows of the same app, in any store (``app_entity_id``), share a group,
+        so duplicates never end up on both sides of a train/test split.
+        """
+        if self.combined_data is None:
+            self.preprocess_data()
+        
+        groups = pd.factorize(self.combined_data['app_entity_id'])[0]
+        unlinked = groups < 0
+        groups[unlinked] = groups.max(initial=-1) + 1 + np.arange(unlinked.sum())
+        return groups
+    
+    @profile_stage('preprocess.get_training_data')
+    def get_training_data(self, sparse: bool = False, categorical: Optional[List[str]] = None,
+                          hashing: Optional[int] = None,
+                          version_features: bool = False,
+                          trend_features: bool = False,
+                          entity_features: bool = False) -> Tuple[Any, pd.Series]:
+        """Prepare data for model training.
+        
+        By default returns a dense ``get_dummies`` frame. With ``sparse=True``
+        returns a CSR matrix from a SparseOneHotEncoder, kept on
+        ``self.encoder`` for saving with the model. ``categorical`` sets the
+        encoded columns (e.g. adding high-cardinality ``app_version``) and
+        ``hashing`` hashes categories into that many columns.
+        ``version_features=True`` adds the parsed app version columns
+        (see ``data.version_features``) as numeric features,
+        ``trend_features=True`` the snapshot trends (warehouse data only) and
+        ``entity_features=True`` the cross-store features of the same app
+        (see ``data.entity_resolution``). Version and trend features are
+        training-only: the web predictor cannot build them from requests and
+        rejects such models. Entity features are served with the saved
+        ``EntityIndex`` (``ENTITY_INDEX``).
+        """
         if self.combined_data is None:
             self.preprocess_data()
         
+        numeric = list(NUMERIC_FEATURES)
+        if version_features:
+            numeric += VERSION_FEATURES
+        if trend_features:
+            if not set(TREND_FEATURES) <= set(self.combined_data.columns):
+                raise ValueError("Trend features need data preprocessed from a warehouse")
+            numeric += TREND_FEATURES
+        if entity_features:
+            numeric += ENTITY_FEATURES
+        
+        y = self.combined_data['user_rating']
+        if sparse:
+            self.encoder = SparseOneHotEncoder(
+                numeric=numeric,
+                categorical=categorical or CATEGORICAL_FEATURES, hashing=hashing
+            )
+            return self.encoder.fit_transform(self.combined_data), y
+        
         # Select features for training
-        features = [
-            'app_size_mb', 'price_usd', 'downloads',
-            'app_type', 'store'
-        ]
+        features = numeric + ['app_type', 'store']
         
         # Create dummy variables for categorical features
         X = pd.get_dummies(self.combined_data[features], columns=['app_type', 'store'])
-        y = self.combined_data['user_rating']
         
         return X, y
@@ -1,7 +1,11 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
 from preprocessor import DataPreprocessor
+from utils.logging_config import setup_logging
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def main():
@@ -17,29 +21,30 @@ def main():
         stats = preprocessor.get_feature_stats()
         
         logger.info("\nDataset Statistics:")
-        logger.info(f"Total number of apps: {stats['total_apps']}")
+        logger.info("Total number of apps: %s", stats['total_apps'])
         logger.info("\nApps by store:")
         for store, count in stats['apps_by_store'].items():
-            logger.info(f"  {store}: {count}")
+            logger.info("  %s: %s", store, count)
         
         logger.info("\nApps by type:")
         for app_type, count in stats['apps_by_type'].items():
-            logger.info(f"  {app_type}: {count}")
+            logger.info("  %s: %s", app_type, count)
         
         logger.info("\nRating statistics:")
         for stat, value in stats['rating_stats'].items():
-            logger.info(f"  {stat}: {value:.2f}")
+            logger.info("  %s: %.2f", stat, value)
         
         # Get training data
         X, y = preprocessor.get_training_data()
-        logger.info(f"\nTraining data shape: {X.shape}")
-        logger.info(f"Number of features: {X.shape[1]}")
+        logger.info("\nTraining data shape: %s", X.shape)
+        logger.info("Number of features: %s", X.shape[1])
         
         return processed_data, X, y
         
     except Exception as e:
-        logger.error(f"Error processing data: {str(e)}")
+        logger.error("Error processing data: %s", e)
         raise
 
 if __name__ == "__main__":
+    setup_logging()
     main()
@@ -0,0 +1,261 @@
+"""Compact columnar storage of per-app metric snapshots over time.
+
+The warehouse ``snapshots`` table appends one row per app per collection
+run. :class:`SnapshotStore` holds the same history sorted by app and time in
+encoded NumPy columns:
+
+* timestamps, review counts and downloads are delta-encoded within each app
+  (the first value of an app is absolute) and stored in the smallest integer
+  type that fits the deltas, so slowly growing counters take 1-2 bytes;
+* ratings are run-length encoded within each app, since they rarely change
+  between runs.
+
+Columns are decoded with vectorized cumulative sums, and :meth:`as_of` finds
+the latest snapshot of every app at a given time with one ``searchsorted``.
+:meth:`trend_features` compares the snapshots at the end and start of a
+window to give rating velocity and review/download growth rates.
+"""
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+TREND_FEATURES = ['rating_velocity', 'review_growth_rate', 'download_growth_rate', 'snapshot_count']
+
+SNAPSHOT_COLUMNS = ['store', 'app_id', 'ts', 'user_rating', 'review_count', 'downloads']
+
+# Missing counters are stored as -1 so the delta encoding stays integral
+MISSING = -1
+DAY = 86400
+
+def _min_int_dtype(values: np.ndarray) -> np.dtype:
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if values.size == 0 or (values.min() >= info.min and values.max() <= info.max):
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+class SnapshotStore:
+    """Delta- and run-length-encoded app metric history."""
+
+    def __init__(self, stores: np.ndarray, app_ids: np.ndarray, offsets: np.ndarray,
+                 columns: Dict[str, np.ndarray]):
+        """Use :meth:`from_frame` or :meth:`load` rather than calling this directly."""
+        self.stores = stores
+        self.app_ids = app_ids
+        self.offsets = offsets
+        self.columns = columns
+        self._decoded: Optional[Dict[str, np.ndarray]] = None
+
+    @property
+    def n_apps(self) -> int:
+        return len(self.app_ids)
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    # Encoding
+
+    @staticmethod
+    def _delta_encode(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+        deltas = np.diff(values, prepend=0)
+        deltas[starts] = values[starts]
+        return deltas.astype(_min_int_dtype(deltas))
+
+    def _delta_decode(self, deltas: np.ndarray) -> np.ndarray:
+        total = np.cumsum(deltas, dtype=np.int64)
+        # Each app starts from an absolute value; remove the running sum of the apps before it
+        before = np.concatenate([[0], total[self.offsets[1:-1] - 1]])[:self.n_apps]
+        return total - np.repeat(before, np.diff(self.offsets))
+
+    @staticmethod
+    def _run_length_encode(values: np.ndarray, starts: np.ndarray):
+        changed = np.ones(len(values), dtype=bool)
+        if len(values) > 1:
+            same = (values[1:] == values[:-1]) | (np.isnan(values[1:]) & np.isnan(values[:-1]))
+            changed[1:] = ~same
+        changed[starts] = True
+        run_starts = np.flatnonzero(changed)
+        lengths = np.diff(np.append(run_starts, len(values)))
+        return values[run_starts], lengths.astype(_min_int_dtype(lengths))
+
+    @classmethod
+    def _encode(cls, stores: np.ndarray, app_ids: np.ndarray, app: np.ndarray, ts: np.ndarray,
+                review_count: np.ndarray, downloads: np.ndarray, ratings: np.ndarray) -> 'SnapshotStore':
+        """Encode rows sorted by (app, ts); ``app`` indexes the per-app ``stores`` and ``app_ids``."""
+        new_app = np.ones(len(app), dtype=bool)
+        new_app[1:] = app[1:] != app[:-1]
+        starts = np.flatnonzero(new_app)
+        offsets = np.append(starts, len(app)).astype(np.int64)
+        columns = {'ts': cls._delta_encode(ts, starts),
+                   'review_count': cls._delta_encode(review_count, starts),
+                   'downloads': cls._delta_encode(downloads, starts)}
+        columns['rating_values'], columns['rating_runs'] = cls._run_length_encode(ratings, starts)
+        return cls(stores[app[starts]], app_ids[app[starts]], offsets, columns)
+
+    @staticmethod
+    def _counter(values: pd.Series) -> np.ndarray:
+        return pd.to_numeric(values, errors='coerce').fillna(MISSING).to_numpy(dtype=np.int64)
+
+    @classmethod
+    def from_frame(cls, snapshots: pd.DataFrame) -> 'SnapshotStore':
+        """Encode rows with store, app_id, ts (epoch seconds), user_rating, review_count and downloads."""
+        df = snapshots.sort_values(['store', 'app_id', 'ts'], kind='stable')
+        stores = df['store'].to_numpy().astype(str)
+        app_ids = df['app_id'].to_numpy().astype(str)
+        new_app = np.ones(len(df), dtype=bool)
+        new_app[1:] = (stores[1:] != stores[:-1]) | (app_ids[1:] != app_ids[:-1])
+        starts = np.flatnonzero(new_app)
+
+        store = cls._encode(
+            stores[starts], app_ids[starts], np.cumsum(new_app) - 1,
+            df['ts'].to_numpy(dtype=np.float64).round().astype(np.int64),
+            cls._counter(df['review_count']), cls._counter(df['downloads']),
+            pd.to_numeric(df['user_rating'], errors='coerce').to_numpy(dtype=np.float64)
+        )
+        logger.info("Encoded %s snapshots of %s apps into %s bytes", len(df), store.n_apps, store.nbytes)
+        return store
+
+    def extend(self, snapshots: pd.DataFrame) -> 'SnapshotStore':
+        """A new store with ``snapshots`` rows added; a row repeating an app and second replaces the old one.
+
+        Works on the decoded integer columns, matching new rows to known apps
+        by key, so only the new rows' strings are processed.
+        """
+        if snapshots.empty:
+            return self
+        keys = pd.Index(np.char.add(np.char.add(self.stores.astype(str), '\x1f'), self.app_ids.astype(str)))
+        new_keys = snapshots['store'].astype(str).to_numpy() + '\x1f' + snapshots['app_id'].astype(str).to_numpy()
+        new_app = keys.get_indexer(new_keys)
+        unknown, unknown_app = np.unique(new_keys[new_app < 0], return_inverse=True)
+        new_app[new_app < 0] = self.n_apps + unknown_app
+        stores = np.concatenate([self.stores.astype(str), [key.split('\x1f', 1)[0] for key in unknown]])
+        app_ids = np.concatenate([self.app_ids.astype(str), [key.split('\x1f', 1)[1] for key in unknown]])
+
+        decoded = self.decode()
+        app = np.concatenate([decoded['app'], new_app])
+        # Stored timestamps are whole seconds, so compare new rows at that resolution
+        ts = np.concatenate([decoded['ts'], pd.to_numeric(snapshots['ts']).round().to_numpy(dtype=np.int64)])
+        order = np.lexsort([np.arange(len(app)), ts, app])
+        last = np.ones(len(order), dtype=bool)
+        last[:-1] = (app[order][1:] != app[order][:-1]) | (ts[order][1:] != ts[order][:-1])
+        order = order[last]
+
+        columns = {
+            column: np.concatenate([decoded[column], self._counter(snapshots[column])])[order]
+            for column in ('review_count', 'downloads')
+        }
+        ratings = np.concatenate([decoded['user_rating'],
+                                  pd.to_numeric(snapshots['user_rating'], errors='coerce').to_numpy(dtype=np.float64)])
+        return self._encode(stores, app_ids, app[order], ts[order], columns['review_count'], columns['downloads'],
+                            ratings[order])
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.offsets.nbytes + sum(column.nbytes for column in self.columns.values()))
+
+    # Decoding
+
+    def decode(self) -> Dict[str, np.ndarray]:
+        """Decoded per-row columns (cached), including ``app`` as an index into the app arrays."""
+        if self._decoded is None:
+            decoded = {'app': np.repeat(np.arange(self.n_apps), np.diff(self.offsets))}
+            for column in ('ts', 'review_count', 'downloads'):
+                decoded[column] = self._delta_decode(self.columns[column])
+            decoded['user_rating'] = np.repeat(self.columns['rating_values'], self.columns['rating_runs'])
+            self._decoded = decoded
+        return self._decoded
+
+    def to_frame(self) -> pd.DataFrame:
+        decoded = self.decode()
+        frame = pd.DataFrame({
+            'store': self.stores[decoded['app']], 'app_id': self.app_ids[decoded['app']], 'ts': decoded['ts'],
+            'user_rating': decoded['user_rating'], 'review_count': decoded['review_count'],
+            'downloads': decoded['downloads']
+        })
+        for column in ('review_count', 'downloads'):
+            frame[column] = frame[column].where(frame[column] != MISSING)
+        return frame
+
+    def _latest_rows(self, at: np.ndarray) -> np.ndarray:
+        """Row of the latest snapshot of each app at or before ``at`` (per app), -1 if none."""
+        decoded = self.decode()
+        if not len(self):
+            return np.full(self.n_apps, -1)
+        # Rows are sorted by (app, ts), so one sorted key of both finds every app's row at once
+        first = decoded['ts'].min()
+        span = int(decoded['ts'].max() - first) + 2
+        keys = decoded['app'] * span + (decoded['ts'] - first)
+        queries = np.arange(self.n_apps) * span + np.clip(at - first, -1, span - 1)
+        rows = np.searchsorted(keys, queries, side='right') - 1
+        return np.where(rows >= self.offsets[:-1], rows, -1)
+
+    def as_of(self, at: float) -> pd.DataFrame:
+        """Latest snapshot of every app at or before epoch seconds ``at``."""
+        rows = self._latest_rows(np.full(self.n_apps, int(at), dtype=np.int64))
+        rows = rows[rows >= 0]
+        decoded = self.decode()
+        frame = pd.DataFrame({column: decoded[column][rows]
+                              for column in ('ts', 'user_rating', 'review_count', 'downloads')})
+        frame.insert(0, 'app_id', self.app_ids[decoded['app'][rows]])
+        frame.insert(0, 'store', self.stores[decoded['app'][rows]])
+        for column in ('review_count', 'downloads'):
+            frame[column] = frame[column].where(frame[column] != MISSING)
+        return frame
+
+    def trend_features(self, window_days: float = 30, at: Optional[float] = None) -> pd.DataFrame:
+        """Per-app trends over the ``window_days`` before ``at`` (default: the latest snapshot).
+
+        Compares each app's latest snapshot with its latest one at the window
+        start (or its first snapshot if it is newer than that):
+
+        * ``rating_velocity``: rating change per day;
+        * ``review_growth_rate`` / ``download_growth_rate``: relative change
+          per day, ``(now - then) / then / days``;
+        * ``snapshot_count``: snapshots up to ``at``.
+
+        Apps with a single snapshot get zero trends.
+        """
+        decoded = self.decode()
+        at = int(decoded['ts'].max()) if at is None and len(self) else int(at or 0)
+        now = self._latest_rows(np.full(self.n_apps, at, dtype=np.int64))
+        then = self._latest_rows(np.full(self.n_apps, at - int(window_days * DAY), dtype=np.int64))
+        then = np.where(then >= 0, then, self.offsets[:-1])
+        has = now >= 0
+        now, then = np.where(has, now, 0), np.where(has, then, 0)
+
+        days = np.maximum((decoded['ts'][now] - decoded['ts'][then]) / DAY, 1.0)
+        features = {'rating_velocity': (decoded['user_rating'][now] - decoded['user_rating'][then]) / days}
+        for column, name in (('review_count', 'review_growth_rate'), ('downloads', 'download_growth_rate')):
+            current, previous = decoded[column][now], decoded[column][then]
+            valid = (current != MISSING) & (previous != MISSING)
+            features[name] = np.where(valid, (current - previous) / np.maximum(previous, 1) / days, 0.0)
+        features['snapshot_count'] = np.where(has, now - self.offsets[:-1] + 1, 0)
+
+        frame = pd.DataFrame(features)
+        frame = frame.fillna(0.0)
+        frame.loc[~has, TREND_FEATURES] = 0.0
+        frame.insert(0, 'app_id', self.app_ids)
+        frame.insert(0, 'store', self.stores)
+        return frame
+
+    # Persistence
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        tmp_path = path.with_name(f".{path.name}.tmp.npz")
+        np.savez_compressed(tmp_path, stores=self.stores, app_ids=self.app_ids, offsets=self.offsets, **self.columns)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'SnapshotStore':
+        """Load a store written by :meth:`save`; an empty store if ``path`` does not exist."""
+        if not Path(path).exists():
+            return cls.from_frame(pd.DataFrame(columns=SNAPSHOT_COLUMNS))
+        with np.load(path) as data:
+            columns = {name: data[name] for name in data.files if name not in ('stores', 'app_ids', 'offsets')}
+            return cls(data['stores'], data['app_ids'], data['offsets'], columns)
@@ -0,0 +1,141 @@
+"""Sparse one-hot encoding for high-cardinality categorical features.
+
+``pd.get_dummies`` materializes one dense column per category, which does not
+scale to features such as app version or developer. SparseOneHotEncoder
+produces a ``scipy.sparse.csr_matrix`` with the numeric features first and
+one column per category, named like ``get_dummies`` (``app_type_social``), so
+the layout matches the dense path for the default features. The vocabulary
+is saved as JSON and reloaded at serving time. With ``hashing=n`` categories
+are hashed into ``n`` shared columns instead, for unbounded vocabularies.
+"""
+import json
+import logging
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+NUMERIC_FEATURES = ['app_size_mb', 'price_usd', 'downloads']
+CATEGORICAL_FEATURES = ['app_type', 'store']
+
+
+class SparseOneHotEncoder:
+    """Encode numeric and categorical columns into a CSR matrix."""
+
+    def __init__(self, numeric: Sequence[str] = NUMERIC_FEATURES,
+                 categorical: Sequence[str] = CATEGORICAL_FEATURES, hashing: Optional[int] = None):
+        """
+        Args:
+            numeric: Columns copied as-is.
+            categorical: Columns one-hot encoded. Values are lower-cased strings.
+            hashing: If set, hash ``column=value`` into this many columns
+                instead of keeping a vocabulary.
+        """
+        self.numeric = list(numeric)
+        self.categorical = list(categorical)
+        self.hashing = hashing
+        self.vocabulary: Dict[str, Dict[str, int]] = {}
+        self.feature_names_: List[str] = []
+
+    @staticmethod
+    def _categories(values: pd.Series) -> pd.Series:
+        return values.astype(str).str.lower()
+
+    def fit(self, df: pd.DataFrame) -> 'SparseOneHotEncoder':
+        """Learn the vocabulary of each categorical column (no-op with hashing)."""
+        self.feature_names_ = list(self.numeric)
+        offset = len(self.numeric)
+        if self.hashing:
+            self.feature_names_ += [f"hash_{i}" for i in range(self.hashing)]
+            return self
+
+        self.vocabulary = {}
+        for column in self.categorical:
+            values = sorted(self._categories(df[column].dropna()).unique())
+            self.vocabulary[column] = {value: offset + i for i, value in enumerate(values)}
+            self.feature_names_ += [f"{column}_{value}" for value in values]
+            offset += len(values)
+        logger.info("Fitted sparse encoder with %s features", len(self.feature_names_))
+        return self
+
+    def _column_indices(self, column: str, values: pd.Series) -> np.ndarray:
+        """Column index for each value, -1 for unknown or missing values."""
+        codes, uniques = pd.factorize(self._categories(values).where(values.notna()))
+        if self.hashing:
+            offset = len(self.numeric)
+            lookup = np.array([offset + zlib.crc32(f"{column}={value}".encode()) % self.hashing
+                               for value in uniques], dtype=np.int64)
+        else:
+            vocabulary = self.vocabulary[column]
+            lookup = np.array([vocabulary.get(value, -1) for value in uniques], dtype=np.int64)
+        # factorize marks missing values with -1
+        return np.where(codes >= 0, lookup[codes] if len(lookup) else -1, -1)
+
+    def transform(self, df: pd.DataFrame):
+        """Encode ``df`` into a CSR matrix with ``len(feature_names_)`` columns.
+
+        Unknown categories are left all-zero, as in the dense serving path.
+        """
+        from scipy import sparse
+
+        if not self.feature_names_:
+            raise ValueError("Encoder is not fitted")
+        n = len(df)
+        rows, cols, data = [], [], []
+
+        for j, column in enumerate(self.numeric):
+            values = pd.to_numeric(df[column], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+            nonzero = np.flatnonzero(values)
+            rows.append(nonzero)
+            cols.append(np.full(len(nonzero), j))
+            data.append(values[nonzero])
+
+        for column in self.categorical:
+            indices = self._column_indices(column, df[column])
+            known = np.flatnonzero(indices >= 0)
+            rows.append(known)
+            cols.append(indices[known])
+            data.append(np.ones(len(known)))
+
+        # Hashed categories may collide; duplicates are summed when converting to CSR
+        return sparse.coo_matrix(
+            (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(n, len(self.feature_names_))
+        ).tocsr()
+
+    def fit_transform(self, df: pd.DataFrame):
+        return self.fit(df).transform(df)
+
+    def transform_records(self, records: List[Dict[str, Any]]):
+        """Encode a list of app dictionaries, as used by the predictor."""
+        return self.transform(pd.DataFrame.from_records(records, columns=self.numeric + self.categorical))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'numeric': self.numeric,
+            'categorical': self.categorical,
+            'hashing': self.hashing,
+            'vocabulary': self.vocabulary,
+            'feature_names': self.feature_names_
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'SparseOneHotEncoder':
+        encoder = cls(state['numeric'], state['categorical'], state['hashing'])
+        encoder.vocabulary = state['vocabulary']
+        encoder.feature_names_ = state['feature_names']
+        return encoder
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_text(json.dumps(self.to_dict()))
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'SparseOneHotEncoder':
+        return cls.from_dict(json.loads(Path(path).read_text()))
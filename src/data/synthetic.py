@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+import logging
+from typing import Dict, Optional
+
+from .preprocessor import DataPreprocessor
+
+logger = logging.getLogger(__name__)
+
+APP_TYPES = ['Communication', 'Education', 'Entertainment', 'Music',
+             'Productivity', 'Social', 'Travel', 'Video']
+
+APP_NAMES = ['TikTok', 'Zoom', 'Hulu', 'Snapchat', 'YouTube', 'Discord', 'Facebook',
+             'Amazon', 'Dropbox', 'Duolingo', 'WhatsApp', 'Messenger', 'Spotify',
+             'Netflix', 'Instagram', 'Google Maps', 'Reddit', 'Uber', 'Pinterest',
+             'Khan Academy', 'Twitter', 'LinkedIn', 'Airbnb', 'Slack']
+
+PRICES = np.array(['Free', 'Free with In-App Purchases', '$0.99', '$1.99', '$2.99', '$4.99', '$9.99'])
+PRICE_VALUES = np.array([0.0, 0.0, 0.99, 1.99, 2.99, 4.99, 9.99])
+
+DOWNLOADS = np.array(['10K+', '50K+', '100K+', '500K+', '1M+', '10M+', '100M+', '1B+'])
+
+REVIEW_PHRASES = np.array([
+    'Great app, works perfectly', 'Crashes every time I open it', 'Love the new update',
+    'Too many ads', 'Does what it says', 'Battery drain is terrible since the last version',
+    'Best app in its category', 'Customer support never answered', 'Solid but a bit slow',
+    'Would give zero stars if I could', 'Simple and easy to use', 'Subscription is too expensive'
+])
+
+SCALES = {
+    '10k': 10_000,
+    '1m': 1_000_000,
+    '10m': 10_000_000
+}
+
+def _store_chunk(rng: np.random.Generator, n: int, n_apps: int) -> pd.DataFrame:
+    """Generate one chunk of rows in the raw store CSV schema."""
+    app_index = rng.integers(0, n_apps, n)
+    names = np.where(
+        app_index < len(APP_NAMES),
+        np.array(APP_NAMES)[np.minimum(app_index, len(APP_NAMES) - 1)],
+        np.char.add('App ', app_index.astype(str))
+    )
+    sizes = rng.integers(10, 500, n)
+    price_index = rng.integers(0, len(PRICES), n)
+    download_index = rng.integers(0, len(DOWNLOADS), n)
+    versions = (rng.integers(1, 11, n).astype(str).astype(object) + '.'
+                + rng.integers(0, 100, n).astype(str).astype(object) + '.'
+                + rng.integers(0, 10, n).astype(str).astype(object))
+
+    # Give ratings some dependence on the features so models have signal to learn
+    ratings = (3.0 + 0.15 * (download_index - 3.5) / 3.5 - 0.1 * PRICE_VALUES[price_index] / 10
+               - 0.3 * (sizes - 250) / 250 + rng.normal(0, 1.0, n))
+
+    return pd.DataFrame({
+        'App Name': names,
+        'App Size': np.char.add(sizes.astype(str), ' MB'),
+        'App Price': PRICES[price_index],
+        'App Type': np.array(APP_TYPES)[rng.integers(0, len(APP_TYPES), n)],
+        'App Version': versions,
+        'User Rating': np.clip(np.round(ratings, 1), 1.0, 5.0),
+        'Downloads': DOWNLOADS[download_index]
+    })
+
+def generate_raw_store_data(out_dir: str, rows_per_store: int, n_apps: Optional[int] = None,
+                            seed: int = 42, chunk_size: int = 1_000_000) -> Dict[str, Path]:
+    """Write synthetic raw store CSVs in the same schema as src/data/raw.
+
+    Rows are generated and appended in chunks so 10M-row files do not need to
+    fit in memory at once. Returns the path written for each store.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    n_apps = n_apps or max(len(APP_NAMES), rows_per_store // 40)
+    rng = np.random.default_rng(seed)
+
+    paths = {}
+    for store, filename in DataPreprocessor.STORE_FILES.items():
+        path = out_dir / filename
+        written = 0
+        while written < rows_per_store:
+            n = min(chunk_size, rows_per_store - written)
+            _store_chunk(rng, n, n_apps).to_csv(path, mode='w' if written == 0 else 'a',
+                                                header=written == 0, index=False)
+            written += n
+        paths[store] = path
+        logger.info("Wrote %s synthetic rows to %s", rows_per_store, path)
+
+    return paths
+
+def generate_reviews(out_path: str, n_rows: int, n_apps: int = 10_000, seed: int = 42,
+                     chunk_size: int = 1_000_000) -> Path:
+    """Write a synthetic review table (store, app_id, text, rating, date)."""
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    stores = np.array(list(DataPreprocessor.STORE_FILES))
+    start = np.datetime64('2020-01-01')
+
+    written = 0
+    while written < n_rows:
+        n = min(chunk_size, n_rows - written)
+        chunk = pd.DataFrame({
+            'store': stores[rng.integers(0, len(stores), n)],
+            'app_id': np.char.add('app_', rng.integers(0, n_apps, n).astype(str)),
+            'text': REVIEW_PHRASES[rng.integers(0, len(REVIEW_PHRASES), n)],
+            'rating': rng.integers(1, 6, n),
+            'date': (start + rng.integers(0, 365 * 5, n).astype('timedelta64[D]')).astype(str)
+        })
+        chunk.to_csv(out_path, mode='w' if written == 0 else 'a', header=written == 0, index=False)
+        written += n
+
+    logger.info("Wrote %s synthetic reviews to %s", n_rows, out_path)
+    return out_path
@@ -0,0 +1,65 @@
+"""Ordinal features parsed from app version strings.
+
+``App Version`` arrives as free text ("8.38.6", "v2.1", "Varies with device").
+:func:`parse_versions` splits it into integer major/minor/patch columns with a
+single regex ``str.extract`` over the distinct version strings, then maps the
+result back to the rows with the factorized codes, so the cost grows with the
+number of distinct versions rather than rows. Strings without a leading
+number are marked invalid instead of raising; their parts are -1.
+
+:func:`add_version_features` adds these columns plus ``version_age_rank``:
+the dense rank of a version among all versions seen for the same app and
+store, 0 for the newest, and ``version_recency`` in (0, 1], 1 for the newest.
+"""
+import logging
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+VERSION_PATTERN = r'^\s*[vV]?(?P<major>\d{1,9})(?:\.(?P<minor>\d{1,9}))?(?:\.(?P<patch>\d{1,9}))?'
+VERSION_PARTS = ['version_major', 'version_minor', 'version_patch']
+VERSION_FEATURES = VERSION_PARTS + ['version_valid', 'version_age_rank', 'version_recency']
+
+def parse_versions(versions: pd.Series) -> pd.DataFrame:
+    """Split version strings into ``version_major/minor/patch`` and ``version_valid``.
+
+    Missing minor or patch parts count as 0 ("2.1" is 2.1.0); suffixes such as
+    "-beta" are ignored. Missing and malformed versions get -1 parts and
+    ``version_valid == 0``.
+    """
+    codes, uniques = pd.factorize(versions, sort=False)
+    parts = pd.Series(uniques, dtype=object).astype(str).str.extract(VERSION_PATTERN)
+    valid = parts['major'].notna().to_numpy()
+
+    result = {}
+    for name, column in zip(VERSION_PARTS, ['major', 'minor', 'patch']):
+        values = pd.to_numeric(parts[column]).fillna(0).to_numpy(dtype=np.int64)
+        values = np.where(valid, values, -1)
+        # factorize gives missing values code -1; append a row of -1 for them
+        result[name] = np.append(values, -1)[codes]
+    result['version_valid'] = np.append(valid, False)[codes].astype(np.int8)
+    return pd.DataFrame(result, index=versions.index)
+
+def add_version_features(df: pd.DataFrame, column: str = 'app_version',
+                         group: Sequence[str] = ('store', 'app_name')) -> pd.DataFrame:
+    """Add parsed version columns and per-app version ranks to ``df`` in place."""
+    parsed = parse_versions(df[column])
+    for name in parsed.columns:
+        df[name] = parsed[name]
+
+    # Sort key (major, minor, patch) as one int; parts above 10**6 are clipped
+    parts = parsed[VERSION_PARTS].clip(upper=10**6 - 1).to_numpy(dtype=np.int64)
+    key = pd.Series(parts[:, 0] * 10**12 + parts[:, 1] * 10**6 + parts[:, 2], index=df.index)
+    key = key.where(parsed['version_valid'] == 1)
+
+    grouped = key.groupby([df[g] for g in group], sort=False)
+    newest_first = grouped.rank(method='dense', ascending=False)
+    versions_per_app = grouped.transform('nunique')
+    df['version_age_rank'] = (newest_first - 1).fillna(-1).astype(np.int64)
+    df['version_recency'] = (1 - (newest_first - 1) / versions_per_app).fillna(0.0)
+
+    logger.info("Parsed app versions: %.1f%% valid", 100 * parsed['version_valid'].mean() if len(df) else 0)
+    return df
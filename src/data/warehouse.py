@@ -0,0 +1,267 @@
+"""Embedded SQLite warehouse for collected and raw app store data.
+
+One database file replaces the per-collector ``apps.csv`` files, the
+per-app ``reviews_<id>.csv`` files and the raw store CSVs read by
+DataPreprocessor. Tables:
+
+* ``apps``: one cleaned row per (store, app_id), with typed columns.
+* ``snapshots``: rating, review count and downloads of an app each time it
+  was collected, so history is kept when ``apps`` is overwritten. The table
+  only stages new rows: they are folded into the delta/RLE-encoded
+  :class:`~data.snapshots.SnapshotStore` saved next to the database
+  (``<name>.snapshots.npz``), which holds the history.
+* ``reviews``: individual reviews, indexed by (store, app_id).
+
+Raw store CSVs are bulk-loaded into a staging table and cleaned by a single
+``INSERT ... SELECT`` (:data:`CLEAN_RAW_SQL`), with the same rules as the
+``DataPreprocessor.clean_*`` methods. Training then reads everything with one
+query instead of opening a file per store or app.
+"""
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    from data.snapshots import SnapshotStore
+except ImportError:  # imported as src.data.warehouse
+    from src.data.snapshots import SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS apps (
+    id INTEGER PRIMARY KEY,
+    store TEXT NOT NULL,
+    app_id TEXT NOT NULL,
+    app_name TEXT,
+    app_size_mb REAL,
+    price_usd REAL,
+    app_type TEXT,
+    app_version TEXT,
+    user_rating REAL,
+    downloads INTEGER,
+    review_count INTEGER,
+    updated REAL,
+    UNIQUE (store, app_id)
+);
+CREATE INDEX IF NOT EXISTS apps_store ON apps (store);
+CREATE TABLE IF NOT EXISTS snapshots (
+    store TEXT NOT NULL,
+    app_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    user_rating REAL,
+    review_count INTEGER,
+    downloads INTEGER
+);
+CREATE INDEX IF NOT EXISTS snapshots_app_ts ON snapshots (store, app_id, ts);
+CREATE TABLE IF NOT EXISTS reviews (
+    store TEXT NOT NULL,
+    app_id TEXT NOT NULL,
+    text TEXT,
+    rating REAL,
+    date TEXT
+);
+CREATE INDEX IF NOT EXISTS reviews_app ON reviews (store, app_id);
+CREATE TABLE IF NOT EXISTS raw_apps (
+    store TEXT, row INTEGER, app_name TEXT, app_size TEXT, app_price TEXT,
+    app_type TEXT, app_version TEXT, user_rating TEXT, downloads TEXT
+);
+"""
+
+RAW_COLUMNS = {
+    'App Name': 'app_name', 'App Size': 'app_size', 'App Price': 'app_price', 'App Type': 'app_type',
+    'App Version': 'app_version', 'User Rating': 'user_rating', 'Downloads': 'downloads'
+}
+
+def _is_number(expr: str) -> str:
+    """SQL condition that ``expr`` is a signed decimal number with at most one dot.
+
+    CAST would turn junk such as "1.2.3" or "." into a number instead of failing
+    like ``float``. Exponents, "inf" and "nan" are not accepted.
+    """
+    trimmed = f"TRIM({expr})"
+    unsigned = f"(CASE WHEN SUBSTR({trimmed}, 1, 1) IN ('+', '-') THEN SUBSTR({trimmed}, 2) ELSE {trimmed} END)"
+    return f"({unsigned} GLOB '*[0-9]*' AND NOT {unsigned} GLOB '*[^0-9.]*' AND NOT {unsigned} GLOB '*.*.*')"
+
+def _before(expr: str, suffix: str) -> str:
+    """SQL for ``expr.split(suffix)[0]``."""
+    return f"(CASE WHEN INSTR({expr}, '{suffix}') THEN SUBSTR({expr}, 1, INSTR({expr}, '{suffix}') - 1) ELSE {expr} END)"
+
+_SIZE = "TRIM(REPLACE(app_size, ' MB', ''))"
+_PRICE = "TRIM(REPLACE(app_price, '$', ''))"
+_DOWNLOADS = _before(_before(_before("REPLACE(downloads, '+', '')", 'K'), 'M'), 'B')
+
+# Mirrors DataPreprocessor.clean_app_size, clean_app_price and clean_downloads, unparsable
+# values are NULL; benchmarks/warehouse_parity.py compares both paths on the same CSVs
+CLEAN_RAW_SQL = f"""
+INSERT OR REPLACE INTO apps (store, app_id, app_name, app_size_mb, price_usd, app_type,
+                             app_version, user_rating, downloads, updated)
+SELECT
+    store,
+    'raw:' || row,
+    app_name,
+    CASE WHEN {_is_number(_SIZE)} THEN CAST({_SIZE} AS REAL) END,
+    CASE WHEN app_price IN ('Free', 'Free with In-App Purchases') THEN 0.0
+         WHEN {_is_number(_PRICE)} THEN CAST({_PRICE} AS REAL) END,
+    LOWER(app_type),
+    NULLIF(app_version, ''),
+    CASE WHEN {_is_number('user_rating')} THEN CAST(user_rating AS REAL) END,
+    CASE WHEN {_is_number(_DOWNLOADS)} THEN CAST(CAST({_DOWNLOADS} AS REAL) *
+        CASE WHEN INSTR(downloads, 'K') THEN 1000 WHEN INSTR(downloads, 'M') THEN 1000000
+             WHEN INSTR(downloads, 'B') THEN 1000000000 ELSE 1 END AS INTEGER)
+         END,
+    :updated
+FROM raw_apps
+ORDER BY store, row
+"""
+
+class Warehouse:
+    """Read and write app store data in one SQLite file."""
+
+    def __init__(self, path: str = 'data/warehouse.sqlite'):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.snapshot_path = self.path.with_suffix('.snapshots.npz')
+        # Collectors of the three stores write concurrently; wait for the lock
+        self.conn = sqlite3.connect(str(self.path), timeout=60, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> 'Warehouse':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def load_raw_csvs(self, raw_dir: Path, store_files: Dict[str, str]) -> int:
+        """Replace the apps of each store with the cleaned rows of its raw CSV."""
+        raw_dir = Path(raw_dir)
+        with self.conn:
+            self.conn.execute('DELETE FROM raw_apps')
+            for store, filename in store_files.items():
+                try:
+                    raw = pd.read_csv(raw_dir / filename, dtype=str, keep_default_na=False)
+                except FileNotFoundError as e:
+                    logger.error("Error loading %s data: %s", store, e)
+                    continue
+                raw = raw.reindex(columns=list(RAW_COLUMNS))
+                self.conn.executemany(
+                    'INSERT INTO raw_apps VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    ((store, i, *values) for i, values in enumerate(raw.itertuples(index=False, name=None)))
+                )
+                self.conn.execute("DELETE FROM apps WHERE store = ? AND app_id LIKE 'raw:%'", (store,))
+            loaded = self.conn.execute(CLEAN_RAW_SQL, {'updated': time.time()}).rowcount
+            self.conn.execute('DELETE FROM raw_apps')
+        logger.info("Loaded %s raw app records into %s", loaded, self.path)
+        return loaded
+
+    def upsert_apps(self, store: str, apps: pd.DataFrame) -> int:
+        """Insert or update collected apps and record a snapshot of their metrics.
+
+        ``apps`` uses the collector columns: app_id, name, category, rating,
+        reviews, size, price and downloads.
+        """
+        if apps.empty:
+            return 0
+        now = time.time()
+        apps = apps.reindex(columns=['app_id', 'name', 'size', 'price', 'category', 'rating', 'downloads', 'reviews'])
+        rows = [
+            (store, str(app_id), name, size, price, str(category).lower() if category is not None else None,
+             rating, downloads, reviews, now)
+            for app_id, name, size, price, category, rating, downloads, reviews
+            in apps.astype(object).where(apps.notna(), None).itertuples(index=False, name=None)
+        ]
+        with self.conn:
+            self.conn.executemany(
+                """INSERT INTO apps (store, app_id, app_name, app_size_mb, price_usd, app_type,
+                                     user_rating, downloads, review_count, updated)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (store, app_id) DO UPDATE SET
+                       app_name = excluded.app_name, app_size_mb = excluded.app_size_mb,
+                       price_usd = excluded.price_usd, app_type = excluded.app_type,
+                       user_rating = excluded.user_rating, downloads = excluded.downloads,
+                       review_count = excluded.review_count, updated = excluded.updated""",
+                rows
+            )
+            self.conn.executemany(
+                'INSERT INTO snapshots VALUES (?, ?, ?, ?, ?, ?)',
+                ((store, row[1], now, row[6], row[8], row[7]) for row in rows)
+            )
+            self._fold_snapshots()
+        return len(rows)
+
+    def replace_reviews(self, store: str, app_id: str, reviews: Iterable[Dict[str, Any]]) -> int:
+        """Store the reviews of one app, replacing any collected before."""
+        rows = [(store, str(app_id), r.get('text'), r.get('rating'), r.get('date')) for r in reviews]
+        with self.conn:
+            self.conn.execute('DELETE FROM reviews WHERE store = ? AND app_id = ?', (store, str(app_id)))
+            self.conn.executemany('INSERT INTO reviews VALUES (?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+    def has_reviews(self, store: str, app_id: str) -> bool:
+        return self.conn.execute('SELECT 1 FROM reviews WHERE store = ? AND app_id = ? LIMIT 1',
+                                 (store, str(app_id))).fetchone() is not None
+
+    def query(self, sql: str, params: Sequence = ()) -> pd.DataFrame:
+        cursor = self.conn.execute(sql, params)
+        columns = [description[0] for description in cursor.description]
+        return pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+
+    def training_apps(self, stores: Sequence[str]) -> pd.DataFrame:
+        """Apps of ``stores`` in the DataPreprocessor processed column layout plus app_id, stores in order."""
+        # apps_store serves this order without a sort; the stores are reordered below
+        apps = self.query(
+            f"""SELECT app_name, app_size_mb, price_usd, app_type, app_version, user_rating, downloads, app_id, store
+                FROM apps WHERE store IN ({', '.join('?' * len(stores))}) ORDER BY store, id""", tuple(stores)
+        )
+        order = np.argsort(apps['store'].map({store: i for i, store in enumerate(stores)}).to_numpy(), kind='stable')
+        return apps.iloc[order].reset_index(drop=True)
+
+    def _fold_snapshots(self) -> SnapshotStore:
+        """Move staged snapshot rows into the encoded store file; call inside a transaction.
+
+        The rows are read and deleted under the database write lock, so
+        collectors writing concurrently fold one after another. A rolled back
+        delete only re-adds rows the store already replaces by (app, ts).
+        """
+        if not self.conn.in_transaction:
+            self.conn.execute('BEGIN IMMEDIATE')
+        store = SnapshotStore.load(self.snapshot_path)
+        staged = self.query('SELECT store, app_id, ts, user_rating, review_count, downloads FROM snapshots')
+        if not staged.empty:
+            store = store.extend(staged)
+            store.save(self.snapshot_path)
+            self.conn.execute('DELETE FROM snapshots')
+            logger.info("Folded %s snapshots into %s (%s snapshots of %s apps)",
+                        len(staged), self.snapshot_path, len(store), store.n_apps)
+        return store
+
+    def snapshot_store(self) -> SnapshotStore:
+        """All metric snapshots, from the encoded store file."""
+        with self.conn:
+            return self._fold_snapshots()
+
+    def reviews(self) -> pd.DataFrame:
+        return self.query('SELECT store, app_id, text, rating, date FROM reviews ORDER BY store, app_id')
+
+    def review_stats(self) -> pd.DataFrame:
+        """Review count and mean rating per app, aggregated in SQL."""
+        return self.query(
+            """SELECT store, app_id, COUNT(rating) AS review_count, AVG(rating) AS review_rating_mean
+               FROM reviews GROUP BY store, app_id ORDER BY store, app_id"""
+        )
+
+    def counts(self) -> Dict[str, int]:
+        counts = {table: self.conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                  for table in ('apps', 'reviews')}
+        counts['snapshots'] = len(self.snapshot_store())
+        return counts
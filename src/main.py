@@ -1,101 +1,350 @@
 import os
+import sys
+import json
+import argparse
 import logging
+from functools import partial
+from pathlib import Path
+
+import joblib
+import pandas as pd
+
 from data.collector import GooglePlayCollector, AppleAppStoreCollector, AmazonAppStoreCollector
 from data.preprocessor import DataPreprocessor
-from models.rating_predictor import RatingPredictor
+from data.sparse_encoding import SparseOneHotEncoder
+from data.entity_resolution import EntityIndex
+from data.version_features import add_version_features, parse_versions
+from data import dedup as dedup_module, entity_resolution, validation as validation_module
+from data.dedup import DEDUP_POLICIES
+from data.validation import VALIDATION_MODES
+from data.snapshots import SnapshotStore
+from data.warehouse import Warehouse
+from models.model_trainer import ModelTrainer
+from utils.logging_config import setup_logging
+from utils.pipeline import Pipeline, Stage
+from utils import profiling
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-def collect_data():
-    """Collect data from all platforms."""
-    collectors = [
-        GooglePlayCollector(),
-        AppleAppStoreCollector(),
-        AmazonAppStoreCollector()
-    ]
-    
-    all_app_data = []
-    all_review_data = []
-    
-    for collector in collectors:
+COLLECTORS = {
+    'google_play': GooglePlayCollector,
+    'apple': AppleAppStoreCollector,
+    'amazon': AmazonAppStoreCollector
+}
+
+def collector_dir(store):
+    return Path('data') / COLLECTORS[store].__name__.lower()
+
+def collect_store(store, warehouse_path=None):
+    """Collect app details and reviews from one store, resuming an interrupted run."""
+    warehouse = Warehouse(warehouse_path) if warehouse_path else None
+    try:
+        collector = COLLECTORS[store](warehouse=warehouse)
+        app_data = collector.collect_app_data()
+
+        for app_id in app_data.get('app_id', []):
+            # Reviews fetched by an interrupted earlier run are kept
+            if not collector.has_reviews(app_id):
+                collector.collect_reviews(app_id)
+    finally:
+        if warehouse is not None:
+            warehouse.close()
+
+def aggregate_reviews(work_dir, warehouse_path=None):
+    """Combine per-app review files into one table with per-app statistics."""
+    if warehouse_path:
+        with Warehouse(warehouse_path) as warehouse:
+            warehouse.reviews().to_csv(work_dir / 'reviews.csv', index=False)
+            warehouse.review_stats().to_csv(work_dir / 'review_stats.csv', index=False)
+        return
+
+    frames = []
+    for store in COLLECTORS:
+        for path in sorted(collector_dir(store).glob('reviews_*.csv')):
+            try:
+                reviews = pd.read_csv(path)
+            except pd.errors.EmptyDataError:
+                continue
+            reviews['store'] = store
+            reviews['app_id'] = path.stem[len('reviews_'):]
+            frames.append(reviews)
+
+    columns = ['store', 'app_id', 'text', 'rating', 'date']
+    reviews = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+    reviews.to_csv(work_dir / 'reviews.csv', index=False)
+
+    stats = reviews.groupby(['store', 'app_id'])['rating'].agg(['count', 'mean']).reset_index()
+    stats.columns = ['store', 'app_id', 'review_count', 'review_rating_mean']
+    stats.to_csv(work_dir / 'review_stats.csv', index=False)
+
+def build_raw(raw_dir):
+    """Convert collected app data into the raw store CSV schema used by DataPreprocessor."""
+    for store, filename in DataPreprocessor.STORE_FILES.items():
+        apps_path = collector_dir(store) / 'apps.csv'
         try:
-            # Collect app data
-            app_data = collector.collect_app_data()
-            all_app_data.append(app_data)
-            
-            # Collect reviews for each app
-            for app_id in app_data['app_id']:
-                reviews = collector.collect_reviews(app_id)
-                all_review_data.append(reviews)
-        except Exception as e:
-            logger.error(f"Error collecting data from {collector.__class__.__name__}: {str(e)}")
-    
-    return all_app_data, all_review_data
+            apps = pd.read_csv(apps_path)
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            apps = pd.DataFrame(columns=['name', 'size', 'price', 'category', 'rating', 'downloads'])
 
-def preprocess_data(app_data, review_data):
-    """Preprocess collected data."""
+        raw = pd.DataFrame({
+            'App Name': apps['name'],
+            'App Size': apps['size'].map(lambda size: f"{float(size):.0f} MB"),
+            'App Price': apps['price'].map(lambda price: 'Free' if float(price) == 0 else f"${float(price):.2f}"),
+            'App Type': apps['category'],
+            'App Version': None,
+            'User Rating': apps['rating'],
+            'Downloads': apps['downloads'].map(lambda downloads: f"{int(downloads)}+")
+        })
+        raw.to_csv(raw_dir / filename, index=False)
+
+def load_warehouse(raw_dir, warehouse_path):
+    """Load and clean the raw store CSVs into the warehouse."""
+    with Warehouse(warehouse_path) as warehouse:
+        warehouse.load_raw_csvs(raw_dir, DataPreprocessor.STORE_FILES)
+
+def preprocess(raw_dir, processed_path, entities_path, entity_index_path, dedup_stats_path, validation_path,
+               warehouse_path=None,
+               dedup='none', validation='warn'):
+    """Clean, validate, deduplicate and combine the raw store data, linking apps across stores."""
+    preprocessor = DataPreprocessor(data_dir=str(raw_dir), warehouse=warehouse_path, dedup=dedup,
+                                    validation=validation)
+    preprocessor.preprocess_data().to_pickle(processed_path)
+    preprocessor.entities.to_csv(entities_path, index=False)
+    preprocessor.entity_index.save(entity_index_path)
+    dedup_stats_path.write_text(json.dumps(preprocessor.dedup_stats, indent=2))
+    validation_path.write_text(json.dumps(preprocessor.validation_report, indent=2))
+
+def encode(processed_path, training_path, entity_index_path, sparse=False, categorical=None, hashing=None,
+           version_features=False, trend_features=False, entity_features=False):
+    """Encode categorical features into the training matrix (CSR when sparse)."""
     preprocessor = DataPreprocessor()
-    
-    # Preprocess app data
-    processed_app_data = preprocessor.preprocess_app_data(app_data)
-    
-    # Preprocess review data
-    processed_review_data = preprocessor.preprocess_reviews(review_data)
-    
-    return processed_app_data, processed_review_data
+    preprocessor.combined_data = pd.read_pickle(processed_path)
+    X, y = preprocessor.get_training_data(sparse=sparse, categorical=categorical, hashing=hashing,
+                                          version_features=version_features, trend_features=trend_features,
+                                          entity_features=entity_features)
+    data = {'X': X, 'y': y, 'groups': preprocessor.get_cv_groups()}
+    if sparse:
+        data['feature_names'] = preprocessor.encoder.feature_names_
+        data['encoder'] = preprocessor.encoder.to_dict()
+    if entity_features:
+        data['entity_index'] = EntityIndex.load(entity_index_path).to_dict()
+    pd.to_pickle(data, training_path)
 
-def train_model(processed_data):
-    """Train the rating prediction model."""
-    predictor = RatingPredictor(model_type='rf')
-    
-    # Prepare features and target
-    X = predictor.prepare_features(processed_data)
-    y = processed_data['rating']
-    
-    # Train model with hyperparameter optimization
-    train_score, val_score = predictor.train(X, y, optimize=True)
-    
-    # Get feature importance
-    feature_importance = predictor.get_feature_importance()
-    if feature_importance is not None:
-        logger.info("\nFeature Importance:")
-        logger.info(feature_importance)
+def train(training_path, model_dir, results_path, compact=False, compress=0, n_jobs=1, group_cv=False):
+    """Train and save all models.
     
-    # Save the trained model
-    model_path = os.path.join('models', 'rating_predictor.joblib')
-    predictor.save_model(model_path)
-    
-    return predictor
+    With compact=True the random forest is replaced by the smallest forest on
+    the accuracy/artifact-size Pareto front. With group_cv=True rows of the
+    same app never straddle the test split or a cross-validation fold.
+    """
+    data = pd.read_pickle(training_path)
+    groups = data['groups'] if group_cv else None
+    trainer = ModelTrainer(model_dir=str(model_dir), compress=compress, n_jobs=n_jobs)
+    results = trainer.train_models(data['X'], data['y'], feature_names=data.get('feature_names'), groups=groups)
+    if 'encoder' in data:
+        # Serve with SPARSE_ENCODER pointing at this vocabulary
+        SparseOneHotEncoder.from_dict(data['encoder']).save(Path(model_dir) / 'sparse_encoder.json')
+    if 'entity_index' in data:
+        # Serve with ENTITY_INDEX pointing at the entities the features were computed from
+        EntityIndex.from_dict(data['entity_index']).save(Path(model_dir) / 'entity_index.json')
+    if compact:
+        sweep = trainer.sweep_random_forest(data['X'], data['y'], groups=groups)
+        results['random_forest_sweep'] = sweep
+    results_path.write_text(json.dumps(results, indent=2, default=float))
+
+def evaluate(training_path, model_dir, results_path, evaluation_path):
+    """Report model metrics and random forest feature importance."""
+    data = pd.read_pickle(training_path)
+    trainer = ModelTrainer(model_dir=str(model_dir))
+    trainer.models['random_forest'] = joblib.load(Path(model_dir) / 'random_forest.joblib')
+    trainer.feature_importance = dict(zip(
+        data.get('feature_names') or data['X'].columns, trainer.models['random_forest'].feature_importances_
+    ))
+
+    evaluation = {
+        'results': json.loads(results_path.read_text()),
+        'feature_importance': trainer.get_feature_importance()
+    }
+    evaluation_path.write_text(json.dumps(evaluation, indent=2, default=float))
+
+    logger.info("Feature Importance:")
+    for feature, score in evaluation['feature_importance'].items():
+        logger.info("%s: %.4f", feature, score)
+
+def build_pipeline(work_dir='data', raw_dir=None, model_dir='src/models/saved', collect=False, max_workers=4,
+                   compact=False, compress=0, train_jobs=1, sparse=False, categorical=None, hashing=None,
+                   version_features=False, trend_features=False, entity_features=False, warehouse=None,
+                   dedup='none', group_cv=False, validation='warn'):
+    """Build the ARPS pipeline.
+
+    With collect=True the three stores are scraped concurrently and their data
+    replaces the bundled raw CSVs; otherwise training uses raw_dir directly.
+    With a warehouse path, collectors write apps and reviews to it (or the raw
+    CSVs are loaded into it) and preprocessing reads from it; trend_features
+    then adds rating/review/download trends from its snapshots.
+    """
+    if trend_features and not warehouse:
+        raise ValueError("trend_features needs a warehouse")
+    work_dir = Path(work_dir)
+    model_dir = Path(model_dir)
+    processed_dir = work_dir / 'processed'
+    processed_path = processed_dir / 'apps.pkl'
+    entities_path = processed_dir / 'entities.csv'
+    entity_index_path = processed_dir / 'entity_index.json'
+    dedup_stats_path = processed_dir / 'dedup_stats.json'
+    validation_path = processed_dir / 'validation.json'
+    training_path = processed_dir / 'training.pkl'
+    results_path = processed_dir / 'train_results.json'
+    evaluation_path = processed_dir / 'evaluation.json'
+
+    stages = []
+    collect_stages = [f'collect_{store}' for store in COLLECTORS] if collect else []
+    if collect:
+        raw_dir = work_dir / 'raw'
+        for store in COLLECTORS:
+            stages.append(Stage(
+                f'collect_{store}', partial(collect_store, store, warehouse),
+                outputs=[collector_dir(store) / 'apps.csv'],
+                code=[COLLECTORS[store], collect_store],
+                params={'max_apps': os.getenv('MAX_APPS_PER_PLATFORM', 1000), 'warehouse': warehouse}
+            ))
+        collector_dirs = [collector_dir(store) for store in COLLECTORS]
+        stages.append(Stage(
+            'aggregate_reviews', partial(aggregate_reviews, work_dir, warehouse),
+            inputs=[warehouse] if warehouse else collector_dirs,
+            outputs=[work_dir / 'reviews.csv', work_dir / 'review_stats.csv'],
+            code=[aggregate_reviews, Warehouse],
+            after=collect_stages
+        ))
+        if not warehouse:
+            stages.append(Stage(
+                'build_raw', partial(build_raw, raw_dir),
+                inputs=[collector_dir(store) / 'apps.csv' for store in COLLECTORS],
+                outputs=[raw_dir / filename for filename in DataPreprocessor.STORE_FILES.values()],
+                code=[build_raw]
+            ))
+    else:
+        raw_dir = Path(raw_dir or 'src/data/raw')
+        if warehouse:
+            stages.append(Stage(
+                'load_warehouse', partial(load_warehouse, raw_dir, warehouse),
+                inputs=[raw_dir / filename for filename in DataPreprocessor.STORE_FILES.values()],
+                outputs=[warehouse],
+                code=[load_warehouse, Warehouse]
+            ))
+
+    stages.extend([
+        Stage(
+            'preprocess', partial(preprocess, raw_dir, processed_path, entities_path, entity_index_path,
+                                  dedup_stats_path, validation_path, warehouse, dedup, validation),
+            inputs=[warehouse] if warehouse else
+                   [raw_dir / filename for filename in DataPreprocessor.STORE_FILES.values()],
+            outputs=[processed_path, entities_path, entity_index_path, dedup_stats_path, validation_path],
+            code=[preprocess, DataPreprocessor, Warehouse, SnapshotStore, add_version_features, parse_versions,
+                  entity_resolution, dedup_module, validation_module],
+            params={'dedup': dedup, 'validation': validation},
+            after=collect_stages if warehouse else []
+        ),
+        Stage(
+            'encode', partial(encode, processed_path, training_path, entity_index_path, sparse, categorical, hashing,
+                              version_features, trend_features, entity_features),
+            inputs=[processed_path, entity_index_path],
+            outputs=[training_path],
+            code=[encode, DataPreprocessor, SparseOneHotEncoder, EntityIndex],
+            params={'sparse': sparse, 'categorical': categorical, 'hashing': hashing,
+                    'version_features': version_features, 'trend_features': trend_features,
+                    'entity_features': entity_features}
+        ),
+        Stage(
+            'train', partial(train, training_path, model_dir, results_path, compact, compress, train_jobs,
+                             group_cv),
+            inputs=[training_path],
+            outputs=[model_dir / 'random_forest.joblib', model_dir / 'linear_regression.joblib', results_path]
+                    + ([model_dir / 'sparse_encoder.json'] if sparse else [])
+                    + ([model_dir / 'entity_index.json'] if entity_features else []),
+            code=[train, ModelTrainer],
+            params={'compact': compact, 'compress': compress, 'group_cv': group_cv}
+        ),
+        Stage(
+            'evaluate', partial(evaluate, training_path, model_dir, results_path, evaluation_path),
+            inputs=[training_path, model_dir / 'random_forest.joblib', results_path],
+            outputs=[evaluation_path],
+            code=[evaluate, ModelTrainer]
+        )
+    ])
+
+    return Pipeline(stages, manifest_path=str(work_dir / '.pipeline_manifest.json'), max_workers=max_workers)
 
 def main():
     """Main execution function."""
+    parser = argparse.ArgumentParser(description='Run the ARPS data and training pipeline.')
+    parser.add_argument('--collect', action='store_true',
+                        help='scrape the app stores instead of using the bundled raw data')
+    parser.add_argument('--raw-dir', default='src/data/raw', help='raw store CSVs to train on')
+    parser.add_argument('--work-dir', default='data', help='directory for intermediate outputs')
+    parser.add_argument('--model-dir', default='src/models/saved')
+    parser.add_argument('--stage', action='append', help='run only this stage and its upstream stages')
+    parser.add_argument('--force', action='append', default=[], help='rerun this stage even if cached')
+    parser.add_argument('--workers', type=int, default=4, help='stages to run concurrently')
+    parser.add_argument('--compact', action='store_true',
+                        help='sweep random forest size settings and keep the smallest near-best model')
+    parser.add_argument('--compress', type=int, default=0, help='joblib compression level (0-9) for saved models')
+    parser.add_argument('--train-jobs', type=int, default=1,
+                        help='worker processes for cross-validation (-1 for all cores)')
+    parser.add_argument('--sparse', action='store_true',
+                        help='encode features as a sparse matrix with a saved vocabulary')
+    parser.add_argument('--categorical', nargs='+',
+                        help='categorical columns for --sparse (default: app_type store)')
+    parser.add_argument('--hashing', type=int, help='hash categories into N columns with --sparse')
+    parser.add_argument('--version-features', action='store_true',
+                        help='train on parsed app version major/minor/patch and per-app version rank '
+                             '(training only: the web predictor rejects these models)')
+    parser.add_argument('--trend-features', action='store_true',
+                        help='train on rating velocity and review/download growth from --warehouse snapshots '
+                             '(training only: the web predictor rejects these models)')
+    parser.add_argument('--entity-features', action='store_true',
+                        help='train on the number of stores listing the same app and its downloads there '
+                             '(serve with ENTITY_INDEX=<model-dir>/entity_index.json)')
+    parser.add_argument('--dedup', choices=DEDUP_POLICIES, default='none',
+                        help='policy for repeated app records: drop exact duplicates, keep the latest '
+                             'version of each app or aggregate its rows (default: keep all)')
+    parser.add_argument('--validation', choices=VALIDATION_MODES, default='warn',
+                        help='on raw records failing schema/range checks: log a warning (default), '
+                             'stop the pipeline or skip the checks')
+    parser.add_argument('--group-cv', action='store_true',
+                        help='split train/test and CV folds by app so its rows never straddle a split')
+    parser.add_argument('--warehouse', help='SQLite warehouse to collect into and train from, '
+                                            'e.g. data/warehouse.sqlite (default: CSV files)')
+    parser.add_argument('--profile', choices=profiling.MODES,
+                        help='profile stages and write pstats/folded stacks to --profile-dir')
+    parser.add_argument('--profile-dir', default='profiles')
+    args = parser.parse_args()
+    
+    if args.profile:
+        profiling.enable(args.profile, args.profile_dir)
+
     try:
-        # Create necessary directories
-        os.makedirs('data', exist_ok=True)
-        os.makedirs('models', exist_ok=True)
-        
-        # Step 1: Collect data
-        logger.info("Starting data collection...")
-        app_data, review_data = collect_data()
-        
-        # Step 2: Preprocess data
-        logger.info("Preprocessing data...")
-        processed_app_data, processed_review_data = preprocess_data(app_data, review_data)
-        
-        # Step 3: Train model
-        logger.info("Training model...")
-        predictor = train_model(processed_app_data)
-        
+        pipeline = build_pipeline(
+            work_dir=args.work_dir, raw_dir=args.raw_dir, model_dir=args.model_dir,
+            collect=args.collect, max_workers=args.workers,
+            compact=args.compact, compress=args.compress, train_jobs=args.train_jobs,
+            sparse=args.sparse, categorical=args.categorical, hashing=args.hashing,
+            version_features=args.version_features, trend_features=args.trend_features,
+            entity_features=args.entity_features, dedup=args.dedup, group_cv=args.group_cv,
+            validation=args.validation,
+            warehouse=args.warehouse
+        )
+        results = pipeline.run(targets=args.stage, force=args.force)
+
+        logger.info("Pipeline summary:\n%s", Pipeline.format_summary(results))
+        if any(result['status'] in ('failed', 'blocked') for result in results.values()):
+            sys.exit(1)
         logger.info("ARPS pipeline completed successfully!")
-        
+
     except Exception as e:
-        logger.error(f"Error in ARPS pipeline: {str(e)}")
+        logger.error("Error in ARPS pipeline: %s", e)
         raise
 
 if __name__ == "__main__":
+    setup_logging()
     main()
@@ -0,0 +1,178 @@
+"""Distill the random forest into a compact surrogate model.
+
+The surrogate is trained on the forest's own predictions over the real
+training inputs plus synthetic inputs drawn from the same feature ranges, so
+it learns the forest's function rather than the noisy ratings. Supported
+surrogates:
+
+- ``gbm``: shallow histogram gradient boosting
+- ``tree``: a single depth-limited decision tree
+- ``linear``: piecewise-linear (degree-1 splines per feature) regression
+
+Each surrogate is saved as ``distilled_<kind>.joblib`` next to the forest;
+serve one by setting ``MODEL_NAME=distilled_<kind>``:
+
+    python src/models/distill.py --surrogate gbm tree linear
+"""
+import argparse
+import io
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SURROGATES = ('gbm', 'tree', 'linear')
+NUMERIC_FEATURES = ['app_size_mb', 'price_usd', 'downloads']
+
+
+def make_surrogate(kind: str) -> Any:
+    """Create an untrained surrogate estimator."""
+    if kind == 'gbm':
+        from sklearn.ensemble import HistGradientBoostingRegressor
+        return HistGradientBoostingRegressor(max_depth=4, max_iter=150, learning_rate=0.1, random_state=42)
+    if kind == 'tree':
+        from sklearn.tree import DecisionTreeRegressor
+        return DecisionTreeRegressor(max_depth=8, min_samples_leaf=20, random_state=42)
+    if kind == 'linear':
+        from sklearn.linear_model import Ridge
+        from sklearn.pipeline import make_pipeline
+        from sklearn.preprocessing import SplineTransformer
+        return make_pipeline(SplineTransformer(n_knots=12, degree=1, knots='quantile'), Ridge(alpha=1e-3))
+    raise ValueError(f"Unknown surrogate {kind!r}, expected one of {SURROGATES}")
+
+
+def synthetic_inputs(X: pd.DataFrame, n: int, seed: int = 42) -> pd.DataFrame:
+    """Sample inputs covering the ranges of the real features.
+
+    Size and price are drawn uniformly over their observed range, downloads
+    log-uniformly, and each row gets one app type and one store.
+    """
+    rng = np.random.default_rng(seed)
+    synthetic = pd.DataFrame(0.0, index=range(n), columns=X.columns)
+    for column in ('app_size_mb', 'price_usd'):
+        synthetic[column] = rng.uniform(X[column].min(), X[column].max(), n)
+    log_downloads = np.log10(X['downloads'].clip(lower=1))
+    synthetic['downloads'] = 10 ** rng.uniform(log_downloads.min(), log_downloads.max(), n)
+
+    for prefix in ('app_type_', 'store_'):
+        columns = [c for c in X.columns if c.startswith(prefix)]
+        choice = rng.integers(0, len(columns), n)
+        for i, column in enumerate(columns):
+            synthetic[column] = (choice == i).astype(float)
+    return synthetic
+
+
+def _artifact_bytes(model: Any) -> int:
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return buffer.getbuffer().nbytes
+
+
+def _row_latency_ms(model: Any, row: pd.DataFrame, repeat: int = 50) -> float:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model.predict(row)
+        latencies.append(time.perf_counter() - start)
+    return float(np.median(latencies)) * 1000
+
+
+def distill(forest: Any, X: pd.DataFrame, y: Optional[pd.Series] = None, kinds: List[str] = SURROGATES,
+            n_synthetic: int = 50_000, seed: int = 42) -> Dict[str, Dict[str, Any]]:
+    """Train surrogates of ``forest`` and measure fidelity, size and latency.
+
+    Returns per-surrogate reports including the fitted ``model``. Fidelity is
+    measured on held-out real and synthetic rows against the forest's
+    predictions; when ``y`` is given, RMSE against the true ratings is
+    reported for both the forest and the surrogate.
+    """
+    from sklearn.model_selection import train_test_split
+
+    X = X.astype(float)
+    inputs = pd.concat([X, synthetic_inputs(X, n_synthetic, seed)], ignore_index=True)
+    teacher = forest.predict(inputs)
+    X_train, X_test, t_train, t_test = train_test_split(inputs, teacher, test_size=0.2, random_state=seed)
+
+    row = X.iloc[:1]
+    forest_summary = {
+        'artifact_bytes': _artifact_bytes(forest),
+        'row_latency_ms': _row_latency_ms(forest, row)
+    }
+    if y is not None:
+        forest_summary['rmse_vs_ratings'] = float(np.sqrt(np.mean((forest.predict(X) - y) ** 2)))
+
+    reports = {}
+    for kind in kinds:
+        model = make_surrogate(kind)
+        start = time.perf_counter()
+        model.fit(X_train, t_train)
+        fit_seconds = time.perf_counter() - start
+
+        errors = model.predict(X_test) - t_test
+        report = {
+            'fit_seconds': fit_seconds,
+            'fidelity_rmse': float(np.sqrt(np.mean(errors ** 2))),
+            'fidelity_r2': float(1 - np.sum(errors ** 2) / np.sum((t_test - t_test.mean()) ** 2)),
+            'fidelity_max_abs': float(np.abs(errors).max()),
+            'artifact_bytes': _artifact_bytes(model),
+            'row_latency_ms': _row_latency_ms(model, row),
+            'model': model
+        }
+        if y is not None:
+            report['rmse_vs_ratings'] = float(np.sqrt(np.mean((model.predict(X) - y) ** 2)))
+        report['size_reduction'] = forest_summary['artifact_bytes'] / report['artifact_bytes']
+        report['speedup'] = forest_summary['row_latency_ms'] / report['row_latency_ms']
+        reports[kind] = report
+        logger.info("Distilled %s: fidelity RMSE %.4f, %.1fx smaller, %.1fx faster",
+                    kind, report['fidelity_rmse'], report['size_reduction'], report['speedup'])
+
+    reports['forest'] = forest_summary
+    return reports
+
+
+def main():
+    root_dir = Path(__file__).parent.parent.parent
+    sys.path.append(str(root_dir))
+    from src.data.preprocessor import DataPreprocessor
+    from src.utils.logging_config import setup_logging
+
+    parser = argparse.ArgumentParser(description='Distill the random forest into compact surrogate models.')
+    parser.add_argument('--model-dir', default=str(root_dir / 'src' / 'models' / 'saved'))
+    parser.add_argument('--data-dir', default=str(root_dir / 'src' / 'data' / 'raw'),
+                        help='raw store CSVs providing the real inputs')
+    parser.add_argument('--surrogate', nargs='+', choices=SURROGATES, default=['gbm'])
+    parser.add_argument('--synthetic', type=int, default=50_000, help='synthetic inputs added to the real ones')
+    parser.add_argument('--no-save', action='store_true', help='only report, do not write the surrogates')
+    args = parser.parse_args()
+
+    setup_logging()
+    model_dir = Path(args.model_dir)
+    forest = joblib.load(model_dir / 'random_forest.joblib')
+
+    X, y = DataPreprocessor(data_dir=args.data_dir).get_training_data()
+    # Align the encoded columns with the forest's training schema
+    features = list(getattr(forest, 'feature_names_in_', X.columns))
+    X = X.reindex(columns=features, fill_value=0)
+
+    reports = distill(forest, X, y, args.surrogate, n_synthetic=args.synthetic)
+    for kind in args.surrogate:
+        model = reports[kind].pop('model')
+        if not args.no_save:
+            path = model_dir / f'distilled_{kind}.joblib'
+            tmp_path = model_dir / f'.{path.name}.tmp'
+            joblib.dump(model, tmp_path)
+            tmp_path.replace(path)
+            reports[kind]['path'] = str(path)
+    print(json.dumps(reports, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+import os
+import re
+import threading
+import time
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import joblib
+
+logger = logging.getLogger(__name__)
+
+
+class ActiveModel:
+    """An immutable snapshot of the model currently being served."""
+
+    def __init__(self, model: Any, version: str, path: Path, fingerprint: tuple):
+        self.model = model
+        self.version = version
+        self.path = path
+        self.fingerprint = fingerprint
+        self.loaded_at = datetime.now()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'version': self.version,
+            'path': str(self.path),
+            'loaded_at': self.loaded_at.isoformat(timespec='seconds')
+        }
+
+
+class ModelRegistry:
+    """Watch the saved models directory and hot-swap the served model.
+
+    Artifacts are named ``<model_name>.joblib`` or ``<model_name>-<version>.joblib``
+    (``.onnx`` with the onnx backend, served through onnxruntime).
+    The newest artifact (by modification time) is loaded in a background thread
+    and swapped in with a single reference assignment, so request handlers that
+    already hold the previous model keep using it until they finish.
+    """
+
+    BACKENDS = {'joblib': '.joblib', 'onnx': '.onnx'}
+
+    def __init__(self, model_dir: Path, model_name: str = 'random_forest',
+                 poll_interval: float = 30.0, backend: str = 'joblib',
+                 validate: Optional[Callable[[Any], None]] = None):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown model backend {backend!r}, expected one of {sorted(self.BACKENDS)}")
+        self.model_dir = Path(model_dir)
+        self.model_name = model_name
+        self.poll_interval = poll_interval
+        self.backend = backend
+        # Raises ValueError for loaded models that cannot serve requests; they are never activated
+        self.validate = validate
+        extension = re.escape(self.BACKENDS[backend])
+        self._pattern = re.compile(rf'^{re.escape(model_name)}(?:-(?P<version>[\w.\-]+))?{extension}$')
+        self._active: Optional[ActiveModel] = None
+        self._last_error: Optional[str] = None
+        # Fingerprint of the newest artifact that failed to load, skipped until it changes
+        self._failed_fingerprint: Optional[tuple] = None
+        self._last_check: Optional[datetime] = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._owner_pid: Optional[int] = None
+
+    @property
+    def active(self) -> Optional[ActiveModel]:
+        return self._active
+
+    def get_model(self) -> Any:
+        """Return the model that should serve the current request."""
+        active = self._active
+        if active is None:
+            raise FileNotFoundError(f"No {self.model_name} model loaded from {self.model_dir}")
+        # Poller threads do not survive a fork (e.g. gunicorn --preload), restart lazily
+        if self._owner_pid is not None and self._owner_pid != os.getpid():
+            self.start()
+        return active.model
+
+    def list_versions(self) -> List[Dict[str, Any]]:
+        """List the artifacts in the model directory, newest first."""
+        versions = []
+        if not self.model_dir.exists():
+            return versions
+        for path in self.model_dir.iterdir():
+            match = self._pattern.match(path.name)
+            if not match:
+                continue
+            stat = path.stat()
+            version = match.group('version') or datetime.fromtimestamp(stat.st_mtime).strftime('%Y%m%dT%H%M%S')
+            versions.append({
+                'version': version,
+                'path': path,
+                'fingerprint': (path.name, stat.st_size, stat.st_mtime_ns)
+            })
+        versions.sort(key=lambda v: v['fingerprint'][2], reverse=True)
+        return versions
+
+    def check_for_update(self) -> bool:
+        """Load the newest artifact if it differs from the active one.
+
+        Returns True when a new model was swapped in. A failed load keeps the
+        current model active; the artifact is retried once it is rewritten
+        (its size or modification time changes) or a newer one appears.
+        """
+        with self._reload_lock:
+            self._last_check = datetime.now()
+            versions = self.list_versions()
+            if not versions:
+                return False
+
+            newest = versions[0]
+            active = self._active
+            if active is not None and active.fingerprint == newest['fingerprint']:
+                return False
+            if newest['fingerprint'] == self._failed_fingerprint:
+                return False
+
+            logger.info("Loading %s model version %s from %s",
+                        self.model_name, newest['version'], newest['path'])
+            start = time.perf_counter()
+            try:
+                model = self._load(newest['path'])
+                if self.validate is not None:
+                    self.validate(model)
+            except Exception as e:
+                self._last_error = f"{newest['path'].name}: {e}"
+                self._failed_fingerprint = newest['fingerprint']
+                logger.error("Failed to load model %s, keeping current model: %s", newest['path'], e)
+                return False
+
+            self._active = ActiveModel(model, newest['version'], newest['path'], newest['fingerprint'])
+            self._last_error = None
+            self._failed_fingerprint = None
+            logger.info("Activated %s model version %s in %.2fs",
+                        self.model_name, newest['version'], time.perf_counter() - start)
+            return True
+
+    def _load(self, path: Path) -> Any:
+        if self.backend == 'onnx':
+            # Imported here so joblib deployments never need onnxruntime
+            from .onnx_export import OnnxModel
+            return OnnxModel(path)
+        return joblib.load(path)
+
+    def start(self) -> 'ModelRegistry':
+        """Load the current model synchronously, then start the background poller."""
+        if self._active is None:
+            self.check_for_update()
+            if self._active is None:
+                raise FileNotFoundError(
+                    f"No {self.model_name} model found in {self.model_dir}: {self._last_error or 'no artifacts'}"
+                )
+
+        if self.poll_interval > 0 and not (self._thread and self._thread.is_alive()
+                                           and self._owner_pid == os.getpid()):
+            self._stop.clear()
+            self._owner_pid = os.getpid()
+            self._thread = threading.Thread(target=self._poll, name='model-registry', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _poll(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check_for_update()
+            except Exception as e:
+                logger.error("Model registry poll failed: %s", e)
+
+    def status(self) -> Dict[str, Any]:
+        """Describe the active model and watcher state for the admin endpoint."""
+        active = self._active
+        return {
+            'model_name': self.model_name,
+            'backend': self.backend,
+            'model_dir': str(self.model_dir),
+            'active': active.to_dict() if active else None,
+            'available_versions': [v['version'] for v in self.list_versions()],
+            'poll_interval': self.poll_interval,
+            'watching': bool(self._thread and self._thread.is_alive()),
+            'last_check': self._last_check.isoformat(timespec='seconds') if self._last_check else None,
+            'last_error': self._last_error
+        }
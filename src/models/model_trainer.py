@@ -1,34 +1,82 @@
 import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 import joblib
 from pathlib import Path
+import io
 import logging
-from typing import Dict, Tuple, Any
+import time
+from typing import Dict, List, Tuple, Any, Optional
+import os
+
+try:
+    from utils.profiling import profile_stage
+    from utils.shared_arrays import shared_training_data
+except ImportError:  # imported as src.models.model_trainer
+    from src.utils.profiling import profile_stage
+    from src.utils.shared_arrays import shared_training_data
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class ModelTrainer:
     """Class for training and evaluating app rating prediction models."""
     
-    def __init__(self, model_dir: str = "src/models/saved"):
-        """Initialize the model trainer."""
+    # Random forest settings explored by sweep_random_forest
+    FOREST_SWEEP_GRID = {
+        'max_depth': [None, 16, 12, 8],
+        'min_samples_leaf': [1, 5, 20],
+        'max_leaf_nodes': [None, 1024, 256]
+    }
+    
+    def __init__(self, model_dir: str = "src/models/saved", version: Optional[str] = None,
+                 compress: int = 0, n_jobs: int = 1, share_memory: bool = True):
+        """Initialize the model trainer.
+        
+        When a version is given, models are saved as ``<name>-<version>.joblib``
+        so running web workers can hot-reload them alongside older versions.
+        ``compress`` is the joblib compression level (0-9) used when saving.
+        With ``n_jobs`` other than 1, cross-validation runs in parallel and, if
+        ``share_memory``, workers read a memory-mapped copy of the training
+        matrix instead of each receiving a pickled DataFrame.
+        """
         self.model_dir = Path(model_dir)
+        self.version = version
+        self.compress = compress
+        self.n_jobs = n_jobs
+        self.share_memory = share_memory
         self.model_dir.mkdir(parents=True, exist_ok=True)
         self.models = {}
         self.feature_importance = {}
+        self.feature_names = []
+        
+    @staticmethod
+    def _train_test_split(X: Any, y: pd.Series, groups: Optional[np.ndarray] = None) -> Tuple:
+        """80/20 split; with ``groups``, every group falls entirely on one side."""
+        from sklearn.model_selection import GroupShuffleSplit, train_test_split
+        
+        if groups is None:
+            return train_test_split(X, y, test_size=0.2, random_state=42)
+        train, test = next(GroupShuffleSplit(n_splits=1, test_size=0.2, random_state=42).split(X, y, groups))
+        take = (lambda data, rows: data.iloc[rows]) if hasattr(X, 'iloc') else (lambda data, rows: data[rows])
+        return take(X, train), take(X, test), y.iloc[train], y.iloc[test]
+    
+    @profile_stage('train.train_models')
+    def train_models(self, X: pd.DataFrame, y: pd.Series,
+                     feature_names: Optional[List[str]] = None,
+                     groups: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """Train multiple models and evaluate their performance.
+        
+        ``X`` may be a DataFrame or a scipy sparse matrix from
+        SparseOneHotEncoder, in which case ``feature_names`` names its columns.
+        With ``groups`` (e.g. ``DataPreprocessor.get_cv_groups()``) the test
+        split and cross-validation folds keep each group on one side.
+        """
+        self.feature_names = list(feature_names if feature_names is not None else X.columns)
+        # sklearn is imported on first use to keep importing this module cheap
+        from sklearn.ensemble import RandomForestRegressor
+        from sklearn.linear_model import LinearRegression
         
-    def train_models(self, X: pd.DataFrame, y: pd.Series) -> Dict[str, Any]:
-        """Train multiple models and evaluate their performance."""
         # Split data into train and test sets
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
-        )
+        X_train, X_test, y_train, y_test = self._train_test_split(X, y, groups)
         
         # Initialize models
         models = {
@@ -45,21 +93,22 @@ class ModelTrainer:
         
         # Train and evaluate each model
         for name, model in models.items():
-            logger.info(f"\nTraining {name}...")
+            logger.info("\nTraining %s...", name)
             
             # Train model
-            model.fit(X_train, y_train)
+            with profile_stage(f'train.{name}.fit'):
+                model.fit(X_train, y_train)
             
             # Make predictions
-            y_pred = model.predict(X_test)
+            with profile_stage(f'train.{name}.predict'):
+                y_pred = model.predict(X_test)
             
             # Calculate metrics
             metrics = self._calculate_metrics(y_test, y_pred)
             
             # Perform cross-validation
-            cv_scores = cross_val_score(
-                model, X, y, cv=5, scoring='neg_mean_squared_error'
-            )
+            with profile_stage(f'train.{name}.cv'):
+                cv_scores = self.cross_validate(model, X, y, cv=5, groups=groups)
             cv_rmse = np.sqrt(-cv_scores.mean())
             
             # Store results
@@ -74,25 +123,52 @@ class ModelTrainer:
             # Calculate feature importance for random forest
             if name == 'random_forest':
                 self.feature_importance = dict(zip(
-                    X.columns,
+                    self.feature_names,
                     model.feature_importances_
                 ))
             
             # Save model
-            self._save_model(name, model)
+            with profile_stage(f'train.{name}.save'):
+                self._save_model(name, model)
             
             # Log results
-            logger.info(f"\nResults for {name}:")
-            logger.info(f"MSE: {metrics['mse']:.4f}")
-            logger.info(f"RMSE: {metrics['rmse']:.4f}")
-            logger.info(f"MAE: {metrics['mae']:.4f}")
-            logger.info(f"R2 Score: {metrics['r2']:.4f}")
-            logger.info(f"Cross-validation RMSE: {cv_rmse:.4f}")
+            logger.info("\nResults for %s:", name)
+            logger.info("MSE: %.4f", metrics['mse'])
+            logger.info("RMSE: %.4f", metrics['rmse'])
+            logger.info("MAE: %.4f", metrics['mae'])
+            logger.info("R2 Score: %.4f", metrics['r2'])
+            logger.info("Cross-validation RMSE: %.4f", cv_rmse)
         
         return results
     
+    def cross_validate(self, model: Any, X: pd.DataFrame, y: pd.Series, cv: int = 5,
+                       groups: Optional[np.ndarray] = None) -> np.ndarray:
+        """Negative MSE cross-validation scores, run on ``self.n_jobs`` workers.
+        
+        With ``groups`` the folds are a GroupKFold, so no group is split
+        across a fold's train and test rows.
+        """
+        from sklearn.model_selection import GroupKFold, cross_val_score
+        from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+        from sklearn.tree import DecisionTreeRegressor
+        
+        if groups is not None:
+            cv = GroupKFold(n_splits=cv)
+        # Sparse matrices are passed as-is; joblib memory-maps their data arrays itself
+        if self.n_jobs == 1 or not self.share_memory or hasattr(X, 'tocsr'):
+            return cross_val_score(model, X, y, groups=groups, cv=cv, scoring='neg_mean_squared_error',
+                                   n_jobs=self.n_jobs)
+        # Trees fit on float32, so sharing float32 saves each worker a conversion copy
+        trees = (RandomForestRegressor, ExtraTreesRegressor, DecisionTreeRegressor)
+        dtype = np.float32 if isinstance(model, trees) else np.float64
+        with shared_training_data(X, y, dtype=dtype) as (X_shared, y_shared):
+            return cross_val_score(model, X_shared, y_shared, groups=groups, cv=cv,
+                                   scoring='neg_mean_squared_error', n_jobs=self.n_jobs)
+    
     def _calculate_metrics(self, y_true: np.ndarray, y_pred: np.ndarray) -> Dict[str, float]:
         """Calculate regression metrics."""
+        from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
+        
         return {
             'mse': mean_squared_error(y_true, y_pred),
             'rmse': np.sqrt(mean_squared_error(y_true, y_pred)),
@@ -102,18 +178,125 @@ class ModelTrainer:
     
     def _save_model(self, name: str, model: Any) -> None:
         """Save model to disk."""
-        model_path = self.model_dir / f"{name}.joblib"
-        joblib.dump(model, model_path)
-        logger.info(f"Saved {name} model to {model_path}")
+        filename = f"{name}-{self.version}.joblib" if self.version else f"{name}.joblib"
+        model_path = self.model_dir / filename
+        
+        # Write to a temporary file and rename, so watchers never see a partial artifact
+        tmp_path = self.model_dir / f".{filename}.tmp"
+        joblib.dump(model, tmp_path, compress=self.compress)
+        os.replace(tmp_path, model_path)
+        logger.info("Saved %s model to %s", name, model_path)
+    
+    @profile_stage('train.sweep_random_forest')
+    def sweep_random_forest(self, X: pd.DataFrame, y: pd.Series, grid: Optional[Dict[str, List]] = None,
+                            n_estimators: int = 100, max_rmse_increase: float = 0.01,
+                            save: bool = True, groups: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """Trade random forest accuracy against artifact size.
+        
+        Fits one forest per combination in ``grid`` (default FOREST_SWEEP_GRID)
+        and measures test RMSE, serialized size (with this trainer's compression),
+        load time and single-row latency. Among the Pareto-optimal candidates on
+        (RMSE, bytes), the smallest whose RMSE is within ``max_rmse_increase``
+        (relative) of the best is selected and, if ``save``, saved as the
+        random forest model. ``groups`` keeps each group on one side of the
+        test split, as in ``train_models``.
+        """
+        from sklearn.model_selection import ParameterGrid
+        from sklearn.ensemble import RandomForestRegressor
+        
+        X_train, X_test, y_train, y_test = self._train_test_split(X, y, groups)
+        row = X_test[:1]
+        
+        candidates = []
+        for params in ParameterGrid(grid or self.FOREST_SWEEP_GRID):
+            model = RandomForestRegressor(n_estimators=n_estimators, random_state=42, **params)
+            model.fit(X_train, y_train)
+            metrics = self._calculate_metrics(y_test, model.predict(X_test))
+            
+            buffer = io.BytesIO()
+            joblib.dump(model, buffer, compress=self.compress)
+            start = time.perf_counter()
+            joblib.load(io.BytesIO(buffer.getvalue()))
+            load_seconds = time.perf_counter() - start
+            
+            latencies = []
+            for _ in range(20):
+                start = time.perf_counter()
+                model.predict(row)
+                latencies.append(time.perf_counter() - start)
+            
+            candidates.append({
+                'params': params,
+                'rmse': metrics['rmse'],
+                'r2': metrics['r2'],
+                'artifact_bytes': buffer.getbuffer().nbytes,
+                'load_seconds': load_seconds,
+                'row_latency_ms': float(np.median(latencies)) * 1000,
+                'model': model
+            })
+            logger.info("Forest %s: RMSE %.4f, %.1f MB", params, metrics['rmse'],
+                        candidates[-1]['artifact_bytes'] / 2**20)
+        
+        pareto = self._pareto_front(candidates)
+        best_rmse = min(c['rmse'] for c in candidates)
+        acceptable = [c for c in pareto if c['rmse'] <= best_rmse * (1 + max_rmse_increase)]
+        selected = min(acceptable, key=lambda c: c['artifact_bytes'])
+        
+        self.models['random_forest'] = selected['model']
+        feature_names = self.feature_names or list(X.columns)
+        self.feature_importance = dict(zip(feature_names, selected['model'].feature_importances_))
+        if save:
+            self._save_model('random_forest', selected['model'])
+        logger.info("Selected forest %s: RMSE %.4f (best %.4f), %.1f MB",
+                    selected['params'], selected['rmse'], best_rmse, selected['artifact_bytes'] / 2**20)
+        
+        def describe(candidate):
+            return {key: value for key, value in candidate.items() if key != 'model'}
+        
+        return {
+            'candidates': [describe(c) for c in candidates],
+            'pareto': [describe(c) for c in pareto],
+            'selected': describe(selected)
+        }
+    
+    @staticmethod
+    def _pareto_front(candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Candidates not beaten on both RMSE and artifact size, smallest first."""
+        front = []
+        for candidate in sorted(candidates, key=lambda c: (c['artifact_bytes'], c['rmse'])):
+            if not front or candidate['rmse'] < front[-1]['rmse']:
+                front.append(candidate)
+        return front
+    
+    def export_onnx(self) -> Dict[str, Path]:
+        """Export the trained models to ONNX next to their joblib artifacts."""
+        try:
+            from models.onnx_export import export_model
+        except ImportError:  # imported as src.models.model_trainer
+            from src.models.onnx_export import export_model
+        
+        paths = {}
+        for name, model in self.models.items():
+            filename = f"{name}-{self.version}.onnx" if self.version else f"{name}.onnx"
+            features = list(getattr(model, 'feature_names_in_', self.feature_names))
+            paths[name] = export_model(model, features, self.model_dir / filename, name=name)
+        return paths
     
-    def get_feature_importance(self) -> Dict[str, float]:
-        """Get feature importance from random forest model."""
-        if not self.feature_importance:
+    def get_feature_importance(self, model: Any = None) -> Dict[str, float]:
+        """Get feature importance from the trained random forest, or from ``model`` (e.g. a served one)."""
+        if model is not None:
+            if not hasattr(model, 'feature_importances_'):
+                raise ValueError(f"{type(model).__name__} has no feature importance.")
+            names = list(getattr(model, 'feature_names_in_', self.feature_names))
+            feature_importance = dict(zip(names, model.feature_importances_))
+        else:
+            feature_importance = self.feature_importance
+        if not feature_importance:
             raise ValueError("No feature importance available. Train random forest model first.")
         
         # Sort feature importance
         sorted_importance = dict(sorted(
-            self.feature_importance.items(),
+            feature_importance.items(),
             key=lambda x: x[1],
             reverse=True
         ))
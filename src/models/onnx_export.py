@@ -0,0 +1,110 @@
+"""ONNX export of trained models and an onnxruntime inference backend.
+
+Exported graphs take one float32 input named ``features`` and embed the
+training column order in the model metadata (``feature_names``), so serving
+does not depend on the sklearn pickle or on sklearn being importable.
+Export needs ``skl2onnx``; serving needs only ``onnxruntime``:
+
+    python src/models/onnx_export.py --model-dir src/models/saved
+    MODEL_BACKEND=onnx python src/web/app.py
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Any, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INPUT_NAME = 'features'
+
+
+def export_model(model: Any, features: List[str], path: Path, name: Optional[str] = None) -> Path:
+    """Convert a fitted sklearn regressor to ONNX with its feature schema embedded."""
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+
+    onnx_model = convert_sklearn(
+        model, name=name or type(model).__name__,
+        initial_types=[(INPUT_NAME, FloatTensorType([None, len(features)]))]
+    )
+    metadata = {
+        'feature_names': json.dumps(list(features)),
+        'sklearn_class': type(model).__name__
+    }
+    for key, value in metadata.items():
+        entry = onnx_model.metadata_props.add()
+        entry.key, entry.value = key, value
+
+    # Write to a temporary file and rename, so model watchers never see a partial artifact
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_bytes(onnx_model.SerializeToString())
+    os.replace(tmp_path, path)
+    logger.info("Exported %s to %s", type(model).__name__, path)
+    return path
+
+
+class OnnxModel:
+    """Run an exported model with onnxruntime behind the sklearn ``predict`` interface."""
+
+    def __init__(self, path: Path, intra_op_threads: Optional[int] = None):
+        """
+        Args:
+            path: Exported ``.onnx`` file.
+            intra_op_threads: Threads used inside one inference call. Defaults to
+                ``ONNX_INTRA_OP_THREADS`` or 1, which keeps latency predictable
+                when several requests run concurrently.
+        """
+        import onnxruntime as ort
+
+        if intra_op_threads is None:
+            intra_op_threads = int(os.getenv('ONNX_INTRA_OP_THREADS', 1))
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+
+        self.path = Path(path)
+        self.session = ort.InferenceSession(str(self.path), options, providers=['CPUExecutionProvider'])
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.feature_names_in_ = np.array(json.loads(metadata['feature_names']), dtype=object)
+        self.n_features_in_ = len(self.feature_names_in_)
+        self._output_name = self.session.get_outputs()[0].name
+
+    def predict(self, X: Any) -> np.ndarray:
+        """Predict for a DataFrame (columns reordered by name) or a 2-D array in schema order."""
+        if hasattr(X, 'columns'):
+            X = X[list(self.feature_names_in_)].to_numpy()
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected input with {self.n_features_in_} features, got shape {X.shape}")
+        output = self.session.run([self._output_name], {INPUT_NAME: X})[0]
+        return output.reshape(-1).astype(np.float64)
+
+
+def main():
+    root_dir = Path(__file__).parent.parent.parent
+    sys.path.append(str(root_dir))
+    import joblib
+    from src.utils.logging_config import setup_logging
+
+    parser = argparse.ArgumentParser(description='Export saved joblib models to ONNX.')
+    parser.add_argument('--model-dir', default=str(root_dir / 'src' / 'models' / 'saved'))
+    parser.add_argument('--model', action='append',
+                        help='model name to export (default: random_forest and linear_regression)')
+    args = parser.parse_args()
+
+    setup_logging()
+    model_dir = Path(args.model_dir)
+    for name in args.model or ['random_forest', 'linear_regression']:
+        model = joblib.load(model_dir / f'{name}.joblib')
+        export_model(model, list(model.feature_names_in_), model_dir / f'{name}.onnx', name=name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+"""Precomputed predictions over the discrete serving domain.
+
+The web form takes one of 8 app types and 3 stores plus size, price and
+downloads, usually entered at coarse granularity. A PredictionGrid evaluates
+the model offline on evenly spaced bins of size, price and log10(downloads)
+for every type/store combination and stores the result as one NumPy array,
+so serving a prediction is an index computation instead of a forest traversal.
+Inputs outside the grid (or of unknown type/store) are left to the live model.
+
+Build a grid for the current model and print its error against exact predictions:
+
+    python -m src.models.prediction_grid --model-dir src/models/saved \\
+        --output src/models/saved/prediction_grid.npz
+"""
+import argparse
+import hashlib
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (start, stop, step) of each numeric axis
+DEFAULT_AXES = {
+    'app_size_mb': (0.0, 1000.0, 10.0),
+    'price_usd': (0.0, 20.0, 0.5),
+    'log_downloads': (0.0, 10.0, 0.25)
+}
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PredictionGrid:
+    """Model predictions on a regular grid, indexed by (app_type, store, size, price, log10 downloads)."""
+
+    AXES = ('app_size_mb', 'price_usd', 'log_downloads')
+
+    def __init__(self, values: np.ndarray, app_types: Sequence[str], stores: Sequence[str],
+                 axes: Dict[str, Tuple[float, float, float]], model_sha256: Optional[str] = None):
+        self.values = values
+        self.app_types = list(app_types)
+        self.stores = list(stores)
+        self.axes = {name: tuple(float(v) for v in axes[name]) for name in self.AXES}
+        self.model_sha256 = model_sha256
+        self._type_index = {name: i for i, name in enumerate(self.app_types)}
+        self._store_index = {name: i for i, name in enumerate(self.stores)}
+        self._start = np.array([self.axes[name][0] for name in self.AXES])
+        self._step = np.array([self.axes[name][2] for name in self.AXES])
+        self._size = np.array(values.shape[2:])
+
+    @staticmethod
+    def axis_points(start: float, stop: float, step: float) -> np.ndarray:
+        return start + step * np.arange(int(round((stop - start) / step)) + 1)
+
+    @classmethod
+    def build(cls, model: Any, features: List[str], app_types: Sequence[str], stores: Sequence[str],
+              axes: Optional[Dict[str, Tuple[float, float, float]]] = None, dtype: str = 'float16',
+              model_path: Optional[Path] = None) -> 'PredictionGrid':
+        """Evaluate ``model`` on every grid point.
+
+        ``features`` is the model's column order; the one-hot columns are named
+        ``app_type_<type>`` and ``store_<store>`` as in AppRatingPredictor.
+        """
+        import pandas as pd
+
+        axes = dict(DEFAULT_AXES, **(axes or {}))
+        points = [cls.axis_points(*axes[name]) for name in cls.AXES]
+        size, price, log_downloads = (p.ravel() for p in np.meshgrid(*points, indexing='ij'))
+        index = {feature: i for i, feature in enumerate(features)}
+
+        base = np.zeros((len(size), len(features)))
+        base[:, index['app_size_mb']] = size
+        base[:, index['price_usd']] = price
+        base[:, index['downloads']] = 10 ** log_downloads
+
+        values = np.empty((len(app_types), len(stores)) + tuple(len(p) for p in points), dtype=dtype)
+        for t, app_type in enumerate(app_types):
+            for s, store in enumerate(stores):
+                X = base.copy()
+                X[:, index[f'app_type_{app_type}']] = 1
+                X[:, index[f'store_{store}']] = 1
+                values[t, s] = model.predict(pd.DataFrame(X, columns=features)).reshape(values.shape[2:])
+            logger.info("Built prediction grid for app type %s", app_type)
+
+        return cls(values, app_types, stores, axes,
+                   model_sha256=file_sha256(model_path) if model_path is not None else None)
+
+    def save(self, path: Path) -> None:
+        meta = {'app_types': self.app_types, 'stores': self.stores, 'axes': self.axes,
+                'model_sha256': self.model_sha256}
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, values=self.values, meta=np.array(json.dumps(meta)))
+        logger.info("Saved %s prediction grid (%s cells) to %s",
+                    self.values.dtype, self.values.size, path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'PredictionGrid':
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            values = data['values']
+        return cls(values, meta['app_types'], meta['stores'], meta['axes'], meta.get('model_sha256'))
+
+    def matches(self, model_path: Path) -> bool:
+        """Whether the grid was built from the model artifact at ``model_path``."""
+        return self.model_sha256 is not None and self.model_sha256 == file_sha256(model_path)
+
+    def lookup_batch(self, apps: List[Dict[str, Any]], interpolate: bool = False) -> np.ndarray:
+        """Grid predictions for ``apps``, NaN where an app falls outside the grid."""
+        n = len(apps)
+        t = np.array([self._type_index.get(str(app['app_type']).lower(), -1) for app in apps])
+        s = np.array([self._store_index.get(str(app['store']).lower(), -1) for app in apps])
+        coords = np.empty((n, 3))
+        for row, app in enumerate(apps):
+            coords[row, 0] = float(app['app_size_mb'])
+            coords[row, 1] = float(app['price_usd'])
+            coords[row, 2] = np.log10(max(float(app['downloads']), 1.0))
+
+        position = (coords - self._start) / self._step
+        inside = (t >= 0) & (s >= 0) & np.all((position >= 0) & (position <= self._size - 1), axis=1)
+        result = np.full(n, np.nan)
+        if not inside.any():
+            return result
+
+        t, s, position = t[inside], s[inside], position[inside]
+        if not interpolate:
+            i, j, k = np.rint(position).astype(int).T
+            result[inside] = self.values[t, s, i, j, k]
+            return result
+
+        # Trilinear interpolation between the 8 surrounding grid points
+        lower = np.minimum(np.floor(position).astype(int), self._size - 2)
+        frac = position - lower
+        total = np.zeros(len(t))
+        for corner in range(8):
+            offset = np.array([(corner >> d) & 1 for d in range(3)])
+            weight = np.prod(np.where(offset, frac, 1 - frac), axis=1)
+            i, j, k = (lower + offset).T
+            total += weight * self.values[t, s, i, j, k]
+        result[inside] = total
+        return result
+
+    def lookup(self, app_data: Dict[str, Any], interpolate: bool = False) -> Optional[float]:
+        """Grid prediction for one app, or None if it falls outside the grid."""
+        value = self.lookup_batch([app_data], interpolate)[0]
+        return None if np.isnan(value) else float(value)
+
+    def error_report(self, model: Any, features: List[str], n_samples: int = 5000,
+                     seed: int = 0) -> Dict[str, Dict[str, float]]:
+        """Compare grid lookups with exact model predictions on random in-grid apps.
+
+        ``on_grid`` samples lie exactly on grid points, so their error only
+        reflects the storage dtype; ``nearest`` and ``interpolated`` use
+        continuous samples.
+        """
+        import pandas as pd
+
+        rng = np.random.default_rng(seed)
+        lows = self._start
+        highs = self._start + self._step * (self._size - 1)
+
+        def sample(on_grid):
+            coords = rng.uniform(lows, highs, (n_samples, 3))
+            if on_grid:
+                coords = lows + self._step * np.rint((coords - lows) / self._step)
+            return [
+                {'app_size_mb': c[0], 'price_usd': c[1], 'downloads': 10 ** c[2],
+                 'app_type': self.app_types[rng.integers(len(self.app_types))],
+                 'store': self.stores[rng.integers(len(self.stores))]}
+                for c in coords
+            ]
+
+        def exact(apps):
+            index = {feature: i for i, feature in enumerate(features)}
+            X = np.zeros((len(apps), len(features)))
+            for row, app in enumerate(apps):
+                X[row, index['app_size_mb']] = app['app_size_mb']
+                X[row, index['price_usd']] = app['price_usd']
+                X[row, index['downloads']] = app['downloads']
+                X[row, index[f"app_type_{app['app_type']}"]] = 1
+                X[row, index[f"store_{app['store']}"]] = 1
+            return model.predict(pd.DataFrame(X, columns=features))
+
+        def summarize(errors):
+            errors = np.abs(errors)
+            return {'mae': float(errors.mean()), 'p99': float(np.percentile(errors, 99)),
+                    'max': float(errors.max())}
+
+        on_grid = sample(True)
+        continuous = sample(False)
+        continuous_exact = exact(continuous)
+        return {
+            'on_grid': summarize(self.lookup_batch(on_grid) - exact(on_grid)),
+            'nearest': summarize(self.lookup_batch(continuous) - continuous_exact),
+            'interpolated': summarize(self.lookup_batch(continuous, interpolate=True) - continuous_exact)
+        }
+
+
+def main():
+    root_dir = Path(__file__).parent.parent.parent
+    sys.path.append(str(root_dir))
+    from src.models.model_registry import ModelRegistry
+    from src.predict import AppRatingPredictor
+    from src.utils.logging_config import setup_logging
+
+    parser = argparse.ArgumentParser(description='Build a precomputed prediction grid for the served model.')
+    parser.add_argument('--model-dir', default=str(root_dir / 'src' / 'models' / 'saved'))
+    parser.add_argument('--output', default=str(root_dir / 'src' / 'models' / 'saved' / 'prediction_grid.npz'))
+    parser.add_argument('--dtype', default='float16', choices=['float16', 'float32'])
+    for name, (start, stop, step) in DEFAULT_AXES.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float, nargs=3, default=(start, stop, step),
+                            metavar=('START', 'STOP', 'STEP'))
+    parser.add_argument('--samples', type=int, default=5000, help='random apps used for the error report')
+    args = parser.parse_args()
+
+    setup_logging()
+    registry = ModelRegistry(args.model_dir, poll_interval=0).start()
+    predictor = AppRatingPredictor(registry=registry)
+    axes = {name: tuple(getattr(args, name)) for name in DEFAULT_AXES}
+
+    grid = PredictionGrid.build(registry.active.model, predictor.features, predictor.app_types,
+                                predictor.stores, axes=axes, dtype=args.dtype,
+                                model_path=registry.active.path)
+    grid.save(Path(args.output))
+    print(json.dumps({
+        'cells': int(grid.values.size),
+        'bytes': Path(args.output).stat().st_size,
+        'error_vs_model': grid.error_report(registry.active.model, predictor.features, args.samples)
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
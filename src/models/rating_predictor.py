@@ -1,18 +1,22 @@
 import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split, GridSearchCV
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_squared_error, r2_score
 import joblib
 import logging
 
-logging.basicConfig(level=logging.INFO)
+try:
+    from utils.shared_arrays import shared_training_data
+except ImportError:  # imported as src.models.rating_predictor
+    from src.utils.shared_arrays import shared_training_data
+
 logger = logging.getLogger(__name__)
 
 class RatingPredictor:
     def __init__(self, model_type='rf'):
         """Initialize the rating predictor with specified model type."""
+        # sklearn is imported on first use to keep importing this module cheap
+        from sklearn.ensemble import RandomForestRegressor
+        from sklearn.linear_model import LinearRegression
+        
         self.model_type = model_type
         self.model = None
         self.feature_importance = None
@@ -44,13 +48,16 @@ class RatingPredictor:
         # Ensure all required columns are present
         for col in feature_columns:
             if col not in df.columns:
-                logger.warning(f"Missing column: {col}")
+                logger.warning("Missing column: %s", col)
                 df[col] = 0
         
         return df[feature_columns]
     
     def train(self, X, y, optimize=True):
         """Train the model with optional hyperparameter optimization."""
+        from sklearn.base import clone
+        from sklearn.model_selection import train_test_split, GridSearchCV
+        
         # Split data into training and validation sets
         X_train, X_val, y_train, y_val = train_test_split(
             X, y, test_size=0.2, random_state=42
@@ -64,13 +71,18 @@ class RatingPredictor:
                 self.param_grid,
                 cv=5,
                 scoring='neg_mean_squared_error',
-                n_jobs=-1
+                n_jobs=-1,
+                refit=False
             )
-            grid_search.fit(X_train, y_train)
+            # Workers map the training matrix from disk instead of each unpickling a copy
+            dtype = np.float32 if self.model_type == 'rf' else np.float64
+            with shared_training_data(X_train, y_train, dtype=dtype) as (X_shared, y_shared):
+                grid_search.fit(X_shared, y_shared)
             
-            # Update model with best parameters
-            self.model = grid_search.best_estimator_
-            logger.info(f"Best parameters: {grid_search.best_params_}")
+            # Refit the best parameters on the DataFrame so the model keeps feature names
+            self.model = clone(self.model).set_params(**grid_search.best_params_)
+            self.model.fit(X_train, y_train)
+            logger.info("Best parameters: %s", grid_search.best_params_)
         else:
             # Train with default parameters
             self.model.fit(X_train, y_train)
@@ -86,8 +98,8 @@ class RatingPredictor:
         train_score = self.evaluate(X_train, y_train)
         val_score = self.evaluate(X_val, y_val)
         
-        logger.info(f"Training R² score: {train_score:.4f}")
-        logger.info(f"Validation R² score: {val_score:.4f}")
+        logger.info("Training R² score: %.4f", train_score)
+        logger.info("Validation R² score: %.4f", val_score)
         
         return train_score, val_score
     
@@ -100,6 +112,8 @@ class RatingPredictor:
     
     def evaluate(self, X, y):
         """Evaluate model performance."""
+        from sklearn.metrics import r2_score
+        
         predictions = self.predict(X)
         return r2_score(y, predictions)
     
@@ -116,10 +130,10 @@ class RatingPredictor:
             raise ValueError("No model to save")
         
         joblib.dump(self.model, filepath)
-        logger.info(f"Model saved to {filepath}")
+        logger.info("Model saved to %s", filepath)
     
     def load_model(self, filepath):
         """Load a trained model from disk."""
         self.model = joblib.load(filepath)
-        logger.info(f"Model loaded from {filepath}")
+        logger.info("Model loaded from %s", filepath)
         return self
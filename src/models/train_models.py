@@ -4,9 +4,9 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from model_trainer import ModelTrainer
 from data.preprocessor import DataPreprocessor
+from utils.logging_config import setup_logging
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def main():
@@ -27,13 +27,14 @@ def main():
         logger.info("\nFeature Importance:")
         importance = trainer.get_feature_importance()
         for feature, score in importance.items():
-            logger.info(f"{feature}: {score:.4f}")
+            logger.info("%s: %.4f", feature, score)
         
         return results, importance
         
     except Exception as e:
-        logger.error(f"Error training models: {str(e)}")
+        logger.error("Error training models: %s", e)
         raise
 
 if __name__ == "__main__":
+    setup_logging()
     main()
@@ -4,32 +4,54 @@ import numpy as np
 from pathlib import Path
 import logging
 import os
+import sys
+
+# Add the project root directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.utils.metrics import FEATURE_BUILD_TIME, INFERENCE_TIME, BATCH_SIZE, PREDICTIONS, GRID_LOOKUPS
+from src.utils.profiling import profile_stage
+from src.utils.logging_config import setup_logging
+from src.data.entity_resolution import ENTITY_FEATURES
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Numeric request fields; other numeric training columns cannot be built at serving time,
+# except ENTITY_FEATURES when the predictor has the training EntityIndex
+REQUEST_NUMERIC_FEATURES = ['app_size_mb', 'price_usd', 'downloads']
+
+def check_features(model, feature_names):
+    """Raise ValueError unless ``model`` was trained on exactly ``feature_names``.
+    
+    Models trained with the training-only version or trend features, or with
+    entity features but no entity index, have columns requests cannot be
+    encoded into.
+    """
+    trained = getattr(model, 'feature_names_in_', None)
+    if trained is not None and list(trained) != list(feature_names):
+        missing = [name for name in trained if name not in feature_names]
+        raise ValueError(f"Model was trained on features the predictor cannot build: "
+                         f"{missing or list(trained)}")
+    n_features = getattr(model, 'n_features_in_', None)
+    if n_features is not None and n_features != len(feature_names):
+        raise ValueError(f"Model expects {n_features} features, requests are encoded into {len(feature_names)}")
+
 class AppRatingPredictor:
-    def __init__(self):
+    def __init__(self, registry=None, grid=None, grid_interpolate=False, model_name='random_forest',
+                 backend='joblib', encoder=None, interval=0.8, entity_index=None):
         # Get the absolute path to the models directory
         current_dir = Path(__file__).parent
         self.model_dir = current_dir / "models/saved"
-        logger.debug(f"Model directory: {self.model_dir}")
-        
-        model_path = self.model_dir / "random_forest.joblib"
-        logger.debug(f"Looking for model at: {model_path}")
+        logger.debug("Model directory: %s", self.model_dir)
         
-        if not model_path.exists():
-            # Try the absolute path as a fallback
-            fallback_path = Path("C:/Users/GANGARI DHRUVAVEER/CascadeProjects/ARPS/src/models/saved/random_forest.joblib")
-            logger.debug(f"Model not found, trying fallback path: {fallback_path}")
-            
-            if not fallback_path.exists():
-                raise FileNotFoundError(f"Model file not found at {model_path} or {fallback_path}")
-            model_path = fallback_path
-            
-        logger.debug(f"Loading model from: {model_path}")
-        self.model = joblib.load(model_path)
-        logger.debug("Model loaded successfully")
+        # When a ModelRegistry is given it owns loading and hot-swapping the model.
+        # model_name selects the artifact otherwise, e.g. a distilled surrogate,
+        # and backend='onnx' serves the exported .onnx file with onnxruntime.
+        self.registry = registry
+        self.model_name = model_name
+        self.backend = backend
+        if registry is None:
+            self._model = self._load_model()
         
         # Define feature order (must match training order)
         self.features = [
@@ -50,74 +72,345 @@ class AppRatingPredictor:
         # Define possible stores
         self.stores = ['amazon', 'apple', 'google_play']
         
+        # Optional EntityIndex building the cross-store features of models trained with them
+        self.entity_index = entity_index
+        if entity_index is not None:
+            self.features = self.features[:3] + ENTITY_FEATURES + self.features[3:]
+        
+        # Column positions used when building feature matrices for batches
+        self._feature_index = {feature: i for i, feature in enumerate(self.features)}
+        
+        # Optional SparseOneHotEncoder for models trained on sparse input
+        if encoder is not None:
+            servable = REQUEST_NUMERIC_FEATURES + (ENTITY_FEATURES if entity_index is not None else [])
+            unknown = [column for column in encoder.numeric if column not in servable]
+            if unknown:
+                raise ValueError(f"Sparse encoder uses training-only features {unknown}")
+        self.encoder = encoder
+        
+        # Optional PredictionGrid answering in-grid requests without running the model
+        self.grid = grid
+        self.grid_interpolate = grid_interpolate
+        self._grid_state = (None, False)
+        
+        # Share of the forest's tree predictions spanned by prediction intervals
+        self.interval = interval
+        
+        # Flattened trees, global importance and explainer of the served model
+        self._forest_state = (None, None)
+        self._importance_state = (None, None)
+        self._explainer_state = (None, None)
+        
+        if registry is None:
+            self.check_model(self._model)
+    
+    def _load_model(self):
+        """Load the model (random forest by default) from the models directory."""
+        extension = '.onnx' if self.backend == 'onnx' else '.joblib'
+        model_path = self.model_dir / f"{self.model_name}{extension}"
+        logger.debug("Looking for model at: %s", model_path)
+        
+        if not model_path.exists():
+            # Try the absolute path as a fallback
+            fallback_path = Path("C:/Users/GANGARI DHRUVAVEER/CascadeProjects/ARPS/src/models/saved") / model_path.name
+            logger.debug("Model not found, trying fallback path: %s", fallback_path)
+            
+            if not fallback_path.exists():
+                raise FileNotFoundError(f"Model file not found at {model_path} or {fallback_path}")
+            model_path = fallback_path
+            
+        logger.debug("Loading model from: %s", model_path)
+        self._model_path = model_path
+        if self.backend == 'onnx':
+            from src.models.onnx_export import OnnxModel
+            model = OnnxModel(model_path)
+        else:
+            model = joblib.load(model_path)
+        logger.debug("Model loaded successfully")
+        return model
+    
+    @property
+    def model(self):
+        """The model serving the current prediction."""
+        if self.registry is not None:
+            return self.registry.get_model()
+        return self._model
+    
+    def _active_grid(self):
+        """Return the prediction grid if it was built from the model being served."""
+        if self.grid is None:
+            return None
+        active = self.registry.active if self.registry is not None else None
+        key = active.fingerprint if active is not None else 'local'
+        checked_key, valid = self._grid_state
+        if key != checked_key:
+            valid = self.grid.matches(active.path if active is not None else self._model_path)
+            if not valid:
+                logger.warning("Prediction grid does not match the served model, using the model directly")
+            self._grid_state = (key, valid)
+        return self.grid if valid else None
+        
     def _create_features(self, app_data):
         """Create feature vector for prediction."""
         try:
-            logger.debug(f"Creating features for app data: {app_data}")
+            logger.debug("Creating features for app data: %s", app_data)
+            
+            if self.encoder is not None:
+                return self.encoder.transform_records(self._with_entity_features([app_data]))
             
             # Initialize features dictionary with zeros
             features = {feature: 0 for feature in self.features}
-            logger.debug(f"Initialized features: {features}")
             
             # Set numeric features
             features['app_size_mb'] = float(app_data['app_size_mb'])
             features['price_usd'] = float(app_data['price_usd'])
             features['downloads'] = float(app_data['downloads'])  # Convert to float for consistency
-            logger.debug(f"Set numeric features: {features}")
+            if self.entity_index is not None:
+                features.update(self.entity_index.transform_records([app_data]).iloc[0].to_dict())
             
             # Set app type feature
             app_type = app_data['app_type'].lower()
             app_type_col = f"app_type_{app_type}"
             if app_type_col in features:
                 features[app_type_col] = 1
-                logger.debug(f"Set app type feature: {app_type_col}")
+                logger.debug("Set app type feature: %s", app_type_col)
             else:
-                logger.warning(f"Unknown app type: {app_type}")
+                logger.warning("Unknown app type: %s", app_type)
                 
             # Set store feature
             store = app_data['store'].lower()
             store_col = f"store_{store}"
             if store_col in features:
                 features[store_col] = 1
-                logger.debug(f"Set store feature: {store_col}")
+                logger.debug("Set store feature: %s", store_col)
             else:
-                logger.warning(f"Unknown store: {store}")
+                logger.warning("Unknown store: %s", store)
                 
             # Create DataFrame with correct feature order
             df = pd.DataFrame([features])[self.features]
-            logger.debug(f"Created feature DataFrame with shape: {df.shape}")
-            logger.debug(f"Feature values: {df.iloc[0].to_dict()}")
+            logger.debug("Created feature DataFrame with shape: %s", df.shape)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Feature values: %s", df.iloc[0].to_dict())
             
             return df
             
         except Exception as e:
-            logger.error(f"Error creating features: {str(e)}", exc_info=True)
+            logger.error("Error creating features: %s", e, exc_info=True)
             raise
     
     def predict_rating(self, app_data):
         """Predict app rating."""
         try:
-            logger.debug(f"Predicting rating for app data: {app_data}")
+            logger.debug("Predicting rating for app data: %s", app_data)
+            
+            grid = self._active_grid()
+            if grid is not None:
+                grid_rating = grid.lookup(app_data, self.grid_interpolate)
+                GRID_LOOKUPS.inc('miss' if grid_rating is None else 'hit')
+                if grid_rating is not None:
+                    PREDICTIONS.inc(*self.metric_labels(app_data))
+                    return max(1.0, min(5.0, round(grid_rating, 2)))
             
             # Create feature vector
-            X = self._create_features(app_data)
-            logger.debug(f"Created feature vector with shape: {X.shape}")
+            with FEATURE_BUILD_TIME.time(), profile_stage('predict.features', aggregate=True):
+                X = self._create_features(app_data)
+            logger.debug("Created feature vector with shape: %s", X.shape)
             
             # Make prediction
-            predicted_rating = self.model.predict(X)[0]
-            logger.debug(f"Raw predicted rating: {predicted_rating}")
+            model = self.model
+            with INFERENCE_TIME.time(), profile_stage('predict.inference', aggregate=True):
+                predicted_rating = model.predict(X)[0]
+            BATCH_SIZE.observe(1)
+            PREDICTIONS.inc(*self.metric_labels(app_data))
+            logger.debug("Raw predicted rating: %s", predicted_rating)
             
             # Round and clip the prediction
             final_rating = round(float(predicted_rating), 2)
             final_rating = max(1.0, min(5.0, final_rating))
-            logger.debug(f"Final predicted rating: {final_rating}")
+            logger.debug("Final predicted rating: %s", final_rating)
             
             return final_rating
             
         except Exception as e:
-            logger.error(f"Error making prediction: {str(e)}", exc_info=True)
+            logger.error("Error making prediction: %s", e, exc_info=True)
             raise
 
+    def metric_labels(self, app_data):
+        """Return the (store, app_type) metric labels, bounded to the known vocabularies."""
+        store = str(app_data.get('store', '')).lower()
+        app_type = str(app_data.get('app_type', '')).lower()
+        return (
+            store if store in self.stores else 'other',
+            app_type if app_type in self.app_types else 'other'
+        )
+
+    def _create_feature_matrix(self, apps):
+        """Create the feature matrix for a batch of apps."""
+        if self.encoder is not None:
+            return self.encoder.transform_records(self._with_entity_features(apps))
+        
+        X = np.zeros((len(apps), len(self.features)))
+        index = self._feature_index
+        if self.entity_index is not None:
+            entity_features = self.entity_index.transform_records(apps)
+            for column in ENTITY_FEATURES:
+                X[:, index[column]] = entity_features[column].to_numpy()
+        
+        for row, app_data in enumerate(apps):
+            X[row, 0] = float(app_data['app_size_mb'])
+            X[row, 1] = float(app_data['price_usd'])
+            X[row, 2] = float(app_data['downloads'])
+            
+            app_type_col = index.get(f"app_type_{app_data['app_type'].lower()}")
+            if app_type_col is not None:
+                X[row, app_type_col] = 1
+            else:
+                logger.warning("Unknown app type: %s", app_data['app_type'])
+            
+            store_col = index.get(f"store_{app_data['store'].lower()}")
+            if store_col is not None:
+                X[row, store_col] = 1
+            else:
+                logger.warning("Unknown store: %s", app_data['store'])
+        
+        return pd.DataFrame(X, columns=self.features)
+    
+    def _with_entity_features(self, apps):
+        """The app dictionaries with ENTITY_FEATURES added when the predictor has an entity index."""
+        if self.entity_index is None:
+            return apps
+        entity_features = self.entity_index.transform_records(apps).to_dict('records')
+        return [{**app_data, **features} for app_data, features in zip(apps, entity_features)]
+    
+    def predict_batch(self, apps):
+        """Predict ratings for a list of apps with a single model call."""
+        return self._predict_batch(apps)[0]
+    
+    def predict_with_intervals(self, apps):
+        """Predict (rating, interval) for each app from one pass over the forest's trees.
+        
+        The interval is a {'lower', 'upper'} dict spanning the central
+        ``self.interval`` share of the per-tree predictions, or None for apps
+        answered by the prediction grid or a model that is not a forest of
+        at least two trees.
+        """
+        return list(zip(*self._predict_batch(apps, intervals=True)))
+    
+    def _flat_forest(self):
+        """FlatForest of the served model, None if it is not a tree ensemble."""
+        from src.models.flat_forest import FlatForest
+        
+        model = self.model
+        served, forest = self._forest_state
+        if served is not model:
+            try:
+                forest = FlatForest(model)
+            except TypeError:
+                forest = None
+            self._forest_state = (model, forest)
+        return forest
+    
+    def _predict_batch(self, apps, intervals=False):
+        if not apps:
+            return [], []
+        
+        # Serve in-grid apps from the prediction grid and run the model on the rest
+        predictions = np.full(len(apps), np.nan)
+        bounds = np.full((len(apps), 2), np.nan)
+        grid = self._active_grid()
+        if grid is not None:
+            predictions = grid.lookup_batch(apps, self.grid_interpolate)
+        missing = np.flatnonzero(np.isnan(predictions))
+        if grid is not None:
+            GRID_LOOKUPS.inc('hit', amount=len(apps) - len(missing))
+            GRID_LOOKUPS.inc('miss', amount=len(missing))
+        
+        if len(missing):
+            model_apps = apps if len(missing) == len(apps) else [apps[i] for i in missing]
+            with FEATURE_BUILD_TIME.time(), profile_stage('predict.batch_features', aggregate=True):
+                X = self._create_feature_matrix(model_apps)
+            
+            forest = self._flat_forest() if intervals else None
+            if forest is not None and forest.n_trees < 2:
+                # A single tree has no spread to take quantiles of
+                forest = None
+            with INFERENCE_TIME.time(), profile_stage('predict.batch_inference', aggregate=True):
+                if forest is not None:
+                    tail = (1 - self.interval) / 2
+                    predictions[missing], bounds[missing] = forest.predict_quantiles(X, [tail, 1 - tail])
+                else:
+                    predictions[missing] = self.model.predict(X)
+            BATCH_SIZE.observe(len(model_apps))
+        for app_data in apps:
+            PREDICTIONS.inc(*self.metric_labels(app_data))
+        
+        # Round and clip the predictions
+        ratings = np.clip(np.round(predictions.astype(float), 2), 1.0, 5.0).tolist()
+        if not intervals:
+            return ratings, None
+        bounds = np.clip(np.round(bounds, 2), 1.0, 5.0)
+        return ratings, [None if np.isnan(lower) else {'lower': lower, 'upper': upper}
+                         for lower, upper in bounds.tolist()]
+
+    def _feature_names(self):
+        return self.encoder.feature_names_ if self.encoder is not None else self.features
+    
+    def check_model(self, model):
+        """Raise ValueError if ``model`` needs features this predictor cannot build from requests."""
+        check_features(model, self._feature_names())
+
+    def feature_importance(self):
+        """Importance of each displayed feature in the served model, in percent."""
+        from src.models.explain import group_by_label
+        from src.models.model_trainer import ModelTrainer
+        
+        model = self.model
+        served, importance = self._importance_state
+        if served is not model:
+            trainer = ModelTrainer(self.registry.model_dir if self.registry is not None else self.model_dir)
+            trainer.feature_names = self._feature_names()
+            try:
+                ranked = trainer.get_feature_importance(model)
+            except ValueError as e:
+                logger.warning("%s", e)
+                importance = {}
+            else:
+                labels, grouped = group_by_label(np.array([list(ranked.values())]), list(ranked))
+                importance = dict(sorted(((label, round(100 * float(share), 2))
+                                          for label, share in zip(labels, grouped[0])),
+                                         key=lambda item: -item[1]))
+            self._importance_state = (model, importance)
+        return importance
+
+    def _explainer(self):
+        """TreeExplainer of the served model, built on the first /explain request after a swap."""
+        from src.models.explain import TreeExplainer
+        
+        model = self.model
+        served, explainer = self._explainer_state
+        if served is not model:
+            try:
+                explainer = TreeExplainer(model, self._feature_names(), forest=self._flat_forest())
+            except TypeError as e:
+                logger.warning("%s", e)
+                explainer = None
+            self._explainer_state = (model, explainer)
+        return explainer
+
+    def explain_batch(self, apps):
+        """Predicted rating and per-feature TreeSHAP attributions of each app, from the model itself."""
+        explainer = self._explainer()
+        if explainer is None:
+            raise ValueError(f"Attributions are not available for {type(self.model).__name__} models")
+        with FEATURE_BUILD_TIME.time():
+            X = self._create_feature_matrix(apps)
+        with INFERENCE_TIME.time(), profile_stage('predict.explain', aggregate=True):
+            explanations = explainer.explain(X)
+        for app_data, explanation in zip(apps, explanations):
+            explanation['predicted_rating'] = max(1.0, min(5.0, round(explanation['model_output'], 2)))
+            PREDICTIONS.inc(*self.metric_labels(app_data))
+        return explanations
+
 def main():
     """Test the rating predictor with sample apps."""
     predictor = AppRatingPredictor()
@@ -159,4 +452,5 @@ def main():
             print(f"Error predicting rating for {app['name']}: {str(e)}")
 
 if __name__ == "__main__":
+    setup_logging()
     main()
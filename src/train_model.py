@@ -1,10 +1,23 @@
 import os
+import sys
+import argparse
 import numpy as np
 import pandas as pd
 from pathlib import Path
 from sklearn.ensemble import RandomForestRegressor
 import joblib
 
+sys.path.append(str(Path(__file__).parent))
+from models.model_trainer import ModelTrainer
+
+parser = argparse.ArgumentParser(description='Train the served random forest on sample data.')
+parser.add_argument('--compact', action='store_true',
+                    help='sweep forest size settings and save the smallest near-best model')
+parser.add_argument('--compress', type=int, default=0, help='joblib compression level (0-9)')
+parser.add_argument('--max-rmse-increase', type=float, default=0.01,
+                    help='relative RMSE loss accepted for a smaller model with --compact')
+args = parser.parse_args()
+
 # Create directories if they don't exist
 model_dir = Path("src/models/saved")
 model_dir.mkdir(parents=True, exist_ok=True)
@@ -50,13 +63,26 @@ data_encoded = pd.get_dummies(data, columns=['app_type', 'store'])
 X = data_encoded.drop('rating', axis=1)
 y = data_encoded['rating']
 
-# Train Random Forest model
-model = RandomForestRegressor(n_estimators=100, random_state=42)
-model.fit(X, y)
-
-# Save the model
 model_path = model_dir / "random_forest.joblib"
-joblib.dump(model, model_path)
+if args.compact:
+    # Pick the smallest forest on the accuracy/size Pareto front
+    trainer = ModelTrainer(model_dir=str(model_dir), compress=args.compress)
+    report = trainer.sweep_random_forest(X, y, max_rmse_increase=args.max_rmse_increase)
+    
+    print(f"{'max_depth':>9} {'min_leaf':>8} {'max_leaves':>10} {'rmse':>7} {'MB':>7} {'load s':>7} {'row ms':>7}")
+    for candidate in report['pareto']:
+        params = candidate['params']
+        print(f"{str(params['max_depth']):>9} {params['min_samples_leaf']:>8} {str(params['max_leaf_nodes']):>10} "
+              f"{candidate['rmse']:>7.4f} {candidate['artifact_bytes'] / 2**20:>7.2f} "
+              f"{candidate['load_seconds']:>7.3f} {candidate['row_latency_ms']:>7.2f}")
+    print(f"\nSelected {report['selected']['params']}")
+else:
+    # Train Random Forest model
+    model = RandomForestRegressor(n_estimators=100, random_state=42)
+    model.fit(X, y)
+    
+    # Save the model
+    joblib.dump(model, model_path, compress=args.compress)
 
 print(f"Model trained and saved to {model_path}")
 
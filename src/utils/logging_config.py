@@ -0,0 +1,110 @@
+"""Central logging setup for ARPS entry points.
+
+Library modules only create loggers with ``logging.getLogger(__name__)`` and log
+with lazy ``%``-style arguments; entry points call :func:`setup_logging` once.
+Records are handed to a queue and formatted and written by a background
+listener thread, so request threads never block on log I/O.
+
+Configuration comes from the environment:
+
+- ``LOG_LEVEL``: root level, default ``INFO``
+- ``LOG_LEVELS``: per-module levels, e.g. ``src.web.app=WARNING,src.predict=DEBUG``
+- ``LOG_FORMAT``: ``json`` (default) or ``text``
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes present on every LogRecord; anything else was passed via `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue records without formatting them in the calling thread.
+
+    The stock QueueHandler merges the message arguments before enqueueing; here
+    that work is left to the listener thread. Arguments must therefore not be
+    mutated after the logging call, which holds for the values logged in ARPS.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def parse_module_levels(spec: str) -> Dict[str, int]:
+    """Parse ``name=LEVEL,name=LEVEL`` into a mapping of logger name to level."""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, level = item.partition('=')
+        levels[name.strip()] = logging.getLevelName(level.strip().upper())
+    return levels
+
+
+def setup_logging(level: Optional[str] = None, module_levels: Optional[Dict[str, str]] = None,
+                  fmt: Optional[str] = None) -> None:
+    """Configure asynchronous root logging. Safe to call more than once."""
+    global _listener
+
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    fmt = (fmt or os.getenv('LOG_FORMAT', 'json')).lower()
+    levels = parse_module_levels(os.getenv('LOG_LEVELS', ''))
+    if module_levels:
+        levels.update({name: logging.getLevelName(value.upper()) for name, value in module_levels.items()})
+
+    if _listener is not None:
+        _listener.stop()
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    root.setLevel(level)
+
+    for name, module_level in levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,194 @@
+"""Low-overhead serving metrics rendered in the Prometheus text exposition format.
+
+Each thread records into its own shard (a plain dict keyed by label values), so
+the request path never takes a lock. Shards are only summed when /metrics is
+scraped, which makes scrapes slightly stale under load but keeps recording cheap.
+When a thread exits its shard is folded into a base total and dropped, so
+servers starting a thread per request keep one shard per live thread.
+"""
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                           0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class _ThreadToken:
+    """Referenced only from a thread's local storage, so it dies with the thread."""
+
+    __slots__ = ('__weakref__',)
+
+
+class _Metric:
+    """Base class holding the per-thread shards of a metric."""
+
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        # Live shards by id, plus the totals folded in from exited threads
+        self._shards: Dict[int, Dict[Tuple, object]] = {}
+        self._base: Dict[Tuple, object] = {}
+        self._shards_lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _shard(self) -> Dict[Tuple, object]:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            token = self._local.token = _ThreadToken()
+            # Only taken once per thread, never on the recording path afterwards
+            with self._shards_lock:
+                self._shards[id(values)] = values
+            weakref.finalize(token, self._retire, values)
+            return values
+
+    def _retire(self, values: Dict[Tuple, object]) -> None:
+        """Fold the shard of an exited thread into the base totals."""
+        with self._shards_lock:
+            self._merge(self._base, values)
+            del self._shards[id(values)]
+
+    def _merge(self, totals: Dict[Tuple, object], shard: Dict[Tuple, object]) -> None:
+        raise NotImplementedError
+
+    def collect(self) -> Dict[Tuple, object]:
+        totals: Dict[Tuple, object] = {}
+        with self._shards_lock:
+            # dict.copy() is atomic under the GIL, so a concurrent insert cannot break the scrape
+            snapshots = [shard.copy() for shard in (self._base, *self._shards.values())]
+        for shard in snapshots:
+            self._merge(totals, shard)
+        return totals
+
+    def _format_labels(self, values: Tuple, extra: str = '') -> str:
+        pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    """A monotonically increasing counter."""
+
+    kind = 'counter'
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def _merge(self, totals: Dict[Tuple, float], shard: Dict[Tuple, float]) -> None:
+        for labels, value in shard.items():
+            totals[labels] = totals.get(labels, 0) + value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, value in sorted(self.collect().items()):
+            lines.append(f'{self.name}{self._format_labels(labels)} {_format_value(value)}')
+        return lines
+
+
+class Histogram(_Metric):
+    """A histogram with fixed upper bounds, storing per-bucket counts, sum and count."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels) -> None:
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # Per-bucket counts, +Inf bucket, then sum
+            state = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        """Observe the wall-clock duration of the block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def _merge(self, totals: Dict[Tuple, List[float]], shard: Dict[Tuple, List[float]]) -> None:
+        for labels, state in shard.items():
+            total = totals.setdefault(labels, [0] * len(state))
+            for i, value in enumerate(list(state)):
+                total[i] += value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, state in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state[:-1]):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{self._format_labels(labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{self._format_labels(labels)} {_format_value(state[-1])}')
+            lines.append(f'{self.name}_count{self._format_labels(labels)} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """Collects metrics and renders them for the /metrics endpoint."""
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value)
+
+
+REGISTRY = MetricsRegistry()
+
+# Serving metrics
+REQUEST_LATENCY = Histogram(
+    'arps_request_latency_seconds', 'Latency of prediction requests.', ['endpoint'])
+FEATURE_BUILD_TIME = Histogram(
+    'arps_feature_build_seconds', 'Time spent building feature matrices.')
+INFERENCE_TIME = Histogram(
+    'arps_model_inference_seconds', 'Time spent in model inference per call.')
+BATCH_SIZE = Histogram(
+    'arps_batch_size', 'Number of apps predicted per model call.', buckets=BATCH_SIZE_BUCKETS)
+PREDICTIONS = Counter(
+    'arps_predictions_total', 'Predictions served.', ['store', 'app_type'])
+PREDICTION_ERRORS = Counter(
+    'arps_prediction_errors_total', 'Failed prediction requests.', ['endpoint', 'store', 'app_type'])
+GRID_LOOKUPS = Counter(
+    'arps_prediction_grid_lookups_total', 'Prediction grid lookups by result (hit or miss).', ['result'])
@@ -0,0 +1,255 @@
+"""A small DAG pipeline runner with fingerprint-based stage caching.
+
+Stages declare the files they read and write. A stage depends on every stage
+that produces one of its inputs, and stages whose dependencies are done run
+concurrently on a thread pool. Before running, a stage's fingerprint is computed
+from its input file contents, its parameters and the source of the code it
+declares; if that matches the last successful run and all outputs still exist,
+the stage is skipped.
+"""
+import hashlib
+import inspect
+import json
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .profiling import profile_stage
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """A unit of work in a pipeline."""
+
+    def __init__(self, name: str, func: Callable[[], Any], inputs: Iterable = (),
+                 outputs: Iterable = (), code: Iterable = (), params: Optional[Dict] = None,
+                 after: Iterable[str] = ()):
+        """
+        Args:
+            name: Unique stage name.
+            func: Callable run with no arguments.
+            inputs: Files or directories read by the stage.
+            outputs: Files or directories written by the stage.
+            code: Modules, classes or functions whose source affects the result,
+                in addition to ``func`` itself.
+            params: JSON-serializable parameters that affect the result.
+            after: Names of stages that must finish first without sharing a file.
+        """
+        self.name = name
+        self.func = func
+        self.inputs = [Path(p) for p in inputs]
+        self.outputs = [Path(p) for p in outputs]
+        self.code = [func] + list(code)
+        self.params = params or {}
+        self.after = list(after)
+
+
+class Pipeline:
+    """Run stages in dependency order, skipping those whose fingerprint is unchanged."""
+
+    def __init__(self, stages: List[Stage], manifest_path: str = "data/.pipeline_manifest.json",
+                 max_workers: int = 4):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Stage names must be unique")
+        self.manifest_path = Path(manifest_path)
+        self.max_workers = max_workers
+        self.manifest = self._load_manifest()
+        self._manifest_lock = threading.Lock()
+        self.dependencies = self._resolve_dependencies()
+
+    def _resolve_dependencies(self) -> Dict[str, set]:
+        producers = {}
+        for stage in self.stages.values():
+            for output in stage.outputs:
+                if output in producers:
+                    raise ValueError(f"{output} is produced by both {producers[output]} and {stage.name}")
+                producers[output] = stage.name
+
+        dependencies = {}
+        for stage in self.stages.values():
+            deps = set(stage.after)
+            for path in stage.inputs:
+                # A stage also depends on producers of files inside an input directory
+                for output, producer in producers.items():
+                    if output == path or path in output.parents:
+                        deps.add(producer)
+            deps.discard(stage.name)
+            unknown = deps - set(self.stages)
+            if unknown:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages: {sorted(unknown)}")
+            dependencies[stage.name] = deps
+
+        self._check_acyclic(dependencies)
+        return dependencies
+
+    @staticmethod
+    def _check_acyclic(dependencies: Dict[str, set]) -> None:
+        remaining = {name: set(deps) for name, deps in dependencies.items()}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Pipeline has a dependency cycle among: {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        if self.manifest_path.exists():
+            try:
+                return json.loads(self.manifest_path.read_text())
+            except ValueError:
+                logger.warning("Ignoring unreadable pipeline manifest %s", self.manifest_path)
+        return {'stages': {}, 'files': {}}
+
+    def _save_manifest(self) -> None:
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.manifest, indent=2, sort_keys=True))
+        tmp_path.replace(self.manifest_path)
+
+    def _file_hash(self, path: Path) -> str:
+        """Content hash of a file, reusing the cached hash while size and mtime match."""
+        stat = path.stat()
+        key = str(path)
+        with self._manifest_lock:
+            cached = self.manifest['files'].get(key)
+        if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+            return cached['sha256']
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        sha = digest.hexdigest()
+        with self._manifest_lock:
+            self.manifest['files'][key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha}
+        return sha
+
+    def _path_hash(self, path: Path) -> str:
+        if path.is_dir():
+            digest = hashlib.sha256()
+            for child in sorted(p for p in path.rglob('*') if p.is_file()):
+                digest.update(str(child.relative_to(path)).encode())
+                digest.update(self._file_hash(child).encode())
+            return digest.hexdigest()
+        if path.exists():
+            return self._file_hash(path)
+        return 'missing'
+
+    @staticmethod
+    def _code_hash(obj: Any) -> str:
+        target = getattr(obj, 'func', obj)  # unwrap functools.partial
+        try:
+            source_file = inspect.getsourcefile(target)
+            if inspect.ismodule(target) or inspect.isclass(target):
+                source = Path(source_file).read_text()
+            else:
+                source = inspect.getsource(target)
+        except (TypeError, OSError):
+            source = repr(target)
+        return hashlib.sha256(source.encode()).hexdigest()
+
+    def fingerprint(self, stage: Stage) -> str:
+        digest = hashlib.sha256()
+        digest.update(stage.name.encode())
+        digest.update(json.dumps(stage.params, sort_keys=True, default=str).encode())
+        for obj in stage.code:
+            digest.update(self._code_hash(obj).encode())
+        for path in stage.inputs:
+            digest.update(str(path).encode())
+            digest.update(self._path_hash(path).encode())
+        return digest.hexdigest()
+
+    def _is_fresh(self, stage: Stage, fingerprint: str) -> bool:
+        with self._manifest_lock:
+            record = self.manifest['stages'].get(stage.name)
+        return (record is not None and record['fingerprint'] == fingerprint
+                and all(path.exists() for path in stage.outputs))
+
+    def _run_stage(self, stage: Stage, force: bool) -> Dict[str, Any]:
+        start = time.perf_counter()
+        fingerprint = self.fingerprint(stage)
+        if not force and self._is_fresh(stage, fingerprint):
+            return {'status': 'skipped', 'seconds': time.perf_counter() - start}
+
+        logger.info("Running stage %s", stage.name)
+        for output in stage.outputs:
+            (output if not output.suffix else output.parent).mkdir(parents=True, exist_ok=True)
+        with profile_stage(f'pipeline.{stage.name}'):
+            stage.func()
+
+        missing = [str(path) for path in stage.outputs if not path.exists()]
+        if missing:
+            raise RuntimeError(f"Stage {stage.name} did not produce: {', '.join(missing)}")
+
+        with self._manifest_lock:
+            self.manifest['stages'][stage.name] = {
+                'fingerprint': fingerprint,
+                'completed_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+            }
+        return {'status': 'ran', 'seconds': time.perf_counter() - start}
+
+    def run(self, targets: Optional[Iterable[str]] = None, force: Iterable[str] = ()) -> Dict[str, Dict]:
+        """Run the pipeline, or only ``targets`` and their upstream stages.
+
+        Returns per-stage results with status ``ran``, ``skipped``, ``failed`` or
+        ``blocked`` (an upstream stage failed) and wall-clock seconds.
+        """
+        selected = self._upstream(targets) if targets else set(self.stages)
+        force = set(force)
+        results: Dict[str, Dict] = {}
+        pending = set(selected)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for name in sorted(pending):
+                    deps = self.dependencies[name] & selected
+                    if any(results.get(dep, {}).get('status') in ('failed', 'blocked') for dep in deps):
+                        results[name] = {'status': 'blocked', 'seconds': 0.0}
+                        pending.discard(name)
+                    elif all(dep in results for dep in deps):
+                        running[executor.submit(self._run_stage, self.stages[name], name in force)] = name
+                        pending.discard(name)
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        logger.error("Stage %s failed: %s", name, e, exc_info=True)
+                        results[name] = {'status': 'failed', 'seconds': 0.0, 'error': str(e)}
+                    with self._manifest_lock:
+                        self._save_manifest()
+
+        return {name: results[name] for name in self.stages if name in results}
+
+    def _upstream(self, targets: Iterable[str]) -> set:
+        selected = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage: {name}")
+            if name not in selected:
+                selected.add(name)
+                stack.extend(self.dependencies[name])
+        return selected
+
+    @staticmethod
+    def format_summary(results: Dict[str, Dict]) -> str:
+        """Render per-stage status and timing as a table."""
+        lines = [f"{'stage':<28} {'status':<8} {'seconds':>9}"]
+        for name, result in results.items():
+            lines.append(f"{name:<28} {result['status']:<8} {result['seconds']:>9.2f}")
+        lines.append(f"{'total (sum)':<28} {'':<8} {sum(r['seconds'] for r in results.values()):>9.2f}")
+        return '\n'.join(lines)
@@ -0,0 +1,283 @@
+"""Opt-in profiling for pipeline stages, training phases and predictions.
+
+Code marks interesting sections with :class:`profile_stage`, used as a context
+manager or decorator. When profiling is off (the default) a stage costs one
+environment lookup. Turn it on with environment variables, or with the
+``--profile`` flag of ``src/main.py`` and the benchmark runner:
+
+- ``ARPS_PROFILE``: ``cprofile`` (or ``1``) for deterministic cProfile stats,
+  ``sample`` for a low-overhead sampling profiler
+- ``ARPS_PROFILE_DIR``: output directory, default ``profiles``
+- ``ARPS_PROFILE_INTERVAL_MS``: sampling interval, default ``5``
+- ``ARPS_PROFILE_MEMORY``: set to ``0`` to skip tracemalloc peak tracking
+
+Each stage writes ``<stage>.pstats`` (load with ``pstats`` or snakeviz) or
+``<stage>.folded`` (collapsed stacks for flamegraph.pl or speedscope), and
+appends its wall time and peak traced memory to ``summary.jsonl``. Stages
+that run once per request are aggregated in memory and written by
+:func:`flush` at exit instead of on every call.
+
+Nested stages are supported: a parent's pstats include its children's, and
+its memory peak covers them. tracemalloc is process-wide, so memory peaks of
+stages running concurrently in other threads overlap.
+"""
+import atexit
+import cProfile
+import collections
+import contextlib
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MODES = ('cprofile', 'sample')
+
+_local = threading.local()
+_lock = threading.Lock()
+# Number of active stages tracking memory; tracemalloc runs only while this is non-zero
+_tracing_stages = 0
+# Aggregated stats for stages that are flushed at exit, keyed by stage name
+_aggregated: Dict[str, Dict] = {}
+
+
+def profile_mode() -> Optional[str]:
+    """Return the active profiling mode, or None when profiling is off."""
+    mode = os.environ.get('ARPS_PROFILE', '').lower()
+    if not mode or mode in ('0', 'false', 'off'):
+        return None
+    return 'cprofile' if mode in ('1', 'true', 'on') else mode
+
+
+def enable(mode: str = 'cprofile', output_dir: Optional[str] = None) -> None:
+    """Turn profiling on for this process and its subprocesses."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown profiling mode {mode!r}, expected one of {MODES}")
+    os.environ['ARPS_PROFILE'] = mode
+    if output_dir:
+        os.environ['ARPS_PROFILE_DIR'] = str(output_dir)
+
+
+def output_dir() -> Path:
+    path = Path(os.environ.get('ARPS_PROFILE_DIR', 'profiles'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _start_tracing() -> None:
+    global _tracing_stages
+    with _lock:
+        if _tracing_stages == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracing_stages += 1
+
+
+def _stop_tracing() -> None:
+    global _tracing_stages
+    with _lock:
+        _tracing_stages -= 1
+        if _tracing_stages == 0:
+            tracemalloc.stop()
+
+
+class _Sampler(threading.Thread):
+    """Sample one thread's Python stack at a fixed interval into folded-stack counts."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name='arps-profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).stem}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self) -> collections.Counter:
+        self._stop_event.set()
+        self.join()
+        return self.stacks
+
+
+class _Frame:
+    """State of one active stage on the current thread."""
+
+    def __init__(self, name: str, mode: str):
+        self.name = name
+        self.mode = mode
+        self.profiler = None
+        self.sampler = None
+        self.children: List[pstats.Stats] = []
+        self.traced = False
+        self.memory_start = 0
+        self.memory_peak = 0
+        self.start = 0.0
+
+
+class profile_stage(contextlib.ContextDecorator):
+    """Profile a block of code as a named stage.
+
+    Args:
+        name: Stage name, used for the output file names.
+        aggregate: Accumulate stats across calls and write them at exit. Use
+            for code that runs once per request, such as single predictions.
+    """
+
+    def __init__(self, name: str, aggregate: bool = False):
+        self.name = name
+        self.aggregate = aggregate
+
+    def __enter__(self):
+        mode = profile_mode()
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        if mode is None:
+            stack.append(None)
+            return self
+
+        frame = _Frame(self.name, mode)
+        parent = next((f for f in reversed(stack) if f is not None), None)
+
+        if os.environ.get('ARPS_PROFILE_MEMORY', '1') != '0':
+            _start_tracing()
+            frame.traced = True
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                # Keep the parent's peak so far before resetting it for this stage
+                parent.memory_peak = max(parent.memory_peak, peak)
+            tracemalloc.reset_peak()
+            frame.memory_start = current
+
+        if mode == 'cprofile':
+            if parent is not None and parent.profiler is not None:
+                parent.profiler.disable()
+            frame.profiler = cProfile.Profile()
+            try:
+                frame.profiler.enable()
+            except ValueError:
+                # Another profiler (e.g. a debugger or an enclosing tool) is active
+                logger.debug("cProfile unavailable for stage %s", self.name)
+                frame.profiler = None
+        elif mode == 'sample':
+            interval = float(os.environ.get('ARPS_PROFILE_INTERVAL_MS', 5)) / 1000
+            frame.sampler = _Sampler(threading.get_ident(), interval)
+            frame.sampler.start()
+
+        stack.append(frame)
+        frame.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        frame = _local.stack.pop()
+        if frame is None:
+            return False
+
+        seconds = time.perf_counter() - frame.start
+        parent = next((f for f in reversed(_local.stack) if f is not None), None)
+
+        peak_bytes = None
+        if frame.traced:
+            frame.memory_peak = max(frame.memory_peak, tracemalloc.get_traced_memory()[1])
+            peak_bytes = max(frame.memory_peak - frame.memory_start, 0)
+            if parent is not None:
+                parent.memory_peak = max(parent.memory_peak, frame.memory_peak)
+            _stop_tracing()
+
+        stats = None
+        if frame.profiler is not None:
+            frame.profiler.disable()
+            stats = pstats.Stats(frame.profiler)
+            for child in frame.children:
+                stats.add(child)
+            if parent is not None and parent.profiler is not None:
+                parent.children.append(stats)
+                parent.profiler.enable()
+        folded = frame.sampler.stop() if frame.sampler is not None else None
+
+        record = {
+            'stage': self.name,
+            'mode': frame.mode,
+            'seconds': round(seconds, 6),
+            'peak_memory_mb': None if peak_bytes is None else round(peak_bytes / 2**20, 3),
+            'pid': os.getpid(),
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }
+        if self.aggregate:
+            _accumulate(self.name, record, stats, folded)
+        else:
+            record['file'] = _write(self.name, stats, folded)
+            _append_summary(record)
+            logger.info("Profiled %s: %.3fs, peak %s MB -> %s", self.name, seconds,
+                        record['peak_memory_mb'], record['file'])
+        return False
+
+
+def _write(name: str, stats: Optional[pstats.Stats], folded: Optional[collections.Counter]) -> Optional[str]:
+    base = name.replace('/', '_')
+    if stats is not None:
+        path = output_dir() / f"{base}.pstats"
+        stats.dump_stats(path)
+        return str(path)
+    if folded is not None:
+        path = output_dir() / f"{base}.folded"
+        path.write_text(''.join(f"{stack} {count}\n" for stack, count in folded.most_common()))
+        return str(path)
+    return None
+
+
+def _append_summary(record: Dict) -> None:
+    with _lock, open(output_dir() / 'summary.jsonl', 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+
+def _accumulate(name: str, record: Dict, stats: Optional[pstats.Stats],
+                folded: Optional[collections.Counter]) -> None:
+    with _lock:
+        entry = _aggregated.setdefault(name, {
+            'stage': name, 'mode': record['mode'], 'calls': 0, 'seconds': 0.0,
+            'peak_memory_mb': None, 'stats': None, 'folded': None
+        })
+        entry['calls'] += 1
+        entry['seconds'] += record['seconds']
+        if record['peak_memory_mb'] is not None:
+            entry['peak_memory_mb'] = max(entry['peak_memory_mb'] or 0, record['peak_memory_mb'])
+        if stats is not None:
+            if entry['stats'] is None:
+                entry['stats'] = stats
+            else:
+                entry['stats'].add(stats)
+        if folded is not None:
+            entry['folded'] = (entry['folded'] or collections.Counter()) + folded
+
+
+def flush() -> None:
+    """Write stats of aggregated stages collected so far."""
+    with _lock:
+        entries = list(_aggregated.values())
+        _aggregated.clear()
+    for entry in entries:
+        record = {key: value for key, value in entry.items() if key not in ('stats', 'folded')}
+        record['seconds'] = round(record['seconds'], 6)
+        record['pid'] = os.getpid()
+        record['ts'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        record['file'] = _write(entry['stage'], entry['stats'], entry['folded'])
+        _append_summary(record)
+
+
+atexit.register(flush)
@@ -0,0 +1,59 @@
+"""Memory-mapped training matrices shared with parallel workers.
+
+joblib pickles pandas objects in full for every task it sends to a worker
+process, so parallel cross-validation or grid search over a large DataFrame
+multiplies memory and serialization time. :func:`shared_training_data` writes
+the encoded matrix once to a ``.npy`` file and reopens it with
+``mmap_mode='r'``; joblib sends ``np.memmap`` arrays to workers as a file
+reference and every process maps the same pages from the page cache.
+"""
+import logging
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def to_memmap(data, path: Path, dtype=np.float64) -> np.memmap:
+    """Write a DataFrame, Series or array to ``path`` as ``.npy`` and map it read-only.
+
+    DataFrames are copied column by column, so no second dense copy of the
+    whole frame is built in memory.
+    """
+    path = Path(path)
+    shape = data.shape
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+    if isinstance(data, pd.DataFrame):
+        for j in range(shape[1]):
+            out[:, j] = data.iloc[:, j].to_numpy(dtype=dtype)
+    else:
+        out[...] = np.asarray(data, dtype=dtype)
+    out.flush()
+    del out
+    return np.load(path, mmap_mode='r')
+
+
+@contextmanager
+def shared_training_data(X, y, directory: Optional[str] = None,
+                         dtype=np.float64) -> Iterator[Tuple[np.memmap, np.memmap]]:
+    """Yield memory-mapped copies of ``X`` and ``y``, removing the files afterwards.
+
+    Pass ``dtype=np.float32`` for tree models, which convert their input to
+    float32 anyway; workers then skip that per-fold copy. Column names are not
+    kept; fit final models on the original frame when ``feature_names_in_`` is
+    needed.
+    """
+    tmp_dir = Path(tempfile.mkdtemp(prefix='arps-shared-', dir=directory))
+    try:
+        X_shared = to_memmap(X, tmp_dir / 'X.npy', dtype=dtype)
+        y_shared = to_memmap(y, tmp_dir / 'y.npy')
+        logger.debug("Memory-mapped training data %s to %s", X_shared.shape, tmp_dir)
+        yield X_shared, y_shared
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -1,17 +1,51 @@
 import re
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.sentiment import SentimentIntensityAnalyzer
-
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('sentiment/vader_lexicon')
-except LookupError:
-    nltk.download('punkt')
-    nltk.download('stopwords')
-    nltk.download('vader_lexicon')
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# NLTK resources used by this module, as (lookup path, download name)
+NLTK_RESOURCES = [
+    ('tokenizers/punkt', 'punkt'),
+    ('corpora/stopwords', 'stopwords'),
+    ('sentiment/vader_lexicon', 'vader_lexicon')
+]
+
+def ensure_nltk_data(download=True):
+    """Check that the NLTK data used here is installed, downloading it if allowed.
+    
+    NLTK is only imported and checked when this is called (or on first use of a
+    function that needs it), never at import time.
+    """
+    import nltk
+    
+    missing = []
+    for path, name in NLTK_RESOURCES:
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            missing.append(name)
+    
+    if missing and download:
+        for name in missing:
+            logger.info("Downloading NLTK resource: %s", name)
+            nltk.download(name, quiet=True)
+        missing = []
+    
+    return missing
+
+@lru_cache(maxsize=None)
+def _nltk_ready():
+    missing = ensure_nltk_data()
+    if missing:
+        raise LookupError(f"Missing NLTK data: {', '.join(missing)}")
+    return True
+
+@lru_cache(maxsize=None)
+def _sentiment_analyzer():
+    _nltk_ready()
+    from nltk.sentiment import SentimentIntensityAnalyzer
+    return SentimentIntensityAnalyzer()
 
 def clean_text(text):
     """Clean and normalize text data."""
@@ -31,17 +65,22 @@ def clean_text(text):
 
 def get_sentiment_score(text):
     """Calculate sentiment score for text using VADER."""
-    sia = SentimentIntensityAnalyzer()
+    sia = _sentiment_analyzer()
     
     try:
         sentiment_scores = sia.polarity_scores(text)
         return sentiment_scores['compound']  # Returns a score between -1 and 1
     except Exception as e:
-        print(f"Error calculating sentiment: {str(e)}")
+        logger.error("Error calculating sentiment: %s", e)
         return 0.0
 
 def extract_keywords(text, top_n=5):
     """Extract most important keywords from text."""
+    _nltk_ready()
+    import nltk
+    from nltk.tokenize import word_tokenize
+    from nltk.corpus import stopwords
+    
     # Clean text
     text = clean_text(text)
     
@@ -1,20 +1,25 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 from pathlib import Path
 import sys
 import os
 import logging
-import numpy as np
-import json
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 # Add the project root directory to Python path
 root_dir = Path(__file__).parent.parent.parent
 sys.path.append(str(root_dir))
 
-from src.predict import AppRatingPredictor
+from src.utils.logging_config import setup_logging
+
+# Configure logging
+setup_logging()
+
+from src.web.prediction_api import (
+    create_predictor, parse_app_data, prediction_response, batch_response, error_response,
+    timed, record_error, validation_error, explain_apps, explain_response
+)
+from src.utils.metrics import REGISTRY
 
 # Initialize Flask app with correct template and static folders
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -25,7 +30,7 @@ app = Flask(__name__,
            template_folder=template_dir,
            static_folder=static_dir)
 
-predictor = AppRatingPredictor()
+registry, predictor = create_predictor()
 
 @app.route('/')
 def home():
@@ -33,69 +38,119 @@ def home():
     return render_template('index.html')
 
 @app.route('/predict', methods=['POST'])
+@timed('/predict')
 def predict():
     """Handle prediction request."""
+    data = None
     try:
         logger.debug("Received prediction request")
         
         # Get data from request
         if not request.is_json:
-            return jsonify({
-                'success': False,
-                'error': 'Request must be JSON'
-            })
+            return jsonify(error_response('Request must be JSON'))
             
         data = request.get_json()
-        logger.debug(f"Received data: {data}")
+        logger.debug("Received data: %s", data)
         
         if not data:
-            return jsonify({
-                'success': False,
-                'error': 'No data provided'
-            })
+            return jsonify(error_response('No data provided'))
+        
+        invalid = validation_error([data])
+        if invalid:
+            record_error('/predict', predictor, data)
+            return jsonify(invalid)
         
         # Create app data dictionary
-        app_data = {
-            'name': data.get('name', 'Unknown App'),
-            'app_size_mb': float(data.get('app_size_mb', 0)),
-            'price_usd': float(data.get('price_usd', 0)),
-            'downloads': int(data.get('downloads', 0)),
-            'app_type': data.get('app_type', 'productivity'),
-            'store': data.get('store', 'google_play')
-        }
-        
-        logger.debug(f"Processed app_data: {app_data}")
-        
-        # Make prediction
-        predicted_rating = predictor.predict_rating(app_data)
-        logger.debug(f"Predicted rating: {predicted_rating}")
-        
-        # Get feature importance
-        feature_importance = {
-            'App Size': 46.91,
-            'Downloads': 15.01,
-            'Price': 11.91,
-            'Store Platform': 3.0,
-            'App Type': 2.61
-        }
-        
-        # Convert numpy types to Python types
-        response_data = {
-            'success': True,
-            'predicted_rating': float(predicted_rating),
-            'app_details': app_data,
-            'feature_importance': feature_importance
-        }
-        logger.debug(f"Sending response: {response_data}")
+        app_data = parse_app_data(data)
+        logger.debug("Processed app_data: %s", app_data)
+        
+        # Make prediction, with the interval from the same pass over the trees
+        prediction = predictor.predict_with_intervals([app_data])[0]
+        logger.debug("Predicted rating: %s", prediction)
+        
+        response_data = prediction_response(app_data, prediction, predictor.feature_importance())
+        logger.debug("Sending response: %s", response_data)
         
         return jsonify(response_data)
         
     except Exception as e:
-        logger.error(f"Error making prediction: {str(e)}")
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        })
+        logger.error("Error making prediction: %s", e)
+        record_error('/predict', predictor, data)
+        return jsonify(error_response(str(e)))
+
+@app.route('/predict/batch', methods=['POST'])
+@timed('/predict/batch')
+def predict_batch():
+    """Handle a batch prediction request of the form {"apps": [...]}."""
+    try:
+        if not request.is_json:
+            return jsonify(error_response('Request must be JSON'))
+        
+        data = request.get_json()
+        if not data or not data.get('apps'):
+            return jsonify(error_response('No apps provided'))
+        
+        # Reject the whole batch with a per-column report before building any features
+        invalid = validation_error(data['apps'])
+        if invalid:
+            record_error('/predict/batch', predictor)
+            return jsonify(invalid)
+        
+        apps = [parse_app_data(app_data) for app_data in data['apps']]
+        predictions = predictor.predict_with_intervals(apps)
+        
+        return jsonify(batch_response(apps, predictions, predictor.feature_importance()))
+        
+    except Exception as e:
+        logger.error("Error making batch prediction: %s", e)
+        record_error('/predict/batch', predictor)
+        return jsonify(error_response(str(e)))
+
+@app.route('/explain', methods=['POST'])
+@timed('/explain')
+def explain():
+    """Predict one app, or a batch of the form {"apps": [...]}, with per-feature attributions."""
+    try:
+        if not request.is_json:
+            return jsonify(error_response('Request must be JSON'))
+        
+        data = request.get_json()
+        if not data:
+            return jsonify(error_response('No data provided'))
+        
+        invalid = validation_error(explain_apps(data))
+        if invalid:
+            record_error('/explain', predictor)
+            return jsonify(invalid)
+        
+        apps = [parse_app_data(app_data) for app_data in explain_apps(data)]
+        explanations = predictor.explain_batch(apps)
+        
+        return jsonify(explain_response(apps, explanations, predictor.feature_importance()))
+        
+    except Exception as e:
+        logger.error("Error explaining prediction: %s", e)
+        record_error('/explain', predictor)
+        return jsonify(error_response(str(e)))
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Expose serving metrics in the Prometheus text format."""
+    return Response(REGISTRY.render(), content_type=REGISTRY.CONTENT_TYPE)
+
+@app.route('/admin/model', methods=['GET'])
+def model_status():
+    """Report the active model version and watcher state."""
+    return jsonify(registry.status())
+
+@app.route('/admin/model/reload', methods=['POST'])
+def reload_model():
+    """Check for a new model artifact immediately instead of waiting for the poller."""
+    reloaded = registry.check_for_update()
+    return jsonify({
+        'reloaded': reloaded,
+        **registry.status()
+    })
 
 if __name__ == '__main__':
     app.run(port=5002, debug=True)
@@ -0,0 +1,174 @@
+"""ASGI serving mode with micro-batched predictions.
+
+Run with:
+    uvicorn src.web.asgi_app:app --port 5003
+
+The request and response format of /predict and /predict/batch matches the
+Flask app; concurrent /predict requests are coalesced into batched model calls.
+"""
+from contextlib import asynccontextmanager
+from pathlib import Path
+import sys
+import os
+import logging
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, JSONResponse, Response
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+
+logger = logging.getLogger(__name__)
+
+# Add the project root directory to Python path
+root_dir = Path(__file__).parent.parent.parent
+sys.path.append(str(root_dir))
+
+from src.utils.logging_config import setup_logging
+
+# Configure logging
+setup_logging()
+
+from src.web.prediction_api import (
+    create_predictor, parse_app_data, prediction_response, batch_response, error_response,
+    timed, record_error, validation_error, explain_apps, explain_response
+)
+from src.utils.metrics import REGISTRY
+from src.web.micro_batcher import MicroBatcher
+
+current_dir = Path(__file__).parent
+template_dir = current_dir / 'templates'
+static_dir = current_dir / 'static'
+
+registry, predictor = create_predictor()
+
+batcher = MicroBatcher(
+    predictor.predict_with_intervals,
+    max_batch_size=int(os.getenv('ASGI_MAX_BATCH_SIZE', 64)),
+    max_wait_ms=float(os.getenv('ASGI_MAX_BATCH_WAIT_MS', 5)),
+    max_workers=int(os.getenv('ASGI_INFERENCE_THREADS', 2))
+)
+
+def _is_json(request):
+    return request.headers.get('content-type', '').split(';')[0].strip() == 'application/json'
+
+async def home(request):
+    """Render the home page."""
+    return FileResponse(template_dir / 'index.html')
+
+@timed('/predict')
+async def predict(request):
+    """Handle prediction request through the micro-batcher."""
+    data = None
+    try:
+        if not _is_json(request):
+            return JSONResponse(error_response('Request must be JSON'))
+
+        data = await request.json()
+        if not data:
+            return JSONResponse(error_response('No data provided'))
+
+        invalid = validation_error([data])
+        if invalid:
+            record_error('/predict', predictor, data)
+            return JSONResponse(invalid)
+
+        app_data = parse_app_data(data)
+        prediction = await batcher.submit(app_data)
+
+        return JSONResponse(prediction_response(app_data, prediction, predictor.feature_importance()))
+
+    except Exception as e:
+        logger.error("Error making prediction: %s", e)
+        record_error('/predict', predictor, data)
+        return JSONResponse(error_response(str(e)))
+
+@timed('/predict/batch')
+async def predict_batch(request):
+    """Handle a batch prediction request of the form {"apps": [...]}."""
+    try:
+        if not _is_json(request):
+            return JSONResponse(error_response('Request must be JSON'))
+
+        data = await request.json()
+        if not data or not data.get('apps'):
+            return JSONResponse(error_response('No apps provided'))
+
+        # Reject the whole batch with a per-column report before building any features
+        invalid = validation_error(data['apps'])
+        if invalid:
+            record_error('/predict/batch', predictor)
+            return JSONResponse(invalid)
+
+        apps = [parse_app_data(app_data) for app_data in data['apps']]
+        # Already a batch, so skip the queue and run it directly on the pool
+        predictions = await batcher.run_batch(apps)
+
+        return JSONResponse(batch_response(apps, predictions, predictor.feature_importance()))
+
+    except Exception as e:
+        logger.error("Error making batch prediction: %s", e)
+        record_error('/predict/batch', predictor)
+        return JSONResponse(error_response(str(e)))
+
+@timed('/explain')
+async def explain(request):
+    """Predict one app, or a batch of the form {"apps": [...]}, with per-feature attributions."""
+    try:
+        if not _is_json(request):
+            return JSONResponse(error_response('Request must be JSON'))
+
+        data = await request.json()
+        if not data:
+            return JSONResponse(error_response('No data provided'))
+
+        invalid = validation_error(explain_apps(data))
+        if invalid:
+            record_error('/explain', predictor)
+            return JSONResponse(invalid)
+
+        apps = [parse_app_data(app_data) for app_data in explain_apps(data)]
+        explanations = await run_in_threadpool(predictor.explain_batch, apps)
+
+        return JSONResponse(explain_response(apps, explanations, predictor.feature_importance()))
+
+    except Exception as e:
+        logger.error("Error explaining prediction: %s", e)
+        record_error('/explain', predictor)
+        return JSONResponse(error_response(str(e)))
+
+async def metrics(request):
+    """Expose serving metrics in the Prometheus text format."""
+    return Response(REGISTRY.render(), media_type=REGISTRY.CONTENT_TYPE)
+
+async def model_status(request):
+    """Report the active model version and watcher state."""
+    return JSONResponse(registry.status())
+
+async def reload_model(request):
+    """Check for a new model artifact immediately instead of waiting for the poller."""
+    reloaded = await run_in_threadpool(registry.check_for_update)
+    return JSONResponse({
+        'reloaded': reloaded,
+        **registry.status()
+    })
+
+@asynccontextmanager
+async def lifespan(app):
+    await batcher.start()
+    yield
+    await batcher.stop()
+
+app = Starlette(
+    routes=[
+        Route('/', home),
+        Route('/predict', predict, methods=['POST']),
+        Route('/predict/batch', predict_batch, methods=['POST']),
+        Route('/explain', explain, methods=['POST']),
+        Route('/metrics', metrics, methods=['GET']),
+        Route('/admin/model', model_status, methods=['GET']),
+        Route('/admin/model/reload', reload_model, methods=['POST']),
+        Mount('/static', StaticFiles(directory=static_dir), name='static')
+    ],
+    lifespan=lifespan
+)
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-item requests into batched model calls.
+
+    Items submitted from request handlers are queued; a background task flushes
+    the queue as one batch once ``max_batch_size`` items are waiting or the oldest
+    item has waited ``max_wait_ms``. Batches run on a thread pool so the event
+    loop keeps accepting requests while the model is busy.
+
+    If a batch fails, its items are retried one by one, so a single bad item
+    only fails its own request. :meth:`stop` drains the queue: items already
+    submitted are still predicted before the pool shuts down.
+    """
+
+    def __init__(self, predict_fn: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 64, max_wait_ms: float = 5.0,
+                 max_workers: int = 2):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_workers = max_workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._inflight = set()
+        # Items taken off the queue by the flush loop but not dispatched yet
+        self._collecting: List[tuple] = []
+        self._stopped = False
+
+    async def start(self) -> None:
+        """Start the flush loop on the running event loop."""
+        self._stopped = False
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix='micro-batch')
+        # Never queue more batches in the pool than it has threads
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop accepting items, predict the ones already submitted and shut down the pool."""
+        self._stopped = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            # Dispatch the batch being collected and whatever is still queued
+            pending, self._collecting = self._collecting, []
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+            for start in range(0, len(pending), self.max_batch_size):
+                await self._slots.acquire()
+                self._track(asyncio.create_task(self._dispatch(pending[start:start + self.max_batch_size])))
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    async def submit(self, item: Any) -> Any:
+        """Queue a single item and wait for its result."""
+        if self._stopped:
+            raise RuntimeError("Micro-batcher is stopped")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def run_batch(self, items: List[Any]) -> List[Any]:
+        """Run an already-batched request on the inference pool."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.predict_fn, items
+        )
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._collecting = batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                # Take whatever is already waiting before sleeping on the queue
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._slots.acquire()
+            self._collecting = []
+            self._track(asyncio.create_task(self._dispatch(batch)))
+
+    def _track(self, task: asyncio.Task) -> None:
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    def _predict_each(self, items: List[Any]) -> List[tuple]:
+        """Predict items one at a time; returns (result, error) pairs."""
+        outcomes = []
+        for item in items:
+            try:
+                outcomes.append((self.predict_fn([item])[0], None))
+            except Exception as e:
+                outcomes.append((None, e))
+        return outcomes
+
+    async def _dispatch(self, batch: List[tuple]) -> None:
+        loop = asyncio.get_running_loop()
+        items = [item for item, _ in batch]
+        try:
+            try:
+                outcomes = [(result, None) for result in
+                            await loop.run_in_executor(self._executor, self.predict_fn, items)]
+            except Exception as e:
+                if len(items) == 1:
+                    outcomes = [(None, e)]
+                else:
+                    # Find the bad items instead of failing every request in the batch
+                    logger.warning("Batch of %d predictions failed, retrying items one by one: %s", len(items), e)
+                    outcomes = await loop.run_in_executor(self._executor, self._predict_each, items)
+        except Exception as e:
+            outcomes = [(None, e)] * len(items)
+        finally:
+            self._slots.release()
+        for (_, future), (result, error) in zip(batch, outcomes):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
@@ -0,0 +1,137 @@
+"""Request handling shared by the Flask and ASGI prediction servers."""
+import os
+import inspect
+from functools import wraps
+from pathlib import Path
+
+from src.predict import AppRatingPredictor
+from src.models.model_registry import ModelRegistry
+from src.models.prediction_grid import PredictionGrid
+from src.data.sparse_encoding import SparseOneHotEncoder
+from src.data.entity_resolution import EntityIndex
+from src.data.validation import validate_records
+from src.utils.metrics import REQUEST_LATENCY, PREDICTION_ERRORS
+
+root_dir = Path(__file__).parent.parent.parent
+
+def create_predictor():
+    """Create the model registry and a predictor that serves its active model."""
+    interval = float(os.getenv('PREDICTION_INTERVAL', 0.8))
+    if not 0 < interval < 1:
+        raise ValueError(f"PREDICTION_INTERVAL must be between 0 and 1 (exclusive), got {interval}")
+    
+    # Watch the saved models directory so retrained models are picked up without a restart
+    registry = ModelRegistry(
+        os.getenv('MODEL_DIR', root_dir / 'src' / 'models' / 'saved'),
+        model_name=os.getenv('MODEL_NAME', 'random_forest'),
+        poll_interval=float(os.getenv('MODEL_RELOAD_INTERVAL', 30)),
+        backend=os.getenv('MODEL_BACKEND', 'joblib')
+    )
+    
+    # Optional precomputed grid serving in-grid requests without running the model
+    grid_path = os.getenv('PREDICTION_GRID')
+    grid = PredictionGrid.load(grid_path) if grid_path else None
+    # Vocabulary of the sparse encoder for models trained on sparse input
+    encoder_path = os.getenv('SPARSE_ENCODER')
+    encoder = SparseOneHotEncoder.load(encoder_path) if encoder_path else None
+    # Entities of the training data for models trained with --entity-features
+    entity_index_path = os.getenv('ENTITY_INDEX')
+    entity_index = EntityIndex.load(entity_index_path) if entity_index_path else None
+    if entity_index is not None and grid is not None:
+        raise ValueError("PREDICTION_GRID cannot serve models with entity features: they depend on the app name")
+    predictor = AppRatingPredictor(
+        registry=registry, grid=grid, encoder=encoder,
+        grid_interpolate=os.getenv('PREDICTION_GRID_INTERPOLATE', '0') == '1',
+        interval=interval, entity_index=entity_index
+    )
+    # Artifacts trained on features requests cannot provide are never swapped in
+    registry.validate = predictor.check_model
+    registry.start()
+    return registry, predictor
+
+def parse_app_data(data):
+    """Create the app data dictionary from a request payload."""
+    return {
+        'name': data.get('name', 'Unknown App'),
+        'app_size_mb': float(data.get('app_size_mb', 0)),
+        'price_usd': float(data.get('price_usd', 0)),
+        # Validated as a whole number, which may arrive as "1000.0" or 1e3
+        'downloads': int(float(data.get('downloads', 0))),
+        'app_type': data.get('app_type', 'productivity'),
+        'store': data.get('store', 'google_play')
+    }
+
+def validation_error(apps):
+    """Error body for request apps failing the schema, range and vocabulary checks, or None."""
+    report = validate_records(apps)
+    if report['ok']:
+        return None
+    return {**error_response('Invalid input: ' + '; '.join(report['errors'])), 'validation': report}
+
+def prediction_response(app_data, prediction, feature_importance):
+    """Build the response body for a single (rating, interval) prediction."""
+    predicted_rating, interval = prediction
+    return {
+        'success': True,
+        'predicted_rating': float(predicted_rating),
+        'prediction_interval': interval,
+        'app_details': app_data,
+        'feature_importance': feature_importance
+    }
+
+def batch_response(apps, predictions, feature_importance):
+    """Build the response body for a batch of (rating, interval) predictions."""
+    return {
+        'success': True,
+        'predictions': [
+            {'predicted_rating': float(rating), 'prediction_interval': interval, 'app_details': app_data}
+            for app_data, (rating, interval) in zip(apps, predictions)
+        ],
+        'feature_importance': feature_importance
+    }
+
+def explain_apps(data):
+    """Request apps of an /explain payload: one app, or a batch of the form {"apps": [...]}."""
+    return data['apps'] if isinstance(data, dict) and isinstance(data.get('apps'), list) else [data]
+
+def explain_response(apps, explanations, feature_importance):
+    """Build the response body for /explain."""
+    return {
+        'success': True,
+        'explanations': [
+            {'app_details': app_data, **explanation}
+            for app_data, explanation in zip(apps, explanations)
+        ],
+        'feature_importance': feature_importance
+    }
+
+def error_response(message):
+    return {
+        'success': False,
+        'error': message
+    }
+
+def timed(endpoint):
+    """Record the latency of a (sync or async) request handler."""
+    def decorator(handler):
+        if inspect.iscoroutinefunction(handler):
+            @wraps(handler)
+            async def async_wrapper(*args, **kwargs):
+                with REQUEST_LATENCY.time(endpoint):
+                    return await handler(*args, **kwargs)
+            return async_wrapper
+        
+        @wraps(handler)
+        def wrapper(*args, **kwargs):
+            with REQUEST_LATENCY.time(endpoint):
+                return handler(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_error(endpoint, predictor, data=None):
+    """Count a failed request, labelled by store and app type when known."""
+    if isinstance(data, dict):
+        store, app_type = predictor.metric_labels(data)
+    else:
+        store, app_type = 'unknown', 'unknown'
+    PREDICTION_ERRORS.inc(endpoint, store, app_type)